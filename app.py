@@ -1,8 +1,21 @@
+import json
+import logging
 import streamlit as st
 import pandas as pd
 import math
-from src.data.filters import DataFilter
-from src.data.data_loader import DataLoader
+from typing import List
+from src.data.dataset_cache import get_dataset_cache
+from src.data.ranking import RankedResults
+from src.library.library_store import BaseLibraryStore, SessionLibraryStore, get_library_store
+from src.monitoring.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+metrics = get_metrics()
+
+# Columns pulled for each search result row, and how many rendered result pages a session keeps
+RESULT_COLUMNS = ["isbn", "title", "author", "rating"]
+LIBRARY_COLUMNS = ["isbn", "title", "author"]
+MAX_CACHED_PAGES = 16
 
 
 def initialize_session_state():
@@ -12,125 +25,250 @@ def initialize_session_state():
     """
 
     if "initialized" not in st.session_state:
-        print("DEBUG: First time initialization")
+        logger.debug("Initializing session state")
         st.session_state.initialized = True
-        st.session_state.library = {}
-        st.session_state.search_results = pd.DataFrame()
+        # Library of visitors without a user name, kept in memory and dropped with the session
+        st.session_state.session_library = SessionLibraryStore()
+        # Search results are kept as ranked row positions into the shared dataset, not as DataFrame copies
+        st.session_state.search_results = RankedResults.empty()
         # Add pagination states
         st.session_state.current_page = 1
+        st.session_state.library_page = 1
         st.session_state.items_per_page = 10
-    else:
-        print("DEBUG: Session already initialized, preserving state")
-        print("DEBUG: Current library:", st.session_state.library)
+        # Rows of recently shown result pages, keyed by dataset version, page and page size
+        st.session_state.page_cache = {}
+
+
+def get_user_library_store() -> BaseLibraryStore:
+    """Return the persistent library store for named users and the session's in-memory one otherwise."""
+    return get_library_store() if st.session_state.user_id else st.session_state.session_library
+
+
+def get_rows(df: pd.DataFrame, positions, columns: List[str]) -> List[tuple]:
+    """
+    Return the given rows of the given columns as plain tuples.
+    Only these cells are taken from the columns, without boxing every row into a Series like iterrows().
+
+    Args:
+        df: DataFrame containing all book data
+        positions: Row positions to take, in display order
+        columns: Columns to take
+
+    Returns:
+        One tuple of column values per row
+    """
+    return list(zip(*(df[column].iloc[positions].tolist() for column in columns)))
 
 
-def get_paginated_results(df: pd.DataFrame, page: int, items_per_page: int):
+def get_paginated_results(
+    df: pd.DataFrame, version: int, results: RankedResults, page: int, items_per_page: int
+) -> List[tuple]:
     """
-     Return a slice of the dataframe for the current page.
-     This is necessary for performance reasons
+     Return the rows on the current page of the ranked results.
+     Only this page is sorted and materialized, and pages seen before are served from the session's page cache,
+     so turning pages costs the same however many books matched.
 
      Args:
-         df: DataFrame containing all search results
+         df: DataFrame containing all book data
+         version: Dataset version of df
+         results: Ranked row positions of all search results
          page: Current page number (1-based)
          items_per_page: Number of items to display per page
 
      Returns:
-         DataFrame slice for the current page
+         Tuples of the RESULT_COLUMNS of the books on the page
      """
-    start_idx = (page - 1) * items_per_page
-    end_idx = start_idx + items_per_page
-    return df.iloc[start_idx:end_idx]
+    page_cache = st.session_state.page_cache
+    key = (version, page, items_per_page)
+    if key not in page_cache:
+        if len(page_cache) >= MAX_CACHED_PAGES:
+            page_cache.pop(next(iter(page_cache)))
+        page_cache[key] = get_rows(df, results.page(page, items_per_page), RESULT_COLUMNS)
+    return page_cache[key]
+
 
+def set_search_results(results: RankedResults):
+    """Store new search results and go back to their first page."""
+    st.session_state.search_results = results
+    st.session_state.current_page = 1
+    st.session_state.page_cache = {}
 
-def display_pagination_controls(total_items: int):
+
+def change_page(page_key: str, step: int):
+    """Callback moving a paginated list forward or back"""
+    st.session_state[page_key] += step
+
+
+@metrics.timed("render", function="display_pagination_controls")
+def display_pagination_controls(total_items: int, page_key: str = "current_page"):
     """
     Display pagination controls and handle page navigation.
+    The buttons only change the page in callbacks; inside a fragment the following rerun is limited to the
+    fragment, so the data is not loaded and filtered again.
 
     Args:
-        total_items: Total number of items in the search results
+        total_items: Total number of items in the paginated list
+        page_key: Session state key of the list's current page
     """
     total_pages = math.ceil(total_items / st.session_state.items_per_page)
+    current_page = st.session_state[page_key]
 
     # Create three columns for pagination controls
     col1, col2, col3 = st.columns([1, 2, 1])
 
     with col1:
-        if st.button("← Previous", disabled=st.session_state.current_page == 1):
-            st.session_state.current_page -= 1
-            st.rerun()
+        st.button(
+            "← Previous",
+            key=f"{page_key}_previous",
+            disabled=current_page == 1,
+            on_click=change_page,
+            args=(page_key, -1)
+        )
 
     with col2:
-        st.write(f"Page {st.session_state.current_page} of {total_pages}")
+        st.write(f"Page {current_page} of {total_pages}")
 
     with col3:
-        if st.button("Next →", disabled=st.session_state.current_page == total_pages):
-            st.session_state.current_page += 1
-            st.rerun()
-
-
-def display_library_section(df: pd.DataFrame):
+        st.button(
+            "Next →",
+            key=f"{page_key}_next",
+            disabled=current_page == total_pages,
+            on_click=change_page,
+            args=(page_key, 1)
+        )
+
+
+@st.fragment
+@metrics.timed("render", function="display_library_section")
+def display_library_section():
     """
     Display the user's library with options to update reading status.
-    Now simplified since ISBNs are guaranteed unique.
+    Books are joined to the dataset through the ISBN index and only the current page is rendered, so rendering
+    costs the same however large the catalogue and the library are. Buttons change the persistent library in
+    callbacks and only rerun this fragment, which reads the current dataset and index again, as a refresh
+    may have replaced them since the last full run.
     """
     st.header("My Library")
 
-    if not st.session_state.library:
+    store = get_user_library_store()
+    df, _, (isbn_index,) = get_dataset_cache().get_data_with_indexes("isbn")
+    library_positions, library_isbns = store.get_positions(st.session_state.user_id, isbn_index)
+    if not len(library_positions):
         st.info("Your library is empty. Add books from the search results!")
         return
 
-    library_books = df[df["isbn"].isin(st.session_state.library.keys())]
-
-    for _, book in library_books.iterrows():  # No need for enumerate anymore
+    library = store.get_library(st.session_state.user_id)
+    total_pages = math.ceil(len(library_positions) / st.session_state.items_per_page)
+    st.session_state.library_page = min(st.session_state.library_page, total_pages)
+    start = (st.session_state.library_page - 1) * st.session_state.items_per_page
+    page = slice(start, start + st.session_state.items_per_page)
+
+    for (isbn, title, author), stored_isbn in zip(
+        get_rows(df, library_positions[page], LIBRARY_COLUMNS), library_isbns[page]
+    ):
+        status = library.get(stored_isbn)
+        if status is None:
+            # Removed by another session of the same user since the positions were resolved
+            continue
         col1, col2, col3 = st.columns([3, 1, 1])
 
         with col1:
-            st.write(f"**{book['title']}**")
-            st.write(f"Author: {book['author']}")
-            st.write(f"Status: {st.session_state.library[book['isbn']]}")
+            st.write(f"**{title}**")
+            st.write(f"Author: {author}")
+            st.write(f"Status: {status}")
 
         with col2:
-            current_status = st.session_state.library[book["isbn"]]
-            if current_status == "Want to Read":
-                if st.button(
+            if status == "Want to Read":
+                st.button(
                     "Mark as Read",
-                    key=f"read_{book['isbn']}",
+                    key=f"read_{isbn}",
+                    on_click=store.set_status,
+                    args=(st.session_state.user_id, stored_isbn, "Read"),
                     help="Mark this book as read"
-                ):
-                    st.session_state.library[book["isbn"]] = "Read"
-                    st.rerun()
+                )
 
         with col3:
-            if st.button(
+            st.button(
                 "Remove",
-                key=f"remove_{book['isbn']}",
+                key=f"remove_{isbn}",
+                on_click=store.remove,
+                args=(st.session_state.user_id, stored_isbn),
                 help="Remove this book from your library"
-            ):
-                del st.session_state.library[book['isbn']]
-                st.rerun()
+            )
 
         st.divider()
 
+    if total_pages > 1:
+        display_pagination_controls(len(library_positions), "library_page")
+
+    display_recommendations()
+
+
+@metrics.timed("render", function="display_recommendations")
+def display_recommendations():
+    """
+    Display books similar to the ones in the user's library.
+    The whole library is scored against the catalogue in one sparse matrix product.
+    """
+    st.subheader("Recommended for You")
+
+    with st.spinner("Finding similar books..."):
+        # The recommender may be built after the library was resolved, so both come from one dataset version
+        df, _, (isbn_index, recommender) = get_dataset_cache().get_data_with_indexes("isbn", "recommender")
+        library_positions, _ = get_user_library_store().get_positions(st.session_state.user_id, isbn_index)
+        positions, _ = recommender.recommend(library_positions, k=5)
+
+    if not len(positions):
+        st.info("Add more books to your library to get recommendations.")
+        return
+
+    for isbn, title, author in get_rows(df, positions, LIBRARY_COLUMNS):
+        col1, col2 = st.columns([3, 1])
+
+        with col1:
+            st.write(f"**{title}**")
+            st.write(f"Author: {author}")
+
+        with col2:
+            st.button(
+                "Add to Library",
+                key=f"recommended_{isbn}",
+                on_click=add_to_library,
+                args=(isbn,),
+                help="Add this book to your library"
+            )
+
 
 def add_to_library(isbn: str):
     """Callback function to add book to library"""
-    st.session_state.library[isbn] = "Want to Read"
-    print(f"DEBUG: Added {isbn} to library via callback")
+    get_user_library_store().add(st.session_state.user_id, isbn)
 
 
-def display_search_results(df: pd.DataFrame):
+@st.fragment
+@metrics.timed("render", function="display_search_results")
+def display_search_results():
     """
     Display paginated search results with simplified key generation.
+    Runs as a fragment: turning pages or adding a book reruns only this function with the stored results.
     """
     st.header("Search Results")
 
-    if st.session_state.search_results.empty:
+    cache = get_dataset_cache()
+    df, version, _ = cache.get_data_with_indexes()
+    # The stored positions only hold for the row layout they were computed on; a reload since then drops them
+    if st.session_state.positions_version != cache.positions_version:
+        set_search_results(RankedResults.empty())
+
+    if not len(st.session_state.search_results):
         st.warning("No books found matching your criteria")
         return
 
+    library = get_user_library_store().get_library(st.session_state.user_id)
     total_results = len(st.session_state.search_results)
 
     current_page_results = get_paginated_results(
+        df,
+        version,
         st.session_state.search_results,
         st.session_state.current_page,
         st.session_state.items_per_page
@@ -138,21 +276,21 @@ def display_search_results(df: pd.DataFrame):
 
     st.write(f"Found {total_results} books. Showing {len(current_page_results)} results.")
 
-    for _, book_data in current_page_results.iterrows():
+    for isbn, title, author, rating in current_page_results:
         col1, col2 = st.columns([3, 1])
 
         with col1:
-            st.write(f"**{book_data['title']}**")
-            st.write(f"Author: {book_data['author']}")
-            st.write(f"Rating: {book_data['rating']:.2f}")
+            st.write(f"**{title}**")
+            st.write(f"Author: {author}")
+            st.write(f"Rating: {rating:.2f}")
 
         with col2:
-            if book_data["isbn"] not in st.session_state.library:
+            if isbn not in library:
                 st.button(
                     "Add to Library",
-                    key=f"add_{book_data['isbn']}_{st.session_state.current_page}",
+                    key=f"add_{isbn}_{st.session_state.current_page}",
                     on_click=add_to_library,
-                    args=(book_data["isbn"],),
+                    args=(isbn,),
                     help="Add this book to your library"
                 )
             else:
@@ -164,29 +302,67 @@ def display_search_results(df: pd.DataFrame):
         display_pagination_controls(total_results)
 
 
+def toggle_metrics():
+    """Callback switching metric collection on or off for the whole process"""
+    metrics.enabled = st.session_state.collect_metrics
+
+
+@metrics.timed("render", function="main")
 def main():
     st.title("Book Recommendation System")
 
-    print("DEBUG: Starting main function")
-
     # Initialize session state first
     initialize_session_state()
 
-    # Load data
+    # Libraries are stored persistently per user name; without one the library lives in this session only.
+    # The name is not authenticated, this is a single-user demo: entering a name opens that library.
+    user_name = st.sidebar.text_input(
+        "User name",
+        key="user_name",
+        placeholder="Leave empty for a library of this session only",
+        help="Names are not protected: anyone entering the same name sees and changes the same library."
+    )
+    st.session_state.user_id = user_name.strip()
+
+    # Timings of loading, queries and rendering are collected process-wide while enabled
+    st.sidebar.toggle(
+        "Collect performance metrics", value=metrics.enabled, key="collect_metrics", on_change=toggle_metrics
+    )
+    if metrics.enabled:
+        st.sidebar.download_button(
+            "Download metrics",
+            json.dumps(metrics.snapshot(), indent=2),
+            file_name="metrics.json",
+            mime="application/json"
+        )
+
+    # Load data; the DataFrame is shared read-only by all sessions of this process
     try:
-        df = DataLoader.get_book_data()
-        print(f"DEBUG: Data loaded, shape: {df.shape}")
+        cache = get_dataset_cache()
+        # The first session starts building the indexes in the background while the page renders
+        cache.start_warm_up()
+        df = cache.get_data()
+        cache.start_auto_refresh()
+        if not cache.ready.is_set():
+            st.sidebar.caption("Search indexes are being built; a search waits for the ones it needs")
+        logger.debug("Data loaded, shape: %s", df.shape)
         #st.success("Data loaded successfully!")
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return
 
+    # Search results hold row positions, which only stay valid while the dataset keeps its row layout.
+    # The library is keyed by ISBN and survives every refresh.
+    if st.session_state.get("positions_version") != cache.positions_version:
+        st.session_state.positions_version = cache.positions_version
+        set_search_results(RankedResults.empty())
+
     # Create main tabs for library and search
     main_tab1, main_tab2 = st.tabs(["My Library", "Search Books"])
 
     # Library Tab
     with main_tab1:
-        display_library_section(df)
+        display_library_section()
 
     # Search Tab
     with main_tab2:
@@ -196,7 +372,8 @@ def main():
             "Rating",
             "Page Count",
             "Genre",
-            "ISBN Search"
+            "ISBN Search",
+            "Combined Search"
         ])
 
         # Tab 1: Title and Author Search
@@ -207,14 +384,15 @@ def main():
                 st.subheader("Search by Title")
                 title_query = st.text_input("Enter title keywords", key="title_input")
                 title_exact = st.checkbox("Exact title match", key="title_exact")
+                title_fuzzy = st.checkbox("Tolerate typos", key="title_fuzzy")
 
                 if st.button("Search by Title", key="title_search"):
                     if title_query:
                         try:
-                            st.session_state.search_results = DataFilter.filter_by_title(
-                                df, title_query, title_exact
+                            set_search_results(
+                                get_dataset_cache().query().title(title_query, title_exact, title_fuzzy).ranked()
                             )
-                            display_search_results(st.session_state.search_results)
+                            display_search_results()
                         except ValueError as e:
                             st.error(str(e))
 
@@ -222,14 +400,15 @@ def main():
                 st.subheader("Search by Author")
                 author_query = st.text_input("Enter author name", key="author_input")
                 author_exact = st.checkbox("Exact author match", key="author_exact")
+                author_fuzzy = st.checkbox("Tolerate typos", key="author_fuzzy")
 
                 if st.button("Search by Author", key="author_search"):
                     if author_query:
                         try:
-                            st.session_state.search_results = DataFilter.filter_by_author(
-                                df, author_query, author_exact
+                            set_search_results(
+                                get_dataset_cache().query().author(author_query, author_exact, author_fuzzy).ranked()
                             )
-                            display_search_results(df)
+                            display_search_results()
                         except ValueError as e:
                             st.error(str(e))
 
@@ -244,13 +423,14 @@ def main():
                 0.5,
                 key="rating_slider"
             )
+            # Counting needs two binary searches on the sorted rating index, no rows are touched
+            rating_index = get_dataset_cache().get_index("rating")
+            st.caption(f"{rating_index.count(min_rating)} books are rated {min_rating:.1f} or higher")
 
             if st.button("Apply Rating Filter", key="rating_filter"):
                 try:
-                    st.session_state.search_results = DataFilter.filter_by_minimum_rating(
-                        df, min_rating
-                    )
-                    display_search_results(df)
+                    set_search_results(get_dataset_cache().query().min_rating(min_rating).ranked())
+                    display_search_results()
                 except ValueError as e:
                     st.error(str(e))
 
@@ -273,41 +453,46 @@ def main():
                     value=1000,
                     key="max_pages"
                 )
+            page_count = get_dataset_cache().get_index("pages").count(
+                min_pages if min_pages > 0 else None,
+                max_pages if max_pages > 0 else None
+            )
+            st.caption(f"{page_count} books match this page range")
 
             if st.button("Apply Page Filter", key="page_filter"):
                 try:
-                    results = df
-                    if min_pages > 0:
-                        results = DataFilter.filter_by_minimum_pages(results, min_pages)
-                    if max_pages > 0:
-                        results = DataFilter.filter_by_maximum_pages(results, max_pages)
-                    st.session_state.search_results = results
-                    display_search_results(df)
+                    # Both bounds are combined into one predicate, the results are materialized once
+                    set_search_results(get_dataset_cache().query().pages(
+                        int(min_pages) if min_pages > 0 else None,
+                        int(max_pages) if max_pages > 0 else None
+                    ).ranked())
+                    display_search_results()
                 except ValueError as e:
                     st.error(str(e))
 
         # Tab 4: Genre
         with search_tabs[3]:
             st.subheader("Filter by Genre")
-            # Extract unique genres from the string representation of lists
-            all_genres = set()
-            for genres_str in df["genres"].dropna():
-                try:
-                    # Remove brackets and quotes, split by comma and strip whitespace
-                    genres = [g.strip().strip('"\'') for g in genres_str.strip('[]').split(',')]
-                    all_genres.update(genres)
-                except:
-                    continue
-
-            genres = sorted(all_genres)
-            selected_genre = st.selectbox("Select Genre", genres, key="genre_select")
+            # Genres are parsed once per dataset into the shared genre index
+            with metrics.span("render", function="genre_options"):
+                genre_index = get_dataset_cache().get_index("genre")
+                genres = genre_index.sorted_genres()
+                # Catalogue-wide counts come from one bincount over the shared facet codes
+                catalogue_genre_counts = get_dataset_cache().get_index("facets").counts().get("genre")
+                selected_genres = st.multiselect(
+                    "Select Genres",
+                    genres,
+                    format_func=lambda genre: f"{genre} ({catalogue_genre_counts.get(genre, 0):,})",
+                    key="genre_select"
+                )
+            match_all_genres = st.checkbox("Books must have all selected genres", key="genre_match_all")
 
             if st.button("Apply Genre Filter", key="genre_filter"):
                 try:
-                    st.session_state.search_results = DataFilter.filter_by_genre(
-                        df, selected_genre
+                    set_search_results(
+                        get_dataset_cache().query().genre(*selected_genres, match_all=match_all_genres).ranked()
                     )
-                    display_search_results(df)
+                    display_search_results()
                 except ValueError as e:
                     st.error(str(e))
 
@@ -319,17 +504,70 @@ def main():
             if st.button("Search by ISBN", key="isbn_search"):
                 if isbn_query:
                     try:
-                        st.session_state.search_results = DataFilter.filter_by_isbn(
-                            df, isbn_query
-                        )
-                        display_search_results(df)
+                        set_search_results(get_dataset_cache().query().isbn(isbn_query).ranked())
+                        display_search_results()
                     except ValueError as e:
                         st.error(str(e))
 
+        # Tab 6: Combined Search
+        with search_tabs[5]:
+            st.subheader("Combine Several Criteria")
+            col1, col2 = st.columns(2)
+
+            with col1:
+                combined_title = st.text_input("Title keywords", key="combined_title")
+                combined_author = st.text_input("Author name", key="combined_author")
+            with col2:
+                combined_rating = st.slider("Minimum Rating", 0.0, 5.0, 0.0, 0.5, key="combined_rating")
+                combined_min_pages = st.number_input("Minimum Pages", min_value=0, value=0, key="combined_min_pages")
+                combined_max_pages = st.number_input("Maximum Pages", min_value=0, value=0, key="combined_max_pages")
+
+            # Live facet counts of the other criteria. Streamlit reruns every tab on each interaction, so the counts
+            # are cached by query in the shared query cache and only computed when these inputs change
+            try:
+                query = get_dataset_cache().query()
+                if combined_title:
+                    query = query.title(combined_title)
+                if combined_author:
+                    query = query.author(combined_author)
+                if combined_rating > 0:
+                    query = query.min_rating(combined_rating)
+                if combined_min_pages > 0 or combined_max_pages > 0:
+                    query = query.pages(
+                        int(combined_min_pages) if combined_min_pages > 0 else None,
+                        int(combined_max_pages) if combined_max_pages > 0 else None
+                    )
+                facets = query.facets()
+            except ValueError as e:
+                st.error(str(e))
+                query, facets = None, None
+
+            with col1:
+                with metrics.span("render", function="genre_options"):
+                    combined_genre_counts = facets.get("genre") if facets is not None else pd.Series(dtype="int64")
+                    combined_genres = st.multiselect(
+                        "Genres",
+                        get_dataset_cache().get_index("genre").sorted_genres(),
+                        format_func=lambda genre: f"{genre} ({combined_genre_counts.get(genre, 0):,})",
+                        key="combined_genres"
+                    )
+            if facets is not None:
+                st.caption(f"{facets.total} books match the title, author, rating and page criteria")
+
+            if st.button("Search", key="combined_search", disabled=query is None):
+                try:
+                    if combined_genres:
+                        query = query.genre(*combined_genres)
+                    set_search_results(query.ranked())
+                    display_search_results()
+                except ValueError as e:
+                    st.error(str(e))
+
         # Reset button for search results
         if st.button("Reset All Filters", key="reset_filters"):
-            st.session_state.search_results = df
-            display_search_results(df)
+            # The whole catalogue is ranked once per dataset and shared by all sessions
+            set_search_results(get_dataset_cache().get_index("ranked_books"))
+            display_search_results()
 
 
 if __name__ == "__main__":
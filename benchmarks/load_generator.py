@@ -0,0 +1,175 @@
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+from benchmarks.synthetic_catalogue import write_catalogue
+from src.api.server import SearchServer
+from src.data.dataset_cache import DatasetCache
+
+
+def request_mix(isbns: List[str], n_requests: int, distinct: int, seed: int = 0) -> List[Tuple[str, str, bytes]]:
+    """
+    Build a repeatable mix of search, pagination and ISBN batch requests.
+
+    Args:
+        isbns (List[str]): ISBNs of the catalogue to look up
+        n_requests (int): Number of requests
+        distinct (int): Number of distinct requests the mix is drawn from; fewer means more coalescing and caching
+        seed (int): Seed of the random generator
+
+    Returns:
+        List[Tuple[str, str, bytes]]: Method, target and body of every request
+    """
+    rng = np.random.default_rng(seed)
+    words = ["night", "star", "wind", "dream", "house", "king", "shadow", "light", "fire", "sea"]
+    genres = ["Fantasy", "Romance", "Mystery", "Horror", "History", "Poetry", "Science Fiction"]
+
+    templates = []
+    for number in range(distinct):
+        kind = number % 5
+        if kind == 0:
+            params = {"title": words[number % len(words)], "page": number // len(words) % 5 + 1}
+        elif kind == 1:
+            params = {"genre": genres[number % len(genres)], "min_rating": 3.5 + number % 3 * 0.25}
+        elif kind == 2:
+            params = {"min_pages": 100 + number % 7 * 50, "max_pages": 400 + number % 5 * 100, "language": "English"}
+        elif kind == 3:
+            params = {"author": ["smith", "garcia", "chen", "anna", "peter"][number % 5], "per_page": 25}
+        else:
+            batch = [str(isbn) for isbn in rng.choice(isbns, min(20, len(isbns)), replace=False)]
+            templates.append(("POST", "/isbns", json.dumps({"isbns": batch}).encode()))
+            continue
+        templates.append(("GET", "/search?" + urlencode(params), b""))
+
+    return [templates[index] for index in rng.integers(0, len(templates), n_requests)]
+
+
+async def run_load(url: str, requests: List[Tuple[str, str, bytes]], concurrency: int) -> dict:
+    """
+    Send the requests over concurrency keep-alive connections and measure every response.
+
+    Returns:
+        dict: Request count, errors by status, elapsed seconds, throughput and latency percentiles
+    """
+    parts = urlsplit(url)
+    queue = asyncio.Queue()
+    for request in requests:
+        queue.put_nowait(request)
+    latencies, errors = [], {}
+
+    async def client():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port)
+        try:
+            while not queue.empty():
+                method, target, body = queue.get_nowait()
+                start = time.perf_counter()
+                writer.write(
+                    f"{method} {target} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                status = int((await reader.readline()).split()[1])
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    errors[status] = errors.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies)
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_seconds": elapsed,
+        "throughput_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_seconds": float(np.percentile(latencies, 50)) if len(latencies) else None,
+        "p99_seconds": float(np.percentile(latencies, 99)) if len(latencies) else None,
+        "max_seconds": float(latencies.max()) if len(latencies) else None,
+    }
+
+
+def start_local_server(csv_path: Path, workers: int) -> Tuple[str, SearchServer]:
+    """Serve a catalogue from a background event loop and return its URL."""
+    server = SearchServer(DatasetCache(csv_path), max_workers=workers)
+    started = threading.Event()
+    port = []
+
+    def run():
+        loop = asyncio.new_event_loop()
+        port.append(loop.run_until_complete(server.start("127.0.0.1", 0)))
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="search-api", daemon=True).start()
+    started.wait()
+    return f"http://127.0.0.1:{port[0]}", server
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure throughput and latency of the search API.")
+    parser.add_argument("--url", help="Running server to load (default: start one on a synthetic catalogue)")
+    parser.add_argument("--rows", type=int, default=100_000, help="Synthetic catalogue size (default: 100000)")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests to send (default: 5000)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Parallel connections (default: 32)")
+    parser.add_argument("--distinct", type=int, default=200,
+                        help="Distinct requests in the mix (default: 200)")
+    parser.add_argument("--workers", type=int, default=4, help="Worker threads of the local server (default: 4)")
+    parser.add_argument("--workdir", type=Path, default=Path(tempfile.gettempdir()) / "book-benchmarks",
+                        help="Directory caching the generated catalogues")
+    parser.add_argument("--output", type=Path, help="JSON file for the results (default: stdout)")
+    args = parser.parse_args(argv)
+
+    csv_path = args.workdir / f"catalogue_{args.rows}.csv"
+    if not csv_path.exists():
+        write_catalogue(csv_path, args.rows)
+
+    server = None
+    url = args.url
+    if url is None:
+        url, server = start_local_server(csv_path, args.workers)
+
+    # The ISBNs are taken from the synthetic catalogue, so lookups against another server mostly miss
+    cache = server.cache if server is not None else DatasetCache(csv_path)
+    requests = request_mix(cache.get_data()["isbn"].to_numpy(dtype=object), args.requests, args.distinct)
+
+    report = asyncio.run(run_load(url, requests, args.concurrency))
+    report["url"] = url
+    if server is not None:
+        report["rows"] = args.rows
+        report["server"] = {**server.stats, "query_cache": server.cache.query_cache.stats()}
+
+    print(f"{report['requests']} requests in {report['elapsed_seconds']:.2f}s: "
+          f"{report['throughput_per_second']:.0f}/s, p50 {report['p50_seconds'] * 1000:.1f}ms, "
+          f"p99 {report['p99_seconds'] * 1000:.1f}ms, errors {report['errors']}", file=sys.stderr)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
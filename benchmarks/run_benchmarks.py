@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from benchmarks.synthetic_catalogue import write_catalogue
+from src.data.data_loader import DataLoader
+from src.data.dataset_cache import INDEX_BUILDERS
+from src.data.filters import DataFilter
+from src.data.query import BookQuery
+from src.data.sharding import ShardedExecutor
+
+# Indexes accepted by the DataFilter methods, built once per catalogue for the indexed runs
+FILTER_INDEXES = ["title", "author", "genre", "rating", "pages", "isbn"]
+
+# Cases whose DataFilter method does not accept an index
+SCAN_ONLY_CASES = {"filter_by_language"}
+
+# Index-free queries timed with different numbers of shard workers to check the parallel scaling; fuzzy scans
+# hold the GIL and are never sharded
+SHARDED_QUERY_CASES = {
+    "query_scan[title]": lambda query: query.title("night"),
+    "query_scan[genres]": lambda query: query.genre("Fantasy", "Romance", match_all=True),
+    "query_scan[isbn]": lambda query: query.isbn("9780000000001"),
+    "query_scan[pages+rating]": lambda query: query.pages(100, 500).min_rating(3.5),
+}
+
+
+def filter_cases(book_data: pd.DataFrame) -> Dict[str, Callable[[dict], pd.DataFrame]]:
+    """
+    Return one representative call per DataFilter method.
+
+    Every case takes a dict of prebuilt indexes, which is empty for the scanning runs.
+    """
+    sample_isbns = book_data["isbn"].iloc[:: max(len(book_data) // 100, 1)].tolist()
+    isbn = sample_isbns[len(sample_isbns) // 2]
+
+    return {
+        "filter_by_title": lambda idx: DataFilter.filter_by_title(book_data, "night", False, idx.get("title")),
+        "filter_by_title[exact]": lambda idx: DataFilter.filter_by_title(
+            book_data, book_data["title"].iloc[0], True, idx.get("title")
+        ),
+        "filter_by_title[fuzzy]": lambda idx: DataFilter.filter_by_title(
+            book_data, "shadw nigth", False, idx.get("title"), fuzzy=True
+        ),
+        "filter_by_author": lambda idx: DataFilter.filter_by_author(book_data, "smith", False, idx.get("author")),
+        "filter_by_minimum_rating": lambda idx: DataFilter.filter_by_minimum_rating(
+            book_data, 4.0, idx.get("rating")
+        ),
+        "filter_by_language": lambda idx: DataFilter.filter_by_language(book_data, "english"),
+        "filter_by_genre": lambda idx: DataFilter.filter_by_genre(book_data, "Fantasy", idx.get("genre")),
+        "filter_by_genres": lambda idx: DataFilter.filter_by_genres(
+            book_data, ["Fantasy", "Romance"], True, idx.get("genre")
+        ),
+        "filter_by_minimum_pages": lambda idx: DataFilter.filter_by_minimum_pages(book_data, 300, idx.get("pages")),
+        "filter_by_maximum_pages": lambda idx: DataFilter.filter_by_maximum_pages(book_data, 300, idx.get("pages")),
+        "filter_by_isbn": lambda idx: DataFilter.filter_by_isbn(book_data, isbn, idx.get("isbn")),
+        "filter_by_isbns": lambda idx: DataFilter.filter_by_isbns(book_data, sample_isbns, idx.get("isbn")),
+    }
+
+
+# Seconds between two samples of the Arrow pool and the resident set size while a call runs
+MEMORY_SAMPLE_INTERVAL = 0.001
+
+
+def resident_set_bytes() -> Optional[int]:
+    """Return the resident set size of this process, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def sample_peak_memory(function: Callable[[], object]) -> dict:
+    """
+    Run a function while sampling the Arrow memory pool and the resident set size from a second thread.
+
+    tracemalloc only sees allocations of the Python allocator, while the strings and genre lists of the catalogue
+    live in Arrow buffers. Peaks shorter than the sample interval can be missed.
+
+    Returns:
+        dict: Peak growth over the values before the call of "peak_arrow_bytes" and "peak_rss_bytes" (None
+            without /proc)
+    """
+    arrow_start, rss_start = pa.total_allocated_bytes(), resident_set_bytes()
+    peaks = {"arrow": arrow_start, "rss": rss_start}
+    done = threading.Event()
+
+    def sample():
+        while True:
+            peaks["arrow"] = max(peaks["arrow"], pa.total_allocated_bytes())
+            if rss_start is not None:
+                peaks["rss"] = max(peaks["rss"], resident_set_bytes() or 0)
+            if done.wait(MEMORY_SAMPLE_INTERVAL):
+                return
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        function()
+    finally:
+        done.set()
+        sampler.join()
+
+    return {
+        "peak_arrow_bytes": peaks["arrow"] - arrow_start,
+        "peak_rss_bytes": None if rss_start is None else peaks["rss"] - rss_start,
+    }
+
+
+def measure(function: Callable[[], object], repeat: int, trace_memory: bool = True) -> dict:
+    """
+    Time a function cold (first call) and warm (median of the following calls) and record its peak memory.
+
+    Memory is measured in separate calls, so neither tracing nor sampling distorts the timings: the Python
+    allocator through tracemalloc, Arrow buffers through the Arrow memory pool and the whole process through its
+    resident set size.
+    """
+    start = time.perf_counter()
+    function()
+    cold = time.perf_counter() - start
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        warm.append(time.perf_counter() - start)
+
+    result = {
+        "cold_seconds": cold,
+        "warm_seconds": statistics.median(warm) if warm else None,
+        "warm_min_seconds": min(warm) if warm else None,
+        "warm_runs": len(warm),
+    }
+
+    if trace_memory:
+        tracemalloc.start()
+        try:
+            function()
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        result.update(sample_peak_memory(function))
+
+    return result
+
+
+def benchmark_catalogue(csv_path: Path, rows: int, repeat: int, worker_counts: List[int]) -> List[dict]:
+    """Run all benchmarks against one catalogue CSV."""
+    results = []
+
+    def record(operation: str, measurement: dict):
+        results.append({"rows": rows, "operation": operation, **measurement})
+        warm = measurement["warm_seconds"]
+        print(f"{rows:>10} {operation:<40} cold {measurement['cold_seconds']:.4f}s "
+              f"warm {'-' if warm is None else f'{warm:.4f}s'}", file=sys.stderr)
+
+    record("get_book_data[csv]", measure(lambda: DataLoader.get_book_data(csv_path, use_snapshot=False), repeat))
+
+    # The cold snapshot run parses the CSV and writes the snapshot, warm runs memory-map it
+    shutil.rmtree(DataLoader.get_snapshot_path(csv_path).parent, ignore_errors=True)
+    record("get_book_data[snapshot]", measure(lambda: DataLoader.get_book_data(csv_path), repeat))
+
+    book_data = DataLoader.get_book_data(csv_path)
+
+    indexes = {}
+    for name in FILTER_INDEXES:
+        record(f"build_index[{name}]", measure(lambda: INDEX_BUILDERS[name](book_data), 0, trace_memory=False))
+        indexes[name] = INDEX_BUILDERS[name](book_data)
+
+    cases = filter_cases(book_data)
+    covered = {operation.split("[")[0] for operation in cases}
+    for method in sorted(name for name in dir(DataFilter) if name.startswith("filter_by_") and name not in covered):
+        print(f"WARNING: DataFilter.{method} has no benchmark case", file=sys.stderr)
+
+    for operation, case in cases.items():
+        record(f"{operation}[scan]", measure(lambda: case({}), repeat))
+        if operation not in SCAN_ONLY_CASES:
+            record(f"{operation}[indexed]", measure(lambda: case(indexes), repeat))
+
+    for workers in worker_counts:
+        executor = ShardedExecutor(max_workers=workers)
+        for operation, build in SHARDED_QUERY_CASES.items():
+            record(f"{operation}[workers={workers}]", measure(
+                lambda: build(BookQuery(book_data, executor=executor)).positions(), repeat, trace_memory=False
+            ))
+
+    return results
+
+
+def compare(results: List[dict], baseline_path: Path, max_slowdown: float) -> List[str]:
+    """
+    Compare warm timings with a previous run.
+
+    Returns:
+        List[str]: Description of every operation slower than max_slowdown times its baseline
+    """
+    baseline = json.loads(Path(baseline_path).read_text())
+    previous = {(entry["rows"], entry["operation"]): entry for entry in baseline["results"]}
+
+    regressions = []
+    for entry in results:
+        before = previous.get((entry["rows"], entry["operation"]))
+        if not before or not before.get("warm_seconds") or entry.get("warm_seconds") is None:
+            continue
+        slowdown = entry["warm_seconds"] / before["warm_seconds"]
+        if slowdown > max_slowdown:
+            regressions.append(
+                f"{entry['operation']} on {entry['rows']} rows: {before['warm_seconds']:.4f}s -> "
+                f"{entry['warm_seconds']:.4f}s ({slowdown:.2f}x)"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark DataLoader and the DataFilter methods.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000],
+                        help="Catalogue sizes to benchmark, e.g. 10000 1000000 10000000 (default: 10000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Warm runs per operation (default: 5)")
+    parser.add_argument("--workdir", type=Path, default=Path(tempfile.gettempdir()) / "book-benchmarks",
+                        help="Directory caching the generated catalogues")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        help="Shard worker counts for the parallel scans (default: 1 and the number of cores)")
+    parser.add_argument("--output", type=Path, help="JSON file for the results (default: stdout)")
+    parser.add_argument("--compare", type=Path, help="Results of a previous run to check for regressions")
+    parser.add_argument("--max-slowdown", type=float, default=1.25,
+                        help="Allowed warm time ratio against --compare before failing (default: 1.25)")
+    args = parser.parse_args(argv)
+
+    worker_counts = args.workers or sorted({1, os.cpu_count() or 1})
+
+    results = []
+    for rows in args.rows:
+        csv_path = args.workdir / f"catalogue_{rows}.csv"
+        if not csv_path.exists():
+            write_catalogue(csv_path, rows)
+        results.extend(benchmark_catalogue(csv_path, rows, args.repeat, worker_counts))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_slowdown)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+from benchmarks.synthetic_catalogue import write_catalogue
+
+# Run in a fresh interpreter per mode, so imports and the dataset load are measured from a cold process.
+# Times are seconds since the measuring code started, after the interpreter itself.
+CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from src.data.dataset_cache import DatasetCache
+imported = time.perf_counter() - start
+
+cache = DatasetCache(sys.argv[1])
+ready = None
+if sys.argv[2] == "warm":
+    cache.start_warm_up()
+    cache.ready.wait()
+    ready = time.perf_counter() - start
+
+query_start = time.perf_counter()
+results = cache.query().title("night").min_rating(3.5).ranked()
+cache.get_data().iloc[results.page(1, 10)]
+first_query = time.perf_counter()
+
+print(json.dumps({
+    "import_seconds": imported,
+    "ready_seconds": ready,
+    "first_query_latency_seconds": first_query - query_start,
+    "time_to_first_query_seconds": first_query - start,
+    "heavy_modules_imported": sorted(name for name in ("sklearn", "scipy") if name in sys.modules),
+    "startup": cache.startup,
+}))
+"""
+
+
+def measure_startup(csv_path: Path, mode: str) -> dict:
+    """
+    Start a fresh process and time its imports, warm-up and first query.
+
+    Args:
+        csv_path (Path): Catalogue to load
+        mode (str): "cold" answers the first query building everything on demand, "warm" runs the warm-up and
+            waits for readiness first, as a replica does before it receives traffic
+
+    Returns:
+        dict: Seconds until imports, readiness and the first query were done, and the first query's latency
+    """
+    completed = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, str(csv_path), mode],
+        capture_output=True, text=True, check=True, cwd=Path(__file__).resolve().parent.parent
+    )
+    return {"mode": mode, **json.loads(completed.stdout.strip().splitlines()[-1])}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure start-up and time-to-first-query of a fresh process.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Synthetic catalogue size (default: 100000)")
+    parser.add_argument("--modes", nargs="+", choices=["cold", "warm"], default=["cold", "warm"],
+                        help="Start-up modes to measure (default: both)")
+    parser.add_argument("--workdir", type=Path, default=Path(tempfile.gettempdir()) / "book-benchmarks",
+                        help="Directory caching the generated catalogues")
+    parser.add_argument("--output", type=Path, help="JSON file for the results (default: stdout)")
+    args = parser.parse_args(argv)
+
+    csv_path = args.workdir / f"catalogue_{args.rows}.csv"
+    if not csv_path.exists():
+        write_catalogue(csv_path, args.rows)
+
+    # The first run writes the dataset snapshot and the recommender matrix, later runs start from those
+    results = [measure_startup(csv_path, mode) for mode in args.modes]
+    for result in results:
+        ready = f"ready {result['ready_seconds']:.2f}s, " if result["ready_seconds"] is not None else ""
+        print(f"{result['mode']:>5}: imports {result['import_seconds']:.2f}s, {ready}"
+              f"first query {result['first_query_latency_seconds'] * 1000:.1f}ms "
+              f"({result['time_to_first_query_seconds']:.2f}s after start)", file=sys.stderr)
+
+    report = {"rows": args.rows, "results": results}
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
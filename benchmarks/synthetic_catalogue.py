@@ -0,0 +1,125 @@
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+GENRES = [
+    "Fiction", "Fantasy", "Romance", "Young Adult", "Classics", "Science Fiction", "Mystery", "Thriller",
+    "Historical Fiction", "Horror", "Nonfiction", "History", "Biography", "Poetry", "Philosophy", "Humor",
+    "Adventure", "Crime", "Paranormal", "Contemporary", "Dystopia", "Childrens", "Graphic Novels", "Memoir",
+    "Self Help", "Psychology", "Science", "Travel", "Religion", "Art",
+]
+
+TITLE_WORDS = [
+    "the", "of", "a", "night", "star", "wind", "dream", "house", "king", "queen", "war", "love", "death", "time",
+    "river", "city", "garden", "secret", "shadow", "light", "fire", "winter", "summer", "girl", "boy", "sea",
+    "stone", "crown", "song", "storm", "silent", "lost", "last", "first", "broken", "golden", "hidden", "wild",
+]
+
+FIRST_NAMES = [
+    "Anna", "James", "Maria", "John", "Elena", "David", "Sofia", "Michael", "Laura", "Peter", "Clara", "Thomas",
+    "Emma", "Lucas", "Julia", "Daniel", "Nora", "Samuel", "Alice", "Henry", "Mia", "Oliver", "Ines", "Leo",
+]
+
+LAST_NAMES = [
+    "Smith", "Miller", "Rossi", "Dubois", "Novak", "Kim", "Garcia", "Müller", "Tanaka", "Silva", "Brown",
+    "Wilson", "Fischer", "Moreau", "Costa", "Larsen", "Nowak", "Chen", "Ivanova", "Keller", "Adams", "Baker",
+]
+
+LANGUAGES = ["English", "English", "English", "English", "Spanish", "French", "German", "Italian", "Portuguese"]
+
+# Distinct genre lists to draw from; building list strings per row would dominate generation time
+GENRE_COMBINATIONS = 5000
+
+CHUNK_SIZE = 1_000_000
+
+
+def isbn13_check_digits(bodies: np.ndarray) -> np.ndarray:
+    """Compute ISBN-13 check digits for an array of 12-digit integers."""
+    total = np.zeros(len(bodies), dtype=np.int64)
+    remaining = bodies.copy()
+    for position in range(12):
+        digit = remaining % 10
+        remaining //= 10
+        # Digits are taken from the right, the rightmost digit of the body has weight 3
+        total += digit * (3 if position % 2 == 0 else 1)
+    return (10 - total % 10) % 10
+
+
+def generate_catalogue(n_rows: int, seed: int = 0, start: int = 0) -> pd.DataFrame:
+    """
+    Generate a synthetic book catalogue in the loader's schema.
+
+    Args:
+        n_rows (int): Number of books
+        seed (int): Seed of the random generator
+        start (int): Number of the first book, so chunks of one catalogue get distinct ISBNs
+
+    Returns:
+        pd.DataFrame: Books with title, author, rating, language, genres, pages, isbn and numRatings columns,
+            including a few missing or malformed ratings and page counts like the real dataset
+    """
+    rng = np.random.default_rng([seed, start])
+    words = np.array(TITLE_WORDS, dtype=object)
+
+    titles = pd.Series(words[rng.integers(0, len(words), n_rows)]).str.capitalize()
+    for _ in range(2):
+        titles = titles + " " + words[rng.integers(0, len(words), n_rows)]
+
+    n_authors = max(n_rows // 20, 1)
+    author_ids = rng.zipf(1.5, n_rows) % n_authors
+    authors = (
+        pd.Series(np.array(FIRST_NAMES, dtype=object)[author_ids % len(FIRST_NAMES)])
+        + " "
+        + np.array(LAST_NAMES, dtype=object)[(author_ids // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        + " " + pd.Series(author_ids // (len(FIRST_NAMES) * len(LAST_NAMES))).astype(str)
+    )
+
+    combination_rng = np.random.default_rng(seed)
+    combinations = np.array([
+        str([str(genre) for genre in combination_rng.choice(GENRES, combination_rng.integers(0, 6), replace=False)])
+        for _ in range(GENRE_COMBINATIONS)
+    ], dtype=object)
+
+    ratings = rng.normal(3.9, 0.35, n_rows).clip(0, 5).round(2).astype(object)
+    ratings[rng.random(n_rows) < 0.01] = ""
+    pages = rng.lognormal(5.6, 0.5, n_rows).astype(np.int64).astype(object)
+    pages[rng.random(n_rows) < 0.02] = "unknown"
+
+    bodies = 978_000_000_000 + start + np.arange(n_rows, dtype=np.int64)
+    isbns = (bodies * 10 + isbn13_check_digits(bodies)).astype(str)
+
+    return pd.DataFrame({
+        "title": titles + " " + pd.Series(np.arange(start, start + n_rows)).astype(str),
+        "author": authors,
+        "rating": ratings,
+        "language": np.array(LANGUAGES, dtype=object)[rng.integers(0, len(LANGUAGES), n_rows)],
+        "genres": combinations[rng.integers(0, GENRE_COMBINATIONS, n_rows)],
+        "pages": pages,
+        "isbn": isbns,
+        "numRatings": rng.lognormal(6, 2, n_rows).astype(np.int64),
+    })
+
+
+def write_catalogue(path: Path, n_rows: int, seed: int = 0) -> Path:
+    """Write a synthetic catalogue to CSV in chunks, so catalogues larger than memory can be generated."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for start in range(0, n_rows, CHUNK_SIZE):
+        chunk = generate_catalogue(min(CHUNK_SIZE, n_rows - start), seed, start)
+        chunk.to_csv(path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic book catalogue CSV.")
+    parser.add_argument("--rows", type=int, default=10_000, help="Number of books (default: 10000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--output", type=Path, required=True, help="CSV file to write")
+    args = parser.parse_args()
+
+    write_catalogue(args.output, args.rows, args.seed)
+
+
+if __name__ == "__main__":
+    main()
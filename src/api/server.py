@@ -0,0 +1,479 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+from src.data.dataset_cache import DatasetCache, get_dataset_cache
+from src.data.query import BookQuery
+from src.monitoring.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Threads evaluating queries; numpy and pandas release the GIL for most of the heavy work
+DEFAULT_MAX_WORKERS = 4
+
+# Requests waiting for or running on a worker before new ones are rejected with 503
+DEFAULT_MAX_PENDING = 256
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# Upper bound of an ISBN batch lookup and of a request body
+MAX_BATCH_SIZE = 1000
+MAX_BODY_BYTES = 1024 ** 2
+
+# Search parameters and the type their values are converted to
+SEARCH_PARAMETERS = {
+    "title": str,
+    "title_exact": bool,
+    "title_fuzzy": bool,
+    "author": str,
+    "author_exact": bool,
+    "author_fuzzy": bool,
+    "min_rating": float,
+    "min_pages": int,
+    "max_pages": int,
+    "language": str,
+    "genre": list,
+    "match_all": bool,
+    "isbn": str,
+    "page": int,
+    "per_page": int,
+}
+
+
+class ApiError(Exception):
+    """Error answered with the given HTTP status and message."""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class SearchServer:
+    """
+    Asynchronous HTTP/JSON service answering book searches from the shared in-memory dataset.
+
+    Endpoints:
+        GET or POST /search: Ranked, paginated search; parameters as in SEARCH_PARAMETERS, given in the query
+            string or as a JSON object
+        POST /isbns: Batch lookup of {"isbns": [...]}, returning the books found and the missing ISBNs
+        GET /health: Liveness, readiness and, once loaded, dataset size and version
+        GET /ready: 200 once the warm-up has built the dataset and its indexes, 503 before
+        GET /stats: Request, coalescing and query cache statistics
+
+    The event loop only parses requests and writes responses. Queries run on a bounded thread pool; identical
+    queries arriving while one of them is evaluated share its result instead of being evaluated again.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[DatasetCache] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING
+    ):
+        self.cache = cache if cache is not None else get_dataset_cache()
+        self.max_pending = max_pending
+        self.stats = {"requests": 0, "coalesced": 0, "rejected": 0, "errors": 0}
+        # Seconds from creating the server until the first search was answered, None before
+        self.stats["first_query_seconds"] = None
+        self._created = time.perf_counter()
+        self._warming_up = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="search-worker")
+        self._pending = 0
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, warm_up: bool = False) -> int:
+        """
+        Load the dataset and start listening.
+
+        Args:
+            host (str): Interface to bind
+            port (int): Port to listen on, 0 for any free port
+            warm_up (bool): If True, listen at once and load the dataset and its indexes in the background;
+                GET /ready tells when they are built (default: False, load the dataset before listening)
+
+        Returns:
+            int: The port the server listens on, useful with port 0
+        """
+        self._warming_up = warm_up
+        if warm_up:
+            self.cache.start_warm_up()
+        else:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.cache.get_data)
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        port = self._server.sockets[0].getsockname()[1]
+        logger.info("Search API listening on http://%s:%d", host, port)
+        return port
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting connections and shut the worker pool down."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve the requests of one connection, keeping it open between requests unless asked otherwise."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                    headers = await self._read_headers(reader)
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request"}, False)
+                    break
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "Body too large"}, False)
+                    break
+
+                body = await reader.readexactly(length) if length > 0 else b""
+                keep_alive = (
+                    version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                    or headers.get("connection", "").lower() == "keep-alive"
+                )
+                status, payload = await self.handle(method, target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, separator, value = line.decode("latin-1").partition(":")
+            if not separator:
+                raise ValueError("Malformed header")
+            headers[name.strip().lower()] = value.strip()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, payload: dict, keep_alive: bool) -> None:
+        body = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def handle(self, method: str, target: str, body: bytes = b"") -> Tuple[HTTPStatus, dict]:
+        """
+        Answer one request.
+
+        Args:
+            method (str): HTTP method
+            target (str): Request target, path and query string
+            body (bytes): Request body, a JSON object for POST requests
+
+        Returns:
+            Tuple[HTTPStatus, dict]: Status and JSON payload of the response
+        """
+        self.stats["requests"] += 1
+        url = urlsplit(target)
+        routes = {
+            "/search": (("GET", "POST"), self._search),
+            "/isbns": (("POST",), self._isbns),
+            "/health": (("GET",), self._health),
+            "/ready": (("GET",), self._ready),
+            "/stats": (("GET",), self._stats),
+        }
+
+        with get_metrics().span("api", endpoint=url.path if url.path in routes else "unknown"):
+            try:
+                if url.path not in routes:
+                    raise ApiError(HTTPStatus.NOT_FOUND, f"Unknown endpoint {url.path}")
+                methods, endpoint = routes[url.path]
+                if method not in methods:
+                    raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, f"{url.path} accepts {', '.join(methods)}")
+                params = self._parse_json(body) if method == "POST" else self._parse_query_string(url.query)
+                return HTTPStatus.OK, await endpoint(params)
+            except ApiError as e:
+                return e.status, {"error": str(e)}
+            except Exception:
+                self.stats["errors"] += 1
+                logger.exception("Request %s %s failed", method, target)
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal server error"}
+
+    @staticmethod
+    def _parse_query_string(query: str) -> Dict[str, Any]:
+        """Return the query string parameters; only genre may be repeated."""
+        return {
+            name: values if SEARCH_PARAMETERS.get(name) is list else values[-1]
+            for name, values in parse_qs(query).items()
+        }
+
+    @staticmethod
+    def _parse_json(body: bytes) -> Dict[str, Any]:
+        try:
+            params = json.loads(body or b"{}")
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        if not isinstance(params, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return params
+
+    async def _run(self, key: tuple, function: Callable[[], dict]) -> dict:
+        """
+        Run function on the worker pool, sharing the result with identical requests already in flight.
+
+        Raises:
+            ApiError: With 503 if max_pending requests are already waiting for a worker
+        """
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        if self._pending >= self.max_pending:
+            # Only requests turned away for lack of workers count, not the 503 of /ready during the warm-up
+            self.stats["rejected"] += 1
+            raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "Server is busy, retry later")
+
+        self._pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self._executor, function)
+        self._inflight[key] = future
+
+        def done(_):
+            self._pending -= 1
+            self._inflight.pop(key, None)
+
+        future.add_done_callback(done)
+        # Shielded, so a client disconnecting does not cancel the result other requests wait for
+        return await asyncio.shield(future)
+
+    async def _search(self, params: Dict[str, Any]) -> dict:
+        values, page, per_page = parse_search_parameters(params)
+
+        def evaluate() -> dict:
+            # Built on the worker: starting a query may wait for the dataset, which must not block the event loop
+            query = build_query(self.cache, values)
+            ranked = query.ranked()
+            return {
+                "total": len(ranked),
+                "page": page,
+                "per_page": per_page,
+                "books": book_records(query.data, ranked.page(page, per_page)),
+            }
+
+        key = tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value) for name, value in values.items()
+        ))
+        try:
+            result = await self._run(("search", self.cache.version, key), evaluate)
+        except ValueError as e:
+            raise ApiError(HTTPStatus.BAD_REQUEST, str(e))
+        if self.stats["first_query_seconds"] is None:
+            self.stats["first_query_seconds"] = time.perf_counter() - self._created
+        return result
+
+    async def _isbns(self, params: Dict[str, Any]) -> dict:
+        isbns = params.get("isbns")
+        if not isinstance(isbns, list) or not all(isinstance(isbn, str) for isbn in isbns):
+            raise ApiError(HTTPStatus.BAD_REQUEST, "isbns must be a list of strings")
+        if len(isbns) > MAX_BATCH_SIZE:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"At most {MAX_BATCH_SIZE} ISBNs per request")
+
+        def lookup() -> dict:
+            # The index and the rows taken with its positions must come from the same version of the dataset
+            data, _, (isbn_index,) = self.cache.get_data_with_indexes("isbn")
+            positions = isbn_index.lookup_many(isbns)
+            found = positions >= 0
+            return {
+                "books": book_records(data, positions[found]),
+                "missing": [isbn for isbn, is_found in zip(isbns, found) if not is_found],
+            }
+
+        return await self._run(("isbns", self.cache.version, tuple(isbns)), lookup)
+
+    def is_ready(self) -> bool:
+        """Tell whether the dataset and, when warming up, its indexes are built."""
+        return self.cache.ready.is_set() if self._warming_up else self._server is not None
+
+    async def _health(self, params: Dict[str, Any]) -> dict:
+        # Never waits for the dataset, so it keeps answering while a warm-up loads it
+        ready = self.is_ready()
+        rows = None
+        if ready:
+            # Ready means loaded, but a refresh or invalidate() may have dropped the data; reloading it must not
+            # block the event loop
+            data = await asyncio.get_running_loop().run_in_executor(self._executor, self.cache.get_data)
+            rows = len(data)
+        return {"status": "ok", "ready": ready, "rows": rows, "version": self.cache.version}
+
+    async def _ready(self, params: Dict[str, Any]) -> dict:
+        if not self.is_ready():
+            raise ApiError(HTTPStatus.SERVICE_UNAVAILABLE, "Warming up")
+        return {"status": "ready", "startup": self.cache.startup}
+
+    async def _stats(self, params: Dict[str, Any]) -> dict:
+        return {**self.stats, "pending": self._pending, "query_cache": self.cache.query_cache.stats()}
+
+
+def parse_search_parameters(params: Dict[str, Any]) -> Tuple[Dict[str, Any], int, int]:
+    """
+    Check search parameters and convert them to their types, without touching the dataset.
+
+    Args:
+        params (Dict[str, Any]): Parameters named in SEARCH_PARAMETERS, as strings or JSON values
+
+    Returns:
+        Tuple[Dict[str, Any], int, int]: The converted parameters, the page number and the page size
+
+    Raises:
+        ApiError: With 400 for unknown parameters or invalid values
+    """
+    unknown = sorted(set(params) - set(SEARCH_PARAMETERS))
+    if unknown:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"Unknown parameters: {', '.join(unknown)}")
+
+    try:
+        values = {name: _convert(name, value) for name, value in params.items()}
+        page = values.get("page", 1)
+        per_page = values.get("per_page", DEFAULT_PAGE_SIZE)
+        if page < 1 or not 1 <= per_page <= MAX_PAGE_SIZE:
+            raise ValueError(f"page must be positive and per_page between 1 and {MAX_PAGE_SIZE}")
+    except ValueError as e:
+        raise ApiError(HTTPStatus.BAD_REQUEST, str(e))
+
+    return values, page, per_page
+
+
+def build_query(cache: DatasetCache, values: Dict[str, Any]) -> BookQuery:
+    """
+    Translate converted search parameters into a query over the shared dataset.
+
+    Args:
+        cache (DatasetCache): Cache holding the dataset
+        values (Dict[str, Any]): Parameters as returned by parse_search_parameters
+
+    Returns:
+        BookQuery: The query
+
+    Raises:
+        ApiError: With 400 for values the query rejects
+    """
+    try:
+        query = cache.query()
+        if "title" in values:
+            query.title(values["title"], values.get("title_exact", False), values.get("title_fuzzy", False))
+        if "author" in values:
+            query.author(values["author"], values.get("author_exact", False), values.get("author_fuzzy", False))
+        if "min_rating" in values:
+            query.min_rating(values["min_rating"])
+        if "min_pages" in values or "max_pages" in values:
+            query.pages(values.get("min_pages"), values.get("max_pages"))
+        if "language" in values:
+            query.language(values["language"])
+        if "genre" in values:
+            query.genre(*values["genre"], match_all=values.get("match_all", False))
+        if "isbn" in values:
+            query.isbn(values["isbn"])
+    except ValueError as e:
+        raise ApiError(HTTPStatus.BAD_REQUEST, str(e))
+
+    return query
+
+
+def _convert(name: str, value: Any) -> Any:
+    """Convert a parameter value to the type given in SEARCH_PARAMETERS."""
+    kind = SEARCH_PARAMETERS[name]
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if str(value).lower() in ("1", "true", "yes"):
+            return True
+        if str(value).lower() in ("0", "false", "no"):
+            return False
+        raise ValueError(f"{name} must be true or false")
+    if kind is list:
+        if isinstance(value, str):
+            return [value]
+        if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) for item in value):
+            raise ValueError(f"{name} must be a string or a list of strings")
+        return list(value)
+    if kind is int:
+        if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+            raise ValueError(f"{name} must be an integer")
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be an integer")
+    if kind is float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number")
+    return str(value)
+
+
+def book_records(book_data: pd.DataFrame, positions) -> List[dict]:
+    """Return the books at the given row positions as JSON-ready dicts, missing values as None."""
+    books = book_data.iloc[positions]
+    if "rating" in books:
+        # Ratings are stored as float32; rounding drops the digits float32 adds in float64
+        books = books.assign(rating=books["rating"].astype("float64").round(2))
+    return json.loads(books.to_json(orient="records"))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve book searches over HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Interface to bind (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--data", type=Path, help="Catalogue CSV to serve (default: the project's dataset)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help=f"Threads evaluating queries (default: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help=f"Queued queries before rejecting requests (default: {DEFAULT_MAX_PENDING})")
+    parser.add_argument("--warm-up", action=argparse.BooleanOptionalAction, default=True,
+                        help="Listen at once and build the dataset and indexes in the background, reporting "
+                             "readiness on /ready (default: on; --no-warm-up loads the dataset before listening)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    cache = DatasetCache(args.data) if args.data is not None else get_dataset_cache()
+    server = SearchServer(cache, args.workers, args.max_pending)
+
+    async def run():
+        await server.start(args.host, args.port, args.warm_up)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,19 @@
+import hashlib
+import json
+import os
+import tempfile
 import pandas as pd
 from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+from src.data.schema import BookSchema
+from src.monitoring.metrics import get_metrics
+
+# Bump whenever the columns or dtypes produced by the loader change, so stale snapshots are rebuilt
+SNAPSHOT_FORMAT_VERSION = 3
+
+# Rows parsed at a time when streaming the dataset
+DEFAULT_CHUNK_SIZE = 100_000
 
 
 class DataLoader:
@@ -12,10 +26,148 @@ class DataLoader:
         return current_file.parent.parent.parent
 
     @staticmethod
-    def get_book_data() -> pd.DataFrame:
-        """Load the book dataset using an absolute path resolved from project root."""
+    def get_data_path() -> Path:
+        """Returns the absolute path of the book dataset CSV."""
+        return DataLoader.get_project_root() / "data" / "books_with_unique_isbns.csv"
+
+    @staticmethod
+    def get_snapshot_path(data_path: Path) -> Path:
+        """Returns the path of the binary snapshot built from the given CSV."""
+        return data_path.parent / ".snapshots" / f"{data_path.stem}.feather"
+
+    @staticmethod
+    def get_index_dir(data_path: Path) -> Path:
+        """Returns the directory holding the indexes persisted for the given CSV."""
+        return data_path.parent / ".snapshots" / f"{data_path.stem}.indexes"
+
+    @staticmethod
+    @get_metrics().timed("loader", function="get_book_data")
+    def get_book_data(data_path: Optional[Path] = None, use_snapshot: bool = True) -> pd.DataFrame:
+        """
+        Load the book dataset using an absolute path resolved from project root.
+
+        When use_snapshot is enabled, the parsed and type-coerced data is stored as an uncompressed Feather
+        snapshot next to the CSV and memory-mapped on subsequent loads. The CSV is only parsed again when
+        its modification time and content hash no longer match the ones recorded with the snapshot.
+
+        Args:
+            data_path (Path): CSV file to load (default: the project's dataset)
+            use_snapshot (bool): If True, load from and maintain the binary snapshot (default: True)
+
+        Returns:
+            pd.DataFrame: The book data with numeric pages and rating columns
+
+        Raises:
+            FileNotFoundError: If the dataset does not exist
+        """
+        data_path = DataLoader._resolve_data_path(data_path)
+
+        if not use_snapshot:
+            return DataLoader._read_csv(data_path)
+
+        snapshot_path = DataLoader.get_snapshot_path(data_path)
+        fingerprint = DataLoader._check_snapshot(data_path, snapshot_path)
+        if fingerprint is None:
+            try:
+                return DataLoader._read_snapshot(snapshot_path)
+            except (ImportError, OSError, ValueError):
+                # Unreadable or partially written snapshot, rebuild it below
+                fingerprint = DataLoader._fingerprint(data_path)
+
+        book_data = DataLoader._read_csv(data_path)
+        DataLoader._write_snapshot(book_data, snapshot_path, fingerprint)
+        return book_data
+
+    @staticmethod
+    def iter_book_data(
+        data_path: Optional[Path] = None,
+        filters: Iterable[Callable[[pd.DataFrame], pd.DataFrame]] = (),
+        chunksize: int = DEFAULT_CHUNK_SIZE
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Stream the book dataset in chunks, for catalogues that do not fit into memory.
+
+        Every chunk gets the same compact schema as get_book_data and is then passed through the filters in
+        order, e.g. lambda chunk: DataFilter.filter_by_minimum_rating(chunk, 4.0). Row labels continue across
+        chunks, so they match the row positions in the full dataset.
+
+        Args:
+            data_path (Path): CSV file to read (default: the project's dataset)
+            filters (Iterable[Callable]): Functions taking and returning a DataFrame, applied to every chunk
+            chunksize (int): Number of rows parsed at a time (default: 100000)
+
+        Yields:
+            pd.DataFrame: The matching rows of each chunk; chunks without matches are skipped
+
+        Raises:
+            FileNotFoundError: If the dataset does not exist
+        """
+        data_path = DataLoader._resolve_data_path(data_path)
+        filters = list(filters)
+
+        with pd.read_csv(data_path, dtype={"isbn": str}, chunksize=chunksize) as reader:
+            for chunk in reader:
+                chunk = BookSchema.apply(chunk)
+                for book_filter in filters:
+                    chunk = book_filter(chunk)
+                if len(chunk):
+                    yield chunk
+
+    @staticmethod
+    def count_book_data(
+        data_path: Optional[Path] = None,
+        filters: Iterable[Callable[[pd.DataFrame], pd.DataFrame]] = (),
+        chunksize: int = DEFAULT_CHUNK_SIZE
+    ) -> int:
+        """
+        Count the books matching the filters while holding only one chunk in memory.
+
+        Args:
+            data_path (Path): CSV file to read (default: the project's dataset)
+            filters (Iterable[Callable]): Functions taking and returning a DataFrame, applied to every chunk
+            chunksize (int): Number of rows parsed at a time (default: 100000)
+
+        Returns:
+            int: Number of matching books
+        """
+        return sum(len(chunk) for chunk in DataLoader.iter_book_data(data_path, filters, chunksize))
+
+    @staticmethod
+    def export_book_data(
+        output_path: Path,
+        data_path: Optional[Path] = None,
+        filters: Iterable[Callable[[pd.DataFrame], pd.DataFrame]] = (),
+        chunksize: int = DEFAULT_CHUNK_SIZE
+    ) -> int:
+        """
+        Write the books matching the filters to a CSV file, one chunk at a time.
+
+        Args:
+            output_path (Path): CSV file to write
+            data_path (Path): CSV file to read (default: the project's dataset)
+            filters (Iterable[Callable]): Functions taking and returning a DataFrame, applied to every chunk
+            chunksize (int): Number of rows parsed at a time (default: 100000)
+
+        Returns:
+            int: Number of books written
+        """
+        written = 0
+        for chunk in DataLoader.iter_book_data(data_path, filters, chunksize):
+            if "genres" in chunk.columns:
+                chunk = chunk.assign(genres=BookSchema.genre_strings(chunk["genres"]))
+            chunk.to_csv(output_path, mode="a" if written else "w", header=not written, index=False)
+            written += len(chunk)
+
+        if not written:
+            # Still leave a valid file with the header only
+            pd.read_csv(DataLoader._resolve_data_path(data_path), nrows=0).to_csv(output_path, index=False)
+        return written
+
+    @staticmethod
+    def _resolve_data_path(data_path: Optional[Path]) -> Path:
+        """Return the dataset path, defaulting to the project's dataset, and make sure it exists."""
         root_dir = DataLoader.get_project_root()
-        data_path = root_dir / "data" / "books_with_unique_isbns.csv"
+        data_path = Path(data_path) if data_path is not None else DataLoader.get_data_path()
 
         if not data_path.exists():
             raise FileNotFoundError(
@@ -23,9 +175,101 @@ class DataLoader:
                 f"Please ensure the file exists at the correct location relative to project root: {root_dir}"
             )
 
-        book_data = pd.read_csv(data_path)
-        book_data["pages"] = pd.to_numeric(book_data["pages"], errors="coerce")
-        book_data["rating"] = pd.to_numeric(book_data["rating"], errors="coerce")
+        return data_path
 
-        return book_data
+    @staticmethod
+    def _read_csv(data_path: Path) -> pd.DataFrame:
+        """Parse the CSV and convert it to the compact schema."""
+        # ISBNs are identifiers, reading them as numbers would drop leading zeros
+        return BookSchema.apply(pd.read_csv(data_path, dtype={"isbn": str}))
+
+    @staticmethod
+    def _read_snapshot(snapshot_path: Path) -> pd.DataFrame:
+        """Memory-map the Feather snapshot so the column buffers are not copied while reading."""
+        from pyarrow import feather
+
+        table = feather.read_table(snapshot_path, memory_map=True)
+        return table.to_pandas(types_mapper=BookSchema.pandas_type)
+
+    @staticmethod
+    def _fingerprint(data_path: Path) -> dict:
+        """Describe the CSV by modification time, size and SHA-256 of its content."""
+        stat = data_path.stat()
+        digest = hashlib.sha256()
+        with open(data_path, "rb") as source:
+            for block in iter(lambda: source.read(1 << 20), b""):
+                digest.update(block)
+
+        return {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest.hexdigest(),
+        }
+
+    @staticmethod
+    def _check_snapshot(data_path: Path, snapshot_path: Path) -> Optional[dict]:
+        """
+        Decide whether the snapshot still matches the CSV.
+
+        Returns:
+            None if the snapshot can be used, otherwise the fresh fingerprint of the CSV
+        """
+        meta_path = snapshot_path.with_suffix(".json")
+        try:
+            recorded = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            recorded = None
+
+        if not snapshot_path.exists() or not recorded or recorded.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            return DataLoader._fingerprint(data_path)
+
+        stat = data_path.stat()
+        if recorded.get("mtime_ns") == stat.st_mtime_ns and recorded.get("size") == stat.st_size:
+            return None
+
+        # The file was touched, only hash it to find out whether the content actually changed
+        fingerprint = DataLoader._fingerprint(data_path)
+        if fingerprint["sha256"] != recorded.get("sha256"):
+            return fingerprint
+
+        DataLoader._write_json(meta_path, fingerprint)
+        return None
+
+    @staticmethod
+    def _write_snapshot(book_data: pd.DataFrame, snapshot_path: Path, fingerprint: dict) -> None:
+        """Store the snapshot and its fingerprint. Failures only cost the caching, never the load."""
+        try:
+            snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            from pyarrow import Table, feather
+
+            # pandas cannot parse its own metadata for nested Arrow dtypes, pandas_type restores them on read
+            table = Table.from_pandas(book_data, preserve_index=False).replace_schema_metadata(None)
+            DataLoader._replace_atomically(
+                snapshot_path, lambda temp_path: feather.write_feather(table, temp_path, compression="uncompressed")
+            )
+            DataLoader._write_json(snapshot_path.with_suffix(".json"), fingerprint)
+        except (ImportError, OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _write_json(path: Path, content: dict) -> None:
+        """Atomically replace a small JSON file."""
+        DataLoader._replace_atomically(path, lambda temp_path: Path(temp_path).write_text(json.dumps(content)))
+
+    @staticmethod
+    def _replace_atomically(path: Path, write: Callable[[str], None]) -> None:
+        """
+        Write a file through a temporary file unique to this call, then rename it over path.
 
+        Processes rebuilding the same snapshot at once each write their own temporary file, so none of them
+        can rename a file another one is still writing.
+        """
+        handle, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+        os.close(handle)
+        try:
+            write(temp_name)
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
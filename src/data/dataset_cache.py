@@ -0,0 +1,506 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data.data_loader import DataLoader
+from src.data.facets import FacetIndex
+from src.data.genre_index import GenreIndex
+from src.data.isbn_index import IsbnIndex
+from src.data.numeric_index import SortedIndex
+from src.data.query import BookQuery
+from src.data.query_cache import QueryCache
+from src.data.ranking import RankedResults
+from src.data.schema import BookSchema
+from src.data.sharding import get_sharded_executor
+from src.data.text_index import TextIndex, WordIndex
+from src.monitoring.metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Default upper bound for the dataset plus all derived indexes held by one process
+DEFAULT_MEMORY_BUDGET = 2 * 1024 ** 3
+
+# Seconds between checks of the dataset file by the background refresh
+DEFAULT_REFRESH_INTERVAL = 600
+
+# Indexes prebuilt by warm_up() before the cache reports ready, those the first searches need first
+WARM_UP_INDEXES = ["isbn", "ranked_books", "title", "author", "rating", "pages", "genre", "facets", "title_words",
+                   "author_words"]
+
+# Warm-up steps building the word index that fuzzy searches use within a text index, keyed by step name
+WORD_INDEXES = {"title_words": "title", "author_words": "author"}
+
+# Indexes warm_up() builds after reporting ready: searches never need them, and the recommender's first build
+# imports scikit-learn and fits TF-IDF, which takes longer than all search indexes together
+LATE_WARM_UP_INDEXES = ["recommender"]
+
+
+def build_recommender(book_data: pd.DataFrame, index_dir: Optional[Path] = None) -> Any:
+    """Build the content recommender, importing it and SciPy only when the first recommendation is needed."""
+    from src.recommendation.content_based import ContentRecommender
+
+    return ContentRecommender.from_dataframe(book_data, index_dir)
+
+
+# Builders for the derived indexes known to the cache, keyed by index name
+INDEX_BUILDERS: Dict[str, Callable[[pd.DataFrame], Any]] = {
+    "genre": GenreIndex.from_dataframe,
+    "title": TextIndex.for_column("title"),
+    "author": TextIndex.for_column("author"),
+    "rating": SortedIndex.for_column("rating"),
+    "pages": SortedIndex.for_column("pages"),
+    "isbn": IsbnIndex.from_dataframe,
+    "ranked_books": RankedResults.all_books,
+    "facets": FacetIndex.from_dataframe,
+    "recommender": build_recommender,
+}
+
+# Indexes persisted to disk; their builders also take the index directory of the cache's dataset, so caches of
+# different catalogues never share or overwrite each other's files
+PERSISTED_INDEXES = {"recommender"}
+
+# Incremental updates for indexes that are expensive to rebuild, called as updater(index, book_data, rows) with
+# the refreshed data and the sorted positions of its changed and appended rows. Other indexes are rebuilt.
+INDEX_UPDATERS: Dict[str, Callable[[Any, pd.DataFrame, np.ndarray], Any]] = {
+    "genre": lambda index, book_data, rows: index.updated(book_data["genres"], rows),
+    "title": lambda index, book_data, rows: index.updated(book_data["title"], rows),
+    "author": lambda index, book_data, rows: index.updated(book_data["author"], rows),
+    "isbn": lambda index, book_data, rows: index.updated(book_data["isbn"], rows),
+    "recommender": lambda index, book_data, rows: index.updated(book_data, rows),
+    "facets": lambda index, book_data, rows: index.updated(book_data, rows),
+}
+
+
+def estimate_nbytes(obj: Any) -> int:
+    """Estimate the memory held by a cached object."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(obj, pd.DataFrame) else int(usage)
+    if hasattr(obj, "nbytes"):
+        return int(obj.nbytes)
+    return sys.getsizeof(obj)
+
+
+def diff_by_isbn(current: pd.DataFrame, fresh: pd.DataFrame) -> Optional[Tuple[pd.DataFrame, np.ndarray]]:
+    """
+    Apply a freshly loaded version of the book data to the current one, matching books by ISBN.
+
+    Books keep their row positions; books whose ISBN is new are appended in the order of the fresh data.
+
+    Args:
+        current (pd.DataFrame): The book data in use
+        fresh (pd.DataFrame): The book data as loaded now
+
+    Returns:
+        The refreshed data and the sorted positions of its changed and appended rows, or None if books were
+        removed or ISBNs are not unique, so positions cannot be kept
+    """
+    current_isbns = pd.Index(current["isbn"])
+    if not current_isbns.is_unique or not fresh["isbn"].is_unique:
+        return None
+
+    source = current_isbns.get_indexer(pd.Index(fresh["isbn"]))
+    matched = np.flatnonzero(source >= 0)
+    if len(matched) != len(current):
+        return None
+
+    # For every refreshed row, the position in fresh it is taken from
+    take = np.empty(len(fresh), dtype=np.int64)
+    take[source[matched]] = matched
+    take[len(current):] = np.flatnonzero(source < 0)
+
+    in_place = take[:len(current)]
+    changed = np.flatnonzero(BookSchema.row_hashes(current) != BookSchema.row_hashes(fresh.iloc[in_place]))
+    rows = np.concatenate((changed, np.arange(len(current), len(fresh)))).astype(np.int64)
+
+    if np.array_equal(take, np.arange(len(fresh))):
+        return fresh, rows
+    return fresh.iloc[take].reset_index(drop=True), rows
+
+
+class DatasetCache:
+    """
+    Process-wide, read-only holder of the book DataFrame and the indexes derived from it.
+
+    All sessions share the objects returned by this cache, so callers must treat them as immutable and
+    only filter, slice or copy them. Derived indexes are evicted least recently used first whenever the
+    dataset and the indexes together exceed the memory budget.
+
+    refresh() picks up changes of the dataset file without downtime: the new data and indexes are prepared
+    next to the current ones and swapped in at once. version counts every change of the data, positions_version
+    only those after which row positions may refer to different books.
+
+    The cache lock is only held to look up and publish the data and indexes. Loading the data and building an
+    index run outside it, serialized per index by a build lock, so a slow build only delays the callers
+    waiting for that same index.
+
+    warm_up() loads the data and builds the indexes ahead of the first request and then sets the ready event;
+    startup records how many seconds after creating the cache each step finished.
+    """
+
+    def __init__(self, data_path: Optional[Path] = None, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        self.data_path = data_path
+        self.memory_budget = memory_budget
+        self.version = 0
+        self.positions_version = 0
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._warm_up_thread: Optional[threading.Thread] = None
+        self._created = time.perf_counter()
+        self.ready = threading.Event()
+        self.startup: Dict[str, float] = {}
+        self._source_stat: Optional[tuple] = None
+        self._data: Optional[pd.DataFrame] = None
+        self._data_nbytes = 0
+        self._indexes: "OrderedDict[str, tuple]" = OrderedDict()
+        # Results of queries against the shared data, dropped automatically whenever version changes
+        self.query_cache = QueryCache()
+
+    def get_data(self) -> pd.DataFrame:
+        """
+        Return the shared book DataFrame, loading it on first use.
+
+        Returns:
+            pd.DataFrame: The dataset shared by all sessions of this process
+        """
+        data = self._data
+        if data is not None:
+            return data
+
+        with self._load_lock:
+            data = self._data
+            if data is None:
+                source_stat = self._stat_source()
+                data = DataLoader.get_book_data(self.data_path)
+                with self._lock:
+                    self._set_data(data, source_stat)
+                    self.positions_version += 1
+            return data
+
+    def _set_data(self, data: pd.DataFrame, source_stat: Optional[tuple]) -> None:
+        """Install a new version of the dataset; the caller holds the lock."""
+        self._data_nbytes = estimate_nbytes(data)
+        if self._data_nbytes > self.memory_budget:
+            logger.warning(
+                "Dataset uses %d bytes, exceeding the memory budget of %d bytes",
+                self._data_nbytes, self.memory_budget
+            )
+        self._data = data
+        self._source_stat = source_stat
+        self.version += 1
+
+    def _stat_source(self) -> Optional[tuple]:
+        """Return modification time and size of the dataset file, or None if it cannot be read."""
+        try:
+            stat = (Path(self.data_path) if self.data_path is not None else DataLoader.get_data_path()).stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self) -> Dict[str, int]:
+        """
+        Bring the shared dataset and its cached indexes up to date with the dataset file.
+
+        Books are matched by ISBN. Changed books are updated in place and new ones appended, so row positions
+        stay valid, and the expensive indexes are updated for the changed rows only. If books were removed, the
+        data and the cached indexes are rebuilt instead. Either way readers keep using the previous version
+        until the new one is swapped in.
+
+        Returns:
+            Dict[str, int]: Number of "appended" and "updated" books, and "reloaded" (1 after a full rebuild)
+        """
+        with self._refresh_lock:
+            current = self._data
+            source_stat = self._stat_source()
+            if current is None or source_stat == self._source_stat:
+                return {"appended": 0, "updated": 0, "reloaded": 0}
+
+            fresh = DataLoader.get_book_data(self.data_path)
+            delta = diff_by_isbn(current, fresh)
+            if delta is None:
+                refreshed, rows = fresh, None
+                summary = {"appended": 0, "updated": 0, "reloaded": 1}
+            else:
+                refreshed, rows = delta
+                appended = len(refreshed) - len(current)
+                summary = {"appended": appended, "updated": len(rows) - appended, "reloaded": 0}
+                if not len(rows):
+                    with self._lock:
+                        self._source_stat = source_stat
+                    return summary
+
+            with self._lock:
+                cached = [(name, index) for name, (index, _) in self._indexes.items()]
+
+            # Prepare every cached index for the new data before anything is swapped
+            indexes = OrderedDict()
+            for name, index in cached:
+                if name not in INDEX_BUILDERS:
+                    continue
+                if rows is not None and name in INDEX_UPDATERS:
+                    index = INDEX_UPDATERS[name](index, refreshed, rows)
+                else:
+                    warm_words = isinstance(index, TextIndex) and index.has_word_index
+                    index = self._registered_builder(name)(refreshed)
+                    if warm_words:
+                        # Fuzzy searches were warmed up, keep them warm after the rebuild
+                        index.get_word_index()
+                indexes[name] = (index, estimate_nbytes(index))
+
+            with self._lock:
+                self._set_data(refreshed, source_stat)
+                if rows is None:
+                    self.positions_version += 1
+                self._indexes = indexes
+                if indexes:
+                    self._enforce_budget(keep=next(reversed(indexes)))
+
+            logger.info("Refreshed dataset: %s", summary)
+            return summary
+
+    def start_auto_refresh(self, interval: float = DEFAULT_REFRESH_INTERVAL) -> None:
+        """
+        Refresh the dataset from a background thread every interval seconds.
+
+        Calling this again while the thread runs has no effect, so every session may call it.
+        """
+        with self._lock:
+            if self._refresh_thread is not None:
+                return
+
+            def run():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.refresh()
+                    except Exception:
+                        logger.exception("Background refresh of the dataset failed")
+
+            self._refresh_thread = threading.Thread(target=run, name="dataset-refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def warm_up(self, names: Optional[List[str]] = None, late_names: Optional[List[str]] = None) -> Dict[str, float]:
+        """
+        Load the dataset and build indexes before they are first needed, signalling readiness in between.
+
+        Requests arriving meanwhile are answered as usual; one that needs an index still being built waits for
+        that index only.
+
+        Args:
+            names (List[str]): Indexes, or word index steps of WORD_INDEXES, to build before setting the ready
+                event, in this order (default: WARM_UP_INDEXES)
+            late_names (List[str]): Indexes to build after it (default: LATE_WARM_UP_INDEXES)
+
+        Returns:
+            Dict[str, float]: Seconds after creating the cache at which the data ("data"), every index and the
+                readiness ("ready") were reached
+        """
+        self._warm_up_step("data", self.get_data)
+        for name in WARM_UP_INDEXES if names is None else names:
+            if name in WORD_INDEXES:
+                self._warm_up_step(name, lambda: self.get_word_index(WORD_INDEXES[name]))
+            else:
+                self._warm_up_step(name, lambda: self.get_index(name))
+
+        self.startup["ready"] = time.perf_counter() - self._created
+        self.ready.set()
+        logger.info("Dataset cache ready after %.2fs", self.startup["ready"])
+
+        for name in LATE_WARM_UP_INDEXES if late_names is None else late_names:
+            self._warm_up_step(name, lambda: self.get_index(name))
+        return dict(self.startup)
+
+    def _warm_up_step(self, step: str, build: Callable[[], Any]) -> None:
+        start = time.perf_counter()
+        build()
+        get_metrics().observe("warm_up", time.perf_counter() - start, step=step)
+        self.startup[step] = time.perf_counter() - self._created
+
+    def start_warm_up(self, names: Optional[List[str]] = None, late_names: Optional[List[str]] = None) -> None:
+        """
+        Run warm_up() on a background thread; the ready event tells when the search indexes are built.
+
+        Calling this again has no effect, so every session may call it. A failed warm-up is logged and leaves the
+        cache not ready, while requests keep building what they need on demand.
+        """
+        with self._lock:
+            if self._warm_up_thread is not None:
+                return
+
+            def run():
+                try:
+                    self.warm_up(names, late_names)
+                except Exception:
+                    logger.exception("Warm-up of the dataset cache failed")
+
+            self._warm_up_thread = threading.Thread(target=run, name="dataset-warm-up", daemon=True)
+            self._warm_up_thread.start()
+
+    def get_index(self, name: str, builder: Optional[Callable[[pd.DataFrame], Any]] = None) -> Any:
+        """
+        Return a derived index of the shared dataset, building it on first use.
+
+        Args:
+            name (str): Name under which the index is cached
+            builder (Callable): Function building the index from the dataset (default: the registered builder)
+
+        Returns:
+            The cached index
+
+        Raises:
+            KeyError: If no builder is given and none is registered for name
+        """
+        if builder is None:
+            builder = self._registered_builder(name)
+
+        while True:
+            index = self._cached_index(name)
+            if index is not None:
+                return index
+
+            with self._lock:
+                build_lock = self._build_locks.setdefault(name, threading.Lock())
+            with build_lock:
+                # Another caller may have built the index while this one waited
+                index = self._cached_index(name)
+                if index is not None:
+                    return index
+
+                data = self.get_data()
+                index = builder(data)
+                with self._lock:
+                    # A refresh or invalidate() replaced the data during the build; build for the new data
+                    if self._data is not data:
+                        continue
+                    self._indexes[name] = (index, estimate_nbytes(index))
+                    self._enforce_budget(keep=name)
+                    return index
+
+    def get_word_index(self, name: str) -> WordIndex:
+        """
+        Return the word index fuzzy searches use within a cached text index, building it if needed.
+
+        The text index is then accounted for together with its word index, so building the word index here rather
+        than on the first fuzzy search counts it against the memory budget.
+
+        Args:
+            name (str): Name of the text index, e.g. "title"
+
+        Returns:
+            WordIndex: The word index of the text index
+        """
+        index = self.get_index(name)
+        word_index = index.get_word_index()
+        with self._lock:
+            cached = self._indexes.get(name)
+            if cached is not None and cached[0] is index:
+                self._indexes[name] = (index, estimate_nbytes(index))
+                self._enforce_budget(keep=name)
+        return word_index
+
+    def get_data_with_indexes(self, *names: str) -> Tuple[pd.DataFrame, int, List[Any]]:
+        """
+        Return the dataset together with indexes built for exactly that version of it.
+
+        Callers that look up row positions in an index and then take those rows from the data must use this, so a
+        refresh in between cannot pair an index with data it was not built for.
+
+        Args:
+            names (str): Names of the indexes
+
+        Returns:
+            Tuple[pd.DataFrame, int, List[Any]]: The dataset, its version and the indexes in the order of names
+        """
+        while True:
+            version = self.version
+            data = self.get_data()
+            indexes = [self.get_index(name) for name in names]
+            # A refresh swaps the data and its indexes at once and bumps version, so nothing changed if it did not
+            if self.version == version:
+                return data, version, indexes
+
+    def _registered_builder(self, name: str) -> Callable[[pd.DataFrame], Any]:
+        """Return the registered builder of an index, bound to this cache's index directory if it persists."""
+        builder = INDEX_BUILDERS[name]
+        if name not in PERSISTED_INDEXES:
+            return builder
+        data_path = Path(self.data_path) if self.data_path is not None else DataLoader.get_data_path()
+        return lambda book_data: builder(book_data, DataLoader.get_index_dir(data_path))
+
+    def _cached_index(self, name: str) -> Any:
+        """Return the cached index of that name, marking it as recently used, or None."""
+        with self._lock:
+            if name not in self._indexes:
+                return None
+            self._indexes.move_to_end(name)
+            return self._indexes[name][0]
+
+    def query(self) -> BookQuery:
+        """
+        Start a query over the shared dataset that uses the cached indexes, building them on demand.
+
+        Results are cached by normalized query for the current dataset version, see query_cache.stats().
+        """
+        while True:
+            data = self.get_data()
+            with self._lock:
+                if self._data is data:
+                    version = self.version
+                    break
+
+        def get_index(name: str) -> Any:
+            # After a refresh the cached indexes describe the new data; this query then scans instead
+            if name not in INDEX_BUILDERS or self.version != version:
+                return None
+            index = self.get_index(name)
+            # Versions only grow, so an unchanged version means the index was built for this query's data
+            return index if self.version == version else None
+
+        return BookQuery(data, get_index, self.query_cache, version, get_sharded_executor())
+
+    def invalidate(self) -> None:
+        """Drop the dataset and all derived indexes; the next access reloads them."""
+        with self._lock:
+            self._data = None
+            self._data_nbytes = 0
+            self._source_stat = None
+            self._indexes.clear()
+
+    def memory_usage(self) -> int:
+        """Return the estimated number of bytes held by the dataset and its indexes."""
+        with self._lock:
+            return self._data_nbytes + sum(nbytes for _, nbytes in self._indexes.values())
+
+    def _enforce_budget(self, keep: str) -> None:
+        """Evict least recently used indexes until the cache fits into the memory budget."""
+        while self.memory_usage() > self.memory_budget and len(self._indexes) > 1:
+            name = next(iter(self._indexes))
+            if name == keep:
+                self._indexes.move_to_end(name)
+                continue
+            del self._indexes[name]
+            logger.info("Evicted index %r to stay within the memory budget", name)
+
+
+_shared_cache: Optional[DatasetCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_dataset_cache() -> DatasetCache:
+    """Return the dataset cache shared by every session of this process."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = DatasetCache()
+    return _shared_cache
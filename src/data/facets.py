@@ -0,0 +1,245 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from src.data.genre_index import GenreIndex
+from src.data.schema import BookSchema
+
+# Width of the rating buckets; ratings range from 0 to 5
+RATING_BUCKET_WIDTH = 0.5
+N_RATING_BUCKETS = 10
+
+# Lower bounds of the page count buckets after the first one
+PAGE_BUCKET_EDGES = [100, 200, 300, 400, 500, 750, 1000]
+
+# Facets with one value per book, counted from one code per row
+SINGLE_VALUED_FACETS = ["language", "rating", "pages"]
+
+
+def _rating_labels() -> List[str]:
+    bounds = [bucket * RATING_BUCKET_WIDTH for bucket in range(N_RATING_BUCKETS + 1)]
+    return [f"{lower:.1f}–{upper:.1f}" for lower, upper in zip(bounds[:-1], bounds[1:])] + ["Unrated"]
+
+
+def _page_labels() -> List[str]:
+    edges = PAGE_BUCKET_EDGES
+    middle = [f"{lower}–{upper - 1}" for lower, upper in zip(edges[:-1], edges[1:])]
+    return [f"< {edges[0]}"] + middle + [f"{edges[-1]}+", "Unknown"]
+
+
+class FacetIndex:
+    """
+    Precomputed facet codes of every book, so facet counts of any result set take one np.bincount per facet.
+
+    Language, rating bucket and page count bucket are stored as one small integer code per row, the last code of
+    each standing for a missing value. Genres are multi-valued and stored in CSR layout by row: the genre ids of
+    row r are genre_ids[genre_offsets[r]:genre_offsets[r + 1]]. Genre labels match the names of GenreIndex.
+    """
+
+    def __init__(
+        self,
+        labels: Dict[str, List[str]],
+        codes: Dict[str, np.ndarray],
+        genre_offsets: np.ndarray,
+        genre_ids: np.ndarray
+    ):
+        self.labels = labels
+        self.codes = codes
+        self.genre_offsets = genre_offsets
+        self.genre_ids = genre_ids
+        self.n_rows = len(genre_offsets) - 1
+        self._genre_ids = {genre.lower(): genre_id for genre_id, genre in enumerate(labels["genre"])}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(codes.nbytes for codes in self.codes.values()) + self.genre_offsets.nbytes + self.genre_ids.nbytes
+
+    @staticmethod
+    def _single_valued_codes(book_data: pd.DataFrame) -> tuple:
+        """Return labels and per-row codes of the language, rating and page count facets."""
+        languages = book_data["language"]
+        if isinstance(languages.dtype, pd.CategoricalDtype):
+            codes, language_labels = languages.cat.codes.to_numpy(), list(languages.cat.categories)
+        else:
+            codes, language_labels = pd.factorize(languages)
+            language_labels = list(language_labels)
+        language_codes = np.where(codes >= 0, codes, len(language_labels))
+
+        ratings = BookSchema.numeric_values(book_data["rating"])
+        rating_codes = np.full(len(ratings), N_RATING_BUCKETS)
+        rated = ~np.isnan(ratings)
+        rating_codes[rated] = np.clip(ratings[rated] // RATING_BUCKET_WIDTH, 0, N_RATING_BUCKETS - 1)
+
+        pages = BookSchema.numeric_values(book_data["pages"])
+        page_codes = np.where(
+            np.isnan(pages), len(PAGE_BUCKET_EDGES) + 1, np.searchsorted(PAGE_BUCKET_EDGES, pages, side="right")
+        )
+
+        code_dtype = np.int16 if len(language_labels) < np.iinfo(np.int16).max else np.int32
+        labels = {"language": language_labels + ["Unknown"], "rating": _rating_labels(), "pages": _page_labels()}
+        codes = {
+            "language": language_codes.astype(code_dtype),
+            "rating": rating_codes.astype(np.int8),
+            "pages": page_codes.astype(np.int8),
+        }
+        return labels, codes
+
+    @staticmethod
+    def _genre_csr(rows: np.ndarray, ids: np.ndarray, n_rows: int, n_genres: int) -> tuple:
+        """Group (row, genre id) pairs by row into CSR offsets and genre ids, dropping duplicates."""
+        # Encoding (row, id) pairs as one integer sorts by row, then id, and drops duplicate genres per book
+        pairs = np.unique(rows.astype(np.int64) * max(n_genres, 1) + ids)
+        counts = np.bincount(pairs // max(n_genres, 1), minlength=n_rows)
+        offsets = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        id_dtype = np.int16 if n_genres < np.iinfo(np.int16).max else np.int32
+        return offsets, (pairs % max(n_genres, 1)).astype(id_dtype)
+
+    @classmethod
+    def from_dataframe(cls, book_data: pd.DataFrame) -> "FacetIndex":
+        """Build the facet codes of the book data."""
+        labels, codes = cls._single_valued_codes(book_data)
+
+        # Same vocabulary and display spelling as GenreIndex, so facet labels can be passed to genre filters
+        names = GenreIndex.parse_genres(book_data["genres"])
+        ids, _ = pd.factorize(names.str.lower(), sort=True)
+        labels["genre"] = names.groupby(ids).first().tolist()
+        genre_offsets, genre_ids = cls._genre_csr(
+            names.index.to_numpy(dtype=np.int64), ids.astype(np.int64), len(book_data), len(labels["genre"])
+        )
+
+        return cls(labels, codes, genre_offsets, genre_ids)
+
+    def updated(self, book_data: pd.DataFrame, rows: np.ndarray) -> "FacetIndex":
+        """
+        Return a copy of the index reflecting changed or appended rows.
+
+        The single-valued codes are recomputed with vectorized passes; only the genre lists of the given rows are
+        parsed, with unseen genres appended to the labels.
+
+        Args:
+            book_data (pd.DataFrame): The whole book data after the change, rows before n_rows keep their positions
+            rows (np.ndarray): Sorted positions of the changed and appended rows
+
+        Returns:
+            FacetIndex: The new index; this one keeps answering for the previous data
+        """
+        labels, codes = self._single_valued_codes(book_data)
+
+        names = GenreIndex.parse_genres(book_data["genres"].iloc[rows])
+        genre_labels = list(self.labels["genre"])
+        known = dict(self._genre_ids)
+        new_ids = np.empty(len(names), dtype=np.int64)
+        for i, name in enumerate(names):
+            genre_id = known.get(name.lower())
+            if genre_id is None:
+                genre_id = known[name.lower()] = len(genre_labels)
+                genre_labels.append(name)
+            new_ids[i] = genre_id
+        labels["genre"] = genre_labels
+
+        entry_rows = np.repeat(np.arange(self.n_rows, dtype=np.int64), np.diff(self.genre_offsets))
+        keep = ~np.isin(entry_rows, rows)
+        genre_offsets, genre_ids = self._genre_csr(
+            np.concatenate((entry_rows[keep], rows[names.index.to_numpy()])),
+            np.concatenate((self.genre_ids[keep].astype(np.int64), new_ids)),
+            len(book_data),
+            len(genre_labels)
+        )
+
+        return FacetIndex(labels, codes, genre_offsets, genre_ids)
+
+    def _count(self, positions: Optional[np.ndarray]) -> Dict[str, np.ndarray]:
+        """Count every facet value over the given rows, or over all rows for None."""
+        counts = {}
+        for facet in SINGLE_VALUED_FACETS:
+            codes = self.codes[facet] if positions is None else self.codes[facet][positions]
+            counts[facet] = np.bincount(codes, minlength=len(self.labels[facet]))
+
+        if positions is None:
+            genre_ids = self.genre_ids
+        else:
+            # Gather the CSR slices of the rows without a Python loop
+            starts = self.genre_offsets[positions]
+            lengths = self.genre_offsets[positions + 1] - starts
+            ends = np.cumsum(lengths)
+            entries = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - (ends - lengths), lengths)
+            genre_ids = self.genre_ids[entries]
+        counts["genre"] = np.bincount(genre_ids, minlength=len(self.labels["genre"]))
+        return counts
+
+    def counts(self, positions: Optional[np.ndarray] = None) -> "FacetCounts":
+        """
+        Count the books per facet value.
+
+        Args:
+            positions (np.ndarray): Sorted row positions of the result set (default: all books)
+
+        Returns:
+            FacetCounts: Counts per genre, language, rating bucket and page count bucket
+        """
+        counts = self._count(positions)
+        return FacetCounts(self, np.arange(self.n_rows) if positions is None else positions, counts)
+
+
+class FacetCounts:
+    """
+    Facet counts of one result set.
+
+    narrow() derives the counts of a subset of the results, e.g. after adding a filter, by subtracting the counts
+    of the removed rows whenever those are fewer than the remaining ones.
+    """
+
+    def __init__(self, index: FacetIndex, positions: np.ndarray, counts: Dict[str, np.ndarray]):
+        self.index = index
+        self.positions = positions
+        # Count arrays per facet, aligned with the labels of the index
+        self.counts = counts
+
+    @property
+    def total(self) -> int:
+        return len(self.positions)
+
+    def get(self, facet: str) -> pd.Series:
+        """
+        Return the counts of one facet.
+
+        Args:
+            facet (str): "genre", "language", "rating" or "pages"
+
+        Returns:
+            pd.Series: Counts by label; genres and languages most frequent first without empty values, rating and
+                page count buckets in ascending order
+
+        Raises:
+            ValueError: If the facet is unknown
+        """
+        if facet not in self.counts:
+            raise ValueError(f"Facet must be one of {', '.join(self.counts)}")
+
+        counts = pd.Series(self.counts[facet], index=self.index.labels[facet], name=facet)
+        if facet in ("genre", "language"):
+            counts = counts[counts > 0].sort_values(ascending=False, kind="stable")
+        return counts
+
+    def narrow(self, positions: np.ndarray) -> "FacetCounts":
+        """
+        Return the counts of a new result set, reusing these counts if it is a subset of this one.
+
+        Args:
+            positions (np.ndarray): Sorted row positions of the new result set
+
+        Returns:
+            FacetCounts: Counts of the new result set
+        """
+        # A row mask is cheaper than sorting the two position sets against each other
+        remaining = np.zeros(self.index.n_rows, dtype=bool)
+        remaining[positions] = True
+        removed = self.positions[~remaining[self.positions]]
+        is_subset = len(self.positions) - len(removed) == len(positions)
+        if not is_subset or len(removed) >= len(positions):
+            return self.index.counts(positions)
+
+        removed_counts = self.index._count(removed)
+        counts = {facet: self.counts[facet] - removed_counts[facet] for facet in self.counts}
+        return FacetCounts(self.index, positions, counts)
@@ -1,10 +1,49 @@
+import numpy as np
 import pandas as pd
-from src.data.data_loader import DataLoader
+from typing import Iterable, List, Optional
+from src.data.genre_index import GenreIndex
+from src.data.isbn_index import IsbnIndex
+from src.data.numeric_index import SortedIndex
+from src.data.query import BookQuery
+from src.data.schema import BookSchema
+from src.data.sharding import ShardedExecutor, get_sharded_executor
+from src.data.text_index import TextIndex
+from src.monitoring.metrics import get_metrics
 
 
 class DataFilter:
     @staticmethod
-    def filter_by_title(unfiltered_data: pd.DataFrame, title_query: str, exact_match: bool = False) -> pd.DataFrame:
+    def query(unfiltered_data: pd.DataFrame, **indexes) -> BookQuery:
+        """
+        Start a composable query over the books dataframe.
+
+        Criteria without an index are checked in parallel shards of the rows on large dataframes.
+
+        Args:
+            unfiltered_data (pd.DataFrame): DataFrame containing book data
+            **indexes: Prebuilt indexes of unfiltered_data by name, e.g. genre=GenreIndex, title=TextIndex
+
+        Returns:
+            BookQuery: Query builder; criteria are evaluated once a result is requested
+
+        Raises:
+            ValueError: If an index does not belong to unfiltered_data
+        """
+        for name, index in indexes.items():
+            if index.n_rows != len(unfiltered_data):
+                raise ValueError(f"{name.capitalize()} index was built for a different dataframe")
+
+        return BookQuery(unfiltered_data, indexes.get, executor=get_sharded_executor())
+
+    @staticmethod
+    @get_metrics().timed("filter", method="filter_by_title")
+    def filter_by_title(
+        unfiltered_data: pd.DataFrame,
+        title_query: str,
+        exact_match: bool = False,
+        title_index: Optional[TextIndex] = None,
+        fuzzy: bool = False
+    ) -> pd.DataFrame:
         """
         Filter books dataframe by title.
 
@@ -12,12 +51,16 @@ class DataFilter:
             unfiltered_data (pd.DataFrame): DataFrame containing book data
             title_query (str): The title or partial title to search for
             exact_match (bool): If True, requires exact title match. If False, searches for substring (default: False)
+            title_index (TextIndex): Prebuilt title index of unfiltered_data (default: scan the title column)
+            fuzzy (bool): If True, tolerates typos: every query word must resemble a word of the title
+                (default: False)
 
         Returns:
-            pd.DataFrame: Filtered dataframe containing only matching books
+            pd.DataFrame: Filtered dataframe containing only matching books, most similar first if fuzzy
 
         Raises:
-            ValueError: If title_query is empty or if required columns are missing
+            ValueError: If title_query is empty, if both exact_match and fuzzy are set, if required columns are
+                missing or if the title index does not belong to unfiltered_data
         """
         # Input validation
         if not isinstance(title_query, str) or not title_query.strip():
@@ -26,13 +69,32 @@ class DataFilter:
         # Convert query and titles to lowercase for case-insensitive comparison
         title_query = title_query.lower().strip()
 
-        if exact_match:
-            return unfiltered_data[unfiltered_data["title"].str.lower() == title_query]
-        else:
-            return unfiltered_data[unfiltered_data["title"].str.lower().str.contains(title_query, na=False)]
+        if fuzzy:
+            return DataFilter._filter_by_similarity(unfiltered_data, "title", title_query, exact_match, title_index)
+        if title_index is not None:
+            return DataFilter._filter_by_text_index(unfiltered_data, title_query, exact_match, title_index)
+
+        def matches(rows: np.ndarray) -> np.ndarray:
+            return BookSchema.match_text(
+                ShardedExecutor.rows(unfiltered_data["title"], rows),
+                lambda titles: DataFilter._text_matches(titles, title_query, exact_match)
+            )
+
+        rows = np.arange(len(unfiltered_data))
+        if not ShardedExecutor.releases_gil(unfiltered_data["title"]):
+            return unfiltered_data[matches(rows)]
+        # Titles are mostly distinct, so the scan is split into row shards checked in parallel
+        return unfiltered_data[get_sharded_executor().mask(matches, rows)]
 
     @staticmethod
-    def filter_by_author(unfiltered_data: pd.DataFrame, author_query: str, exact_match: bool = False) -> pd.DataFrame:
+    @get_metrics().timed("filter", method="filter_by_author")
+    def filter_by_author(
+        unfiltered_data: pd.DataFrame,
+        author_query: str,
+        exact_match: bool = False,
+        author_index: Optional[TextIndex] = None,
+        fuzzy: bool = False
+    ) -> pd.DataFrame:
         """
         Filter books dataframe by author.
 
@@ -40,44 +102,95 @@ class DataFilter:
             unfiltered_data (pd.DataFrame): DataFrame containing book data
             author_query (str): The author or partial author string to search for
             exact_match (bool): If True, requires exact match. If False, searches for substring (default: False)
+            author_index (TextIndex): Prebuilt author index of unfiltered_data (default: scan the author column)
+            fuzzy (bool): If True, tolerates typos: every query word must resemble a word of the author's name
+                (default: False)
 
         Returns:
-            pd.DataFrame: Filtered dataframe containing only books of matching authors
+            pd.DataFrame: Filtered dataframe containing only books of matching authors, most similar first if fuzzy
 
         Raises:
-            ValueError: If author_query is empty
+            ValueError: If author_query is empty, if both exact_match and fuzzy are set or if the author index
+                does not belong to unfiltered_data
         """
         if not isinstance(author_query, str) or not author_query.strip():
             raise ValueError("Author query must be a non-empty string")
 
         author_query = author_query.lower().strip()
 
+        if fuzzy:
+            return DataFilter._filter_by_similarity(unfiltered_data, "author", author_query, exact_match, author_index)
+        if author_index is not None:
+            return DataFilter._filter_by_text_index(unfiltered_data, author_query, exact_match, author_index)
+
+        return unfiltered_data[BookSchema.match_text(
+            unfiltered_data["author"], lambda authors: DataFilter._text_matches(authors, author_query, exact_match)
+        )]
+
+    @staticmethod
+    def _text_matches(texts: pd.Series, query: str, exact_match: bool) -> pd.Series:
+        """Compare normalized texts with a normalized query, as an exact match or a substring search."""
+        texts = TextIndex.normalize(texts)
+        if exact_match:
+            return texts == query
+        return texts.str.contains(query, na=False, regex=False)
+
+    @staticmethod
+    def _filter_by_similarity(
+        unfiltered_data: pd.DataFrame, column: str, query: str, exact_match: bool, text_index: Optional[TextIndex]
+    ) -> pd.DataFrame:
+        """Answer a fuzzy title or author query, ordering the books by decreasing similarity."""
         if exact_match:
-            return unfiltered_data[unfiltered_data["author"].str.lower() == author_query]
-        else:
-            return unfiltered_data[unfiltered_data["author"].str.lower().str.contains(author_query, na=False)]
+            raise ValueError("Choose either an exact or a fuzzy match")
+        if text_index is None:
+            text_index = TextIndex.from_series(unfiltered_data[column])
+        elif text_index.n_rows != len(unfiltered_data):
+            raise ValueError("Text index was built for a different dataframe")
+
+        positions, similarities = text_index.similar(query)
+        return unfiltered_data.iloc[positions[np.argsort(-similarities, kind="stable")]]
+
+    @staticmethod
+    def _filter_by_text_index(
+        unfiltered_data: pd.DataFrame, query: str, exact_match: bool, text_index: TextIndex
+    ) -> pd.DataFrame:
+        """Answer a title or author query from a prebuilt text index of unfiltered_data."""
+        if text_index.n_rows != len(unfiltered_data):
+            raise ValueError("Text index was built for a different dataframe")
+
+        positions = text_index.exact(query) if exact_match else text_index.contains(query)
+        return unfiltered_data.iloc[positions]
 
     @staticmethod
-    def filter_by_minimum_rating(unfiltered_data: pd.DataFrame, minimum_rating: float) -> pd.DataFrame:
+    @get_metrics().timed("filter", method="filter_by_minimum_rating")
+    def filter_by_minimum_rating(
+        unfiltered_data: pd.DataFrame, minimum_rating: float, rating_index: Optional[SortedIndex] = None
+    ) -> pd.DataFrame:
         """
         Filter books dataframe by minimum rating.
 
         Args:
             unfiltered_data (pd.DataFrame): DataFrame containing book data
             minimum_rating (float): The minimum desired rating to be included in the filtered data
+            rating_index (SortedIndex): Prebuilt rating index of unfiltered_data (default: compare the whole column)
 
         Returns:
             pd.DataFrame: Filtered dataframe containing only books that have a rating higher than specified
 
         Raises:
-            ValueError: If minimum rating is not a valid numerical value
+            ValueError: If minimum rating is not a valid numerical value or if the rating index does not belong to
+                unfiltered_data
         """
         if not isinstance(minimum_rating, (int, float)):
             raise ValueError("Minimum rating must be a number")
 
+        if rating_index is not None:
+            return DataFilter._filter_by_sorted_index(unfiltered_data, rating_index, minimum=minimum_rating)
+
         return unfiltered_data[unfiltered_data["rating"] >= minimum_rating]
 
     @staticmethod
+    @get_metrics().timed("filter", method="filter_by_language")
     def filter_by_language(unfiltered_data: pd.DataFrame, language: str) -> pd.DataFrame:
         """
         Filter books dataframe by language.
@@ -96,97 +209,167 @@ class DataFilter:
             raise ValueError("Language must be a non-empty string")
 
         language = language.lower().strip()
-        return unfiltered_data[unfiltered_data["language"].str.lower() == language]
+        # Compared once per distinct language, the rows only gather the result by category code
+        return unfiltered_data[BookSchema.match_text(
+            unfiltered_data["language"], lambda languages: languages.str.lower() == language
+        )]
 
     @staticmethod
-    def filter_by_genre(unfiltered_data: pd.DataFrame, genre: str) -> pd.DataFrame:
+    @get_metrics().timed("filter", method="filter_by_genre")
+    def filter_by_genre(
+        unfiltered_data: pd.DataFrame, genre: str, genre_index: Optional[GenreIndex] = None
+    ) -> pd.DataFrame:
         """
         Filter books dataframe by genre.
 
         Args:
             unfiltered_data (pd.DataFrame): DataFrame containing book data
             genre (str): The genre to search for within the books' genre lists
+            genre_index (GenreIndex): Prebuilt genre index of unfiltered_data (default: built on the fly)
 
         Returns:
             pd.DataFrame: Filtered dataframe containing only books that include the specified genre
 
         Raises:
-            ValueError: If genre is empty
+            ValueError: If genre is empty or if the genre index does not belong to unfiltered_data
         """
         if not isinstance(genre, str) or not genre.strip():
             raise ValueError("Genre must be a non-empty string")
 
-        genre = genre.lower().strip()
+        return DataFilter._filter_by_genre_list(unfiltered_data, [genre], False, genre_index)
 
-        # Convert string representation of list to actual list and handle NaN values
-        def check_genre(genres_str):
-            if pd.isna(genres_str):
-                return False
-            try:
-                # Remove brackets and quotes, split by comma and strip whitespace
-                genres_list = [g.strip().strip('"\'').lower() for g in genres_str.strip("[]").split(",")]
-                return genre in genres_list
-            except:
-                return False
+    @staticmethod
+    @get_metrics().timed("filter", method="filter_by_genres")
+    def filter_by_genres(
+        unfiltered_data: pd.DataFrame,
+        genres: List[str],
+        match_all: bool = False,
+        genre_index: Optional[GenreIndex] = None
+    ) -> pd.DataFrame:
+        """
+        Filter books dataframe by several genres.
 
-        return unfiltered_data[unfiltered_data["genres"].apply(check_genre)]
+        Args:
+            unfiltered_data (pd.DataFrame): DataFrame containing book data
+            genres (List[str]): The genres to search for within the books' genre lists
+            match_all (bool): If True, books must include all genres. If False, any of them (default: False)
+            genre_index (GenreIndex): Prebuilt genre index of unfiltered_data (default: built on the fly)
+
+        Returns:
+            pd.DataFrame: Filtered dataframe containing only books that include the specified genres
+
+        Raises:
+            ValueError: If genres is empty or if the genre index does not belong to unfiltered_data
+        """
+        if not genres or not all(isinstance(genre, str) and genre.strip() for genre in genres):
+            raise ValueError("Genres must be a non-empty list of non-empty strings")
+
+        return DataFilter._filter_by_genre_list(unfiltered_data, genres, match_all, genre_index)
+
+    @staticmethod
+    def _filter_by_genre_list(
+        unfiltered_data: pd.DataFrame, genres: List[str], match_all: bool, genre_index: Optional[GenreIndex]
+    ) -> pd.DataFrame:
+        """Match validated genres, untimed so the public filters calling it are timed once."""
+        if genre_index is None:
+            # Without an index, the query matches the genre lists of its candidate rows only
+            return DataFilter.query(unfiltered_data).genre(*genres, match_all=match_all).to_frame()
+        if genre_index.n_rows != len(unfiltered_data):
+            raise ValueError("Genre index was built for a different dataframe")
+
+        return unfiltered_data.iloc[genre_index.lookup_many(genres, match_all)]
 
     @staticmethod
-    def filter_by_minimum_pages(unfiltered_data: pd.DataFrame, minimum_pages: int) -> pd.DataFrame:
+    @get_metrics().timed("filter", method="filter_by_minimum_pages")
+    def filter_by_minimum_pages(
+        unfiltered_data: pd.DataFrame, minimum_pages: int, pages_index: Optional[SortedIndex] = None
+    ) -> pd.DataFrame:
         """
         Filter books dataframe by minimum number of pages.
 
         Args:
             unfiltered_data (pd.DataFrame): DataFrame containing book data
             minimum_pages (int): The minimum number of pages a book must have to be included
+            pages_index (SortedIndex): Prebuilt page count index of unfiltered_data (default: compare the whole column)
 
         Returns:
             pd.DataFrame: Filtered dataframe containing only books with at least the specified number of pages
 
         Raises:
-            ValueError: If minimum_pages is not a positive integer
+            ValueError: If minimum_pages is not a positive integer or if the page count index does not belong to
+                unfiltered_data
         """
         if not isinstance(minimum_pages, int) or minimum_pages < 0:
             raise ValueError("Minimum pages must be a non-negative integer")
 
+        if pages_index is not None:
+            return DataFilter._filter_by_sorted_index(unfiltered_data, pages_index, minimum=minimum_pages)
+
         # Handle NaN values by excluding them from results when filtering
         return unfiltered_data[unfiltered_data["pages"].notna() & (unfiltered_data["pages"] >= minimum_pages)]
 
     @staticmethod
-    def filter_by_maximum_pages(unfiltered_data: pd.DataFrame, maximum_pages: int) -> pd.DataFrame:
+    @get_metrics().timed("filter", method="filter_by_maximum_pages")
+    def filter_by_maximum_pages(
+        unfiltered_data: pd.DataFrame, maximum_pages: int, pages_index: Optional[SortedIndex] = None
+    ) -> pd.DataFrame:
         """
         Filter books dataframe by maximum number of pages.
 
         Args:
             unfiltered_data (pd.DataFrame): DataFrame containing book data
             maximum_pages (int): The maximum number of pages a book can have to be included
+            pages_index (SortedIndex): Prebuilt page count index of unfiltered_data (default: compare the whole column)
 
         Returns:
             pd.DataFrame: Filtered dataframe containing only books with at most the specified number of pages
 
         Raises:
-            ValueError: If maximum_pages is not a positive integer
+            ValueError: If maximum_pages is not a positive integer or if the page count index does not belong to
+                unfiltered_data
         """
         if not isinstance(maximum_pages, int) or maximum_pages < 0:
             raise ValueError("Maximum pages must be a non-negative integer")
 
+        if pages_index is not None:
+            return DataFilter._filter_by_sorted_index(unfiltered_data, pages_index, maximum=maximum_pages)
+
         # Handle NaN values by excluding them from results when filtering
         return unfiltered_data[unfiltered_data["pages"].notna() & (unfiltered_data["pages"] <= maximum_pages)]
 
     @staticmethod
-    def filter_by_isbn(unfiltered_data: pd.DataFrame, isbn_query: str) -> pd.DataFrame:
+    def _filter_by_sorted_index(
+        unfiltered_data: pd.DataFrame,
+        sorted_index: SortedIndex,
+        minimum: Optional[float] = None,
+        maximum: Optional[float] = None
+    ) -> pd.DataFrame:
+        """Answer a numeric range filter with binary searches on a prebuilt sorted index of unfiltered_data."""
+        if sorted_index.n_rows != len(unfiltered_data):
+            raise ValueError("Sorted index was built for a different dataframe")
+
+        return unfiltered_data.iloc[sorted_index.range(minimum, maximum)]
+
+    @staticmethod
+    @get_metrics().timed("filter", method="filter_by_isbn")
+    def filter_by_isbn(
+        unfiltered_data: pd.DataFrame, isbn_query: str, isbn_index: Optional[IsbnIndex] = None
+    ) -> pd.DataFrame:
         """
         Filter books dataframe by ISBN.
 
         Args:
             unfiltered_data (pd.DataFrame): DataFrame containing book data
             isbn_query (str): The ISBN to search for
+            isbn_index (IsbnIndex): Prebuilt ISBN index of unfiltered_data, which also matches the ISBN-10/ISBN-13
+                counterpart of the query (default: compare the whole column)
 
         Returns:
             pd.DataFrame: Filtered dataframe containing only books matching the specified ISBN
 
         Raises:
-            ValueError: If isbn_query is empty or not in a valid ISBN format
+            ValueError: If isbn_query is empty, not in a valid ISBN format or if the ISBN index does not belong to
+                unfiltered_data
         """
         if not isinstance(isbn_query, str) or not isbn_query.strip():
             raise ValueError("ISBN query must be a non-empty string")
@@ -198,6 +381,44 @@ class DataFilter:
         if not isbn_query.isalnum() or (len(isbn_query) != 10 and len(isbn_query) != 13):
             raise ValueError("ISBN must be either 10 or 13 characters long and contain only letters and numbers")
 
+        if isbn_index is not None:
+            return DataFilter._lookup_isbns(unfiltered_data, [isbn_query], isbn_index)
+
         # Clean ISBNs in dataframe for comparison
-        clean_isbns = unfiltered_data["isbn"].str.replace("-", "").str.replace(" ", "")
-        return unfiltered_data[clean_isbns == isbn_query]
+        return unfiltered_data[BookSchema.match_text(
+            unfiltered_data["isbn"], lambda isbns: isbns.str.replace("-", "").str.replace(" ", "") == isbn_query
+        )]
+
+    @staticmethod
+    @get_metrics().timed("filter", method="filter_by_isbns")
+    def filter_by_isbns(
+        unfiltered_data: pd.DataFrame, isbns: Iterable[str], isbn_index: Optional[IsbnIndex] = None
+    ) -> pd.DataFrame:
+        """
+        Look up many books by ISBN at once.
+
+        Args:
+            unfiltered_data (pd.DataFrame): DataFrame containing book data
+            isbns (Iterable[str]): The ISBNs to resolve, hyphens and spaces are ignored
+            isbn_index (IsbnIndex): Prebuilt ISBN index of unfiltered_data (default: built on the fly)
+
+        Returns:
+            pd.DataFrame: The books found, in the order of isbns; unknown ISBNs are skipped
+
+        Raises:
+            ValueError: If the ISBN index does not belong to unfiltered_data
+        """
+        return DataFilter._lookup_isbns(unfiltered_data, isbns, isbn_index)
+
+    @staticmethod
+    def _lookup_isbns(
+        unfiltered_data: pd.DataFrame, isbns: Iterable[str], isbn_index: Optional[IsbnIndex]
+    ) -> pd.DataFrame:
+        """Resolve ISBNs through the index, untimed so the public filters calling it are timed once."""
+        if isbn_index is None:
+            isbn_index = IsbnIndex.from_dataframe(unfiltered_data)
+        elif isbn_index.n_rows != len(unfiltered_data):
+            raise ValueError("ISBN index was built for a different dataframe")
+
+        positions = isbn_index.lookup_many(isbns)
+        return unfiltered_data.iloc[positions[positions >= 0]]
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from typing import Iterable, List
+
+
+class GenreIndex:
+    """
+    Inverted index from normalized genre to the sorted row positions of the books listing it.
+
+    The stringified genre lists are parsed once when the index is built. Postings are stored in CSR
+    layout: the positions of genre id i are positions[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, genres: List[str], offsets: np.ndarray, positions: np.ndarray, n_rows: int):
+        self.genres = genres
+        self.offsets = offsets
+        self.positions = positions
+        self.n_rows = n_rows
+        self._ids = {genre.lower(): genre_id for genre_id, genre in enumerate(genres)}
+
+    @property
+    def nbytes(self) -> int:
+        return self.offsets.nbytes + self.positions.nbytes
+
+    @staticmethod
+    def parse_genres(genres: pd.Series) -> pd.Series:
+        """
+        Split genre lists into one entry per (row position, genre).
+
+        Args:
+            genres (pd.Series): Genre lists stored as strings, e.g. "['Fantasy', 'Fiction']", or as the Arrow
+                list column produced by BookSchema
+
+        Returns:
+            pd.Series: Stripped genre names indexed by the row position they belong to
+        """
+        if isinstance(genres.dtype, pd.ArrowDtype) and pa.types.is_list(genres.dtype.pyarrow_dtype):
+            # Already parsed, flattening the lists is enough; parent indices count across all chunks
+            lists = pa.chunked_array(genres.array.__arrow_array__())
+            items = pc.list_flatten(lists).cast(pa.string()).to_pandas()
+            items.index = pc.list_parent_indices(lists).to_numpy()
+            return items
+
+        values = genres.reset_index(drop=True).dropna().astype(str)
+        # Remove brackets and quotes, split by comma and strip whitespace, with Arrow kernels instead of per-string
+        # Python calls
+        lists = pc.split_pattern(pc.utf8_trim(pa.array(values.to_numpy(dtype=object), type=pa.string()), "[]"), ",")
+        names = pc.utf8_trim_whitespace(pc.utf8_trim(pc.utf8_trim_whitespace(pc.list_flatten(lists)), "\"'"))
+        keep = pc.not_equal(names, "")
+        rows = values.index.to_numpy()[pc.list_parent_indices(lists).filter(keep).to_numpy()]
+        return pd.Series(names.filter(keep).to_numpy(zero_copy_only=False), index=rows)
+
+    @staticmethod
+    def match_lists(genres: pd.Series, wanted: Iterable[str], match_all: bool = False) -> np.ndarray:
+        """
+        Tell which rows of an Arrow genre list column list the wanted genres, without building an index.
+
+        Only the shared genre vocabulary is compared as strings; the rows are matched by gathering their
+        dictionary codes, so the work runs in pyarrow and numpy kernels that release the GIL.
+
+        Args:
+            genres (pd.Series): Arrow list column of dictionary-encoded genres, as produced by BookSchema
+            wanted (Iterable[str]): Genre names, compared case-insensitively
+            match_all (bool): If True, rows must list every genre (AND). If False, any of them (OR) (default: False)
+
+        Returns:
+            np.ndarray: Boolean array, False for rows without genres
+        """
+        wanted = list(dict.fromkeys(genre.lower().strip() for genre in wanted))
+        lists = pa.chunked_array(genres.array.__arrow_array__())
+        items = pc.list_flatten(lists).unify_dictionaries()
+        rows = pc.list_parent_indices(lists).to_numpy()
+        if not items.num_chunks or not wanted:
+            return np.zeros(len(genres), dtype=bool)
+
+        # Number of the wanted genre per vocabulary entry, -1 for other genres and for the null code appended last
+        vocabulary = items.chunk(0).dictionary
+        names = pc.utf8_lower(vocabulary).to_numpy(zero_copy_only=False)
+        genre_numbers = np.full(len(vocabulary) + 1, -1, dtype=np.int64)
+        for number, genre in enumerate(wanted):
+            genre_numbers[:-1][names == genre] = number
+
+        codes = np.concatenate([
+            pc.fill_null(chunk.indices, len(vocabulary)).to_numpy() for chunk in items.chunks
+        ])
+        item_numbers = genre_numbers[codes]
+
+        if not match_all:
+            matches = np.zeros(len(genres), dtype=bool)
+            matches[rows[item_numbers >= 0]] = True
+            return matches
+
+        matches = np.ones(len(genres), dtype=bool)
+        for number in range(len(wanted)):
+            listed = np.zeros(len(genres), dtype=bool)
+            listed[rows[item_numbers == number]] = True
+            matches &= listed
+        return matches
+
+    @classmethod
+    def from_series(cls, genres: pd.Series) -> "GenreIndex":
+        """Build the index from a column of stringified genre lists."""
+        n_rows = len(genres)
+        names = cls.parse_genres(genres)
+        rows = names.index.to_numpy(dtype=np.int64)
+        ids, vocabulary = pd.factorize(names.str.lower(), sort=True)
+
+        # Keep the first spelling of every genre for display
+        display = names.groupby(ids).first().tolist()
+
+        return cls._from_pairs(display, ids.astype(np.int64), rows, n_rows)
+
+    @classmethod
+    def _from_pairs(cls, display: List[str], ids: np.ndarray, rows: np.ndarray, n_rows: int) -> "GenreIndex":
+        """Build the CSR postings from (genre id, row position) pairs."""
+        # Encoding (id, row) pairs as one integer sorts by id, then row, and drops duplicate genres per book
+        pairs = np.unique(ids * max(n_rows, 1) + rows)
+        counts = np.bincount(pairs // max(n_rows, 1), minlength=len(display))
+        offsets = np.zeros(len(display) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        position_dtype = np.int32 if n_rows <= np.iinfo(np.int32).max else np.int64
+        positions = (pairs % max(n_rows, 1)).astype(position_dtype)
+
+        return cls(display, offsets, positions, n_rows)
+
+    @classmethod
+    def from_dataframe(cls, book_data: pd.DataFrame) -> "GenreIndex":
+        """Build the index from the genres column of the book data."""
+        return cls.from_series(book_data["genres"])
+
+    def updated(self, genres: pd.Series, rows: np.ndarray) -> "GenreIndex":
+        """
+        Return a copy of the index reflecting changed or appended rows.
+
+        Only the genre lists of the given rows are parsed; their old postings are dropped and the new ones merged
+        in, with unseen genres added to the vocabulary.
+
+        Args:
+            genres (pd.Series): The whole genres column after the change, rows before n_rows keep their positions
+            rows (np.ndarray): Sorted positions of the changed and appended rows
+
+        Returns:
+            GenreIndex: The new index; this one keeps answering queries for the previous data
+        """
+        names = self.parse_genres(genres.iloc[rows])
+        keys, distinct = pd.factorize(names.str.lower())
+        spellings = names.groupby(keys).first()
+
+        display = list(self.genres)
+        distinct_ids = []
+        for key, spelling in zip(distinct, spellings):
+            genre_id = self._ids.get(key)
+            if genre_id is None:
+                genre_id = len(display)
+                display.append(spelling)
+            distinct_ids.append(genre_id)
+
+        old_ids = np.repeat(np.arange(len(self.genres), dtype=np.int64), np.diff(self.offsets))
+        keep = ~np.isin(self.positions, rows)
+        ids = np.concatenate((old_ids[keep], np.asarray(distinct_ids, dtype=np.int64)[keys]))
+        positions = np.concatenate((self.positions[keep], rows[names.index.to_numpy()])).astype(np.int64)
+
+        return self._from_pairs(display, ids, positions, len(genres))
+
+    def sorted_genres(self) -> List[str]:
+        """Return the genre names in alphabetical order for display."""
+        return sorted(self.genres)
+
+    def lookup(self, genre: str) -> np.ndarray:
+        """
+        Return the sorted row positions of the books listing a genre.
+
+        Args:
+            genre (str): Genre name, compared case-insensitively
+
+        Returns:
+            np.ndarray: Row positions, empty if the genre is unknown
+        """
+        genre_id = self._ids.get(genre.lower().strip())
+        if genre_id is None:
+            return self.positions[:0]
+        return self.positions[self.offsets[genre_id]:self.offsets[genre_id + 1]]
+
+    def lookup_many(self, genres: Iterable[str], match_all: bool = False) -> np.ndarray:
+        """
+        Combine the postings of several genres.
+
+        Args:
+            genres (Iterable[str]): Genre names, compared case-insensitively
+            match_all (bool): If True, books must list every genre (AND). If False, any of them (OR) (default: False)
+
+        Returns:
+            np.ndarray: Sorted row positions of the matching books
+        """
+        postings = [self.lookup(genre) for genre in genres]
+        if not postings:
+            return self.positions[:0]
+
+        if match_all:
+            # Intersect starting from the rarest genre so intermediate results stay small
+            postings.sort(key=len)
+            result = postings[0]
+            for posting in postings[1:]:
+                if not len(result):
+                    break
+                result = np.intersect1d(result, posting, assume_unique=True)
+            return result
+
+        return np.unique(np.concatenate(postings))
@@ -0,0 +1,108 @@
+import sys
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional
+
+
+class IsbnIndex:
+    """
+    Hash map from normalized ISBN to row position.
+
+    ISBNs are normalized by removing hyphens and spaces. Every book is reachable both by the ISBN stored in the
+    dataset and by its ISBN-10/ISBN-13 counterpart, when it has one.
+    """
+
+    def __init__(self, positions: Dict[str, int], n_rows: int):
+        self.positions = positions
+        self.n_rows = n_rows
+
+    @property
+    def nbytes(self) -> int:
+        # getsizeof only covers the hash table, add roughly one short key string and int per entry
+        return sys.getsizeof(self.positions) + len(self.positions) * 90
+
+    @staticmethod
+    def normalize(isbn: str) -> str:
+        """Remove hyphens and spaces and uppercase a trailing X check digit."""
+        return str(isbn).strip().replace("-", "").replace(" ", "").upper()
+
+    @staticmethod
+    def convert(isbn: str) -> Optional[str]:
+        """
+        Convert a normalized ISBN-10 to ISBN-13 or a 978-prefixed ISBN-13 to ISBN-10.
+
+        Args:
+            isbn (str): Normalized ISBN
+
+        Returns:
+            str: The counterpart ISBN, or None if there is none
+        """
+        if len(isbn) == 10 and isbn[:9].isdigit():
+            body = "978" + isbn[:9]
+            check = (10 - sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(body)) % 10) % 10
+            return body + str(check)
+
+        if len(isbn) == 13 and isbn.isdigit() and isbn.startswith("978"):
+            body = isbn[3:12]
+            check = (11 - sum(int(digit) * (10 - i) for i, digit in enumerate(body)) % 11) % 11
+            return body + ("X" if check == 10 else str(check))
+
+        return None
+
+    @classmethod
+    def from_series(cls, isbns: pd.Series) -> "IsbnIndex":
+        """Build the index from an ISBN column."""
+        normalized = [cls.normalize(isbn) for isbn in isbns.astype(str)]
+        positions = {isbn: position for position, isbn in enumerate(normalized)}
+
+        # ISBNs stored in the dataset take precedence over converted ones
+        for position, isbn in enumerate(normalized):
+            counterpart = cls.convert(isbn)
+            if counterpart is not None:
+                positions.setdefault(counterpart, position)
+
+        return cls(positions, len(normalized))
+
+    @classmethod
+    def from_dataframe(cls, book_data: pd.DataFrame) -> "IsbnIndex":
+        """Build the index from the isbn column of the book data."""
+        return cls.from_series(book_data["isbn"])
+
+    def updated(self, isbns: pd.Series, rows: np.ndarray) -> "IsbnIndex":
+        """
+        Return a copy of the index with the ISBNs of changed or appended rows added.
+
+        Args:
+            isbns (pd.Series): The whole ISBN column after the change, rows before n_rows keep their positions
+            rows (np.ndarray): Sorted positions of the changed and appended rows
+
+        Returns:
+            IsbnIndex: The new index; this one keeps answering lookups for the previous data
+        """
+        positions = dict(self.positions)
+        normalized = [self.normalize(isbn) for isbn in isbns.iloc[rows].astype(str)]
+        for position, isbn in zip(rows.tolist(), normalized):
+            positions[isbn] = position
+        for position, isbn in zip(rows.tolist(), normalized):
+            counterpart = self.convert(isbn)
+            if counterpart is not None:
+                positions.setdefault(counterpart, position)
+
+        return IsbnIndex(positions, len(isbns))
+
+    def lookup(self, isbn: str) -> Optional[int]:
+        """Return the row position of the book with the given ISBN, or None if it is unknown."""
+        return self.positions.get(self.normalize(isbn))
+
+    def lookup_many(self, isbns: Iterable[str]) -> np.ndarray:
+        """
+        Resolve many ISBNs at once.
+
+        Args:
+            isbns (Iterable[str]): ISBNs in any supported notation
+
+        Returns:
+            np.ndarray: Row position of every ISBN in input order, -1 for unknown ones
+        """
+        get = self.positions.get
+        return np.fromiter((get(self.normalize(isbn), -1) for isbn in isbns), dtype=np.int64)
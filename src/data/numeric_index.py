@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+from src.data.schema import BookSchema
+
+
+class SortedIndex:
+    """
+    Sorted copy of a numeric column for range queries.
+
+    values holds the non-missing values in ascending order and positions the row position of each of them,
+    so a range filter becomes two binary searches plus a sort of the matching slice back into row order, and
+    the number of matches is known without touching rows.
+    """
+
+    def __init__(self, values: np.ndarray, positions: np.ndarray, n_rows: int):
+        self.values = values
+        self.positions = positions
+        self.n_rows = n_rows
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.positions.nbytes
+
+    @classmethod
+    def from_series(cls, column: pd.Series) -> "SortedIndex":
+        """Build the index from a numeric column, rows with missing values are left out."""
+        values = BookSchema.numeric_values(column)
+        positions = np.flatnonzero(~np.isnan(values))
+        order = np.argsort(values[positions], kind="stable")
+        position_dtype = np.int32 if len(values) <= np.iinfo(np.int32).max else np.int64
+
+        return cls(values[positions][order], positions[order].astype(position_dtype), len(values))
+
+    @classmethod
+    def for_column(cls, column: str):
+        """Return a builder indexing the given column of the book data."""
+        def build(book_data: pd.DataFrame) -> "SortedIndex":
+            return cls.from_series(book_data[column])
+
+        return build
+
+    def _bounds(self, minimum: Optional[float], maximum: Optional[float]) -> Tuple[int, int]:
+        """Return the slice of the sorted values within [minimum, maximum]; None leaves a bound open."""
+        # Bounds are compared at the precision of the values, like the column itself would be
+        cast = self.values.dtype.type
+        start = 0 if minimum is None else int(np.searchsorted(self.values, cast(minimum), side="left"))
+        stop = len(self.values) if maximum is None else int(np.searchsorted(self.values, cast(maximum), side="right"))
+        return start, max(start, stop)
+
+    def count(self, minimum: Optional[float] = None, maximum: Optional[float] = None) -> int:
+        """
+        Count the rows whose value lies within the bounds, in O(log n).
+
+        Args:
+            minimum (float): Inclusive lower bound (default: open)
+            maximum (float): Inclusive upper bound (default: open)
+
+        Returns:
+            int: Number of matching rows
+        """
+        start, stop = self._bounds(minimum, maximum)
+        return stop - start
+
+    def range(self, minimum: Optional[float] = None, maximum: Optional[float] = None) -> np.ndarray:
+        """
+        Return the positions of the rows whose value lies within the bounds, in O(log n + k log k) for k matches.
+
+        Sorting the k positions back into row order beats marking them in a mask over all rows and collecting
+        it with np.flatnonzero, even when nearly every row matches.
+
+        Args:
+            minimum (float): Inclusive lower bound (default: open)
+            maximum (float): Inclusive upper bound (default: open)
+
+        Returns:
+            np.ndarray: Matching row positions in row order
+        """
+        start, stop = self._bounds(minimum, maximum)
+        return np.sort(self.positions[start:stop])
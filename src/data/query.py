@@ -0,0 +1,515 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, List, Optional, Tuple
+
+from src.data.facets import FacetCounts, FacetIndex
+from src.data.genre_index import GenreIndex
+from src.data.isbn_index import IsbnIndex
+from src.data.query_cache import QueryCache
+from src.data.ranking import RankedResults, text_relevance
+from src.data.schema import BookSchema
+from src.data.sharding import ShardedExecutor
+from src.data.text_index import DEFAULT_MIN_SIMILARITY, TextIndex
+from src.monitoring.metrics import get_metrics
+
+# Relevance points of a perfect fuzzy match; similarity outweighs the 0 to 3 points of text_relevance
+FUZZY_RELEVANCE_POINTS = 400
+
+# Rough share of rows kept by a predicate that cannot be answered from an index, used to order them
+DEFAULT_SELECTIVITY = {
+    "isbn": 0.0,
+    "title": 0.01,
+    "author": 0.01,
+    "genre": 0.1,
+    "language": 0.3,
+    "pages": 0.5,
+    "rating": 0.5,
+}
+
+
+class _Predicate:
+    """One filter criterion of a query, evaluated either from an index or as a mask over candidate rows."""
+
+    name = ""
+
+    def __init__(self, key: tuple):
+        # Normalized parameters identifying the predicate
+        self.key = (self.name,) + key
+
+    def lookup(self, get_index: Callable[[str], Any]) -> Optional[np.ndarray]:
+        """Return the sorted matching row positions if an index can answer the predicate, else None."""
+        return None
+
+    def estimate(self, data: pd.DataFrame, get_index: Callable[[str], Any]) -> float:
+        """Estimate how many rows of data the predicate keeps."""
+        return DEFAULT_SELECTIVITY[self.name] * len(data)
+
+    def mask(self, data: pd.DataFrame, candidates: np.ndarray) -> np.ndarray:
+        """Return a boolean array telling which candidate row positions match."""
+        raise NotImplementedError
+
+    def shardable(self, data: pd.DataFrame) -> bool:
+        """
+        Tell whether mask() gains from running on shards of the candidates in parallel.
+
+        Only masks whose work happens in kernels releasing the GIL qualify, like the numpy comparisons of the
+        numeric predicates; shards of Python-level work would just take turns on one core.
+        """
+        return True
+
+    def relevance(
+        self, data: pd.DataFrame, positions: np.ndarray, get_index: Callable[[str], Any]
+    ) -> Optional[np.ndarray]:
+        """Return non-negative integer relevance points per matching row, or None if the predicate has none."""
+        return None
+
+
+class _ColumnTextPredicate:
+    """
+    Mixin for text predicates, sharded only over Arrow-backed strings whose compute kernels release the GIL.
+
+    Categorical columns are matched once per category, sharding would repeat that, and object columns are
+    matched by Python string methods holding the GIL.
+    """
+
+    def shardable(self, data: pd.DataFrame) -> bool:
+        return ShardedExecutor.releases_gil(data[self.name])
+
+
+class _IndexedPredicate(_Predicate):
+    """Predicate answered from an index whose lookup result also serves as the exact estimate."""
+
+    def __init__(self, key: tuple):
+        super().__init__(key)
+        self._hits: Optional[np.ndarray] = None
+
+    def _lookup(self, index: Any) -> np.ndarray:
+        raise NotImplementedError
+
+    def lookup(self, get_index: Callable[[str], Any]) -> Optional[np.ndarray]:
+        if self._hits is None:
+            index = get_index(self.name)
+            if index is not None:
+                self._hits = self._lookup(index)
+        return self._hits
+
+    def estimate(self, data: pd.DataFrame, get_index: Callable[[str], Any]) -> float:
+        hits = self.lookup(get_index)
+        return super().estimate(data, get_index) if hits is None else len(hits)
+
+
+class _TextPredicate(_ColumnTextPredicate, _IndexedPredicate):
+    def __init__(self, column: str, query: str, exact_match: bool):
+        self.name = column
+        self.query = query
+        self.exact_match = exact_match
+        super().__init__((query, exact_match))
+
+    def _lookup(self, text_index: TextIndex) -> np.ndarray:
+        return text_index.exact(self.query) if self.exact_match else text_index.contains(self.query)
+
+    def mask(self, data: pd.DataFrame, candidates: np.ndarray) -> np.ndarray:
+        def matches(texts: pd.Series) -> pd.Series:
+            values = TextIndex.normalize(texts)
+            if self.exact_match:
+                return values == self.query
+            return values.str.contains(self.query, na=False, regex=False)
+
+        return BookSchema.match_text(ShardedExecutor.rows(data[self.name], candidates), matches)
+
+    def relevance(
+        self, data: pd.DataFrame, positions: np.ndarray, get_index: Callable[[str], Any]
+    ) -> Optional[np.ndarray]:
+        return text_relevance(data[self.name].iloc[positions], self.query)
+
+
+class _FuzzyTextPredicate(_ColumnTextPredicate, _IndexedPredicate):
+    def __init__(self, column: str, query: str, min_similarity: float):
+        self.name = column
+        self.query = query
+        self.min_similarity = min_similarity
+        self._similarities: Optional[np.ndarray] = None
+        super().__init__((query, "fuzzy", float(min_similarity)))
+
+    def _lookup(self, text_index: TextIndex) -> np.ndarray:
+        hits, self._similarities = text_index.similar(self.query, self.min_similarity)
+        return hits
+
+    def estimate(self, data: pd.DataFrame, get_index: Callable[[str], Any]) -> float:
+        hits = self.lookup(get_index)
+        # Without an index, matching builds a word index of the candidates, so it should see as few as possible
+        return len(data) if hits is None else len(hits)
+
+    def shardable(self, data: pd.DataFrame) -> bool:
+        # The local trigram index is built in Python, holding the GIL
+        return False
+
+    def mask(self, data: pd.DataFrame, candidates: np.ndarray) -> np.ndarray:
+        # Index only the candidates' values, positions in the local index are offsets into candidates
+        local_hits, _ = TextIndex.from_series(ShardedExecutor.rows(data[self.name], candidates)).similar(
+            self.query, self.min_similarity
+        )
+        matches = np.zeros(len(candidates), dtype=bool)
+        matches[local_hits] = True
+        return matches
+
+    def relevance(
+        self, data: pd.DataFrame, positions: np.ndarray, get_index: Callable[[str], Any]
+    ) -> Optional[np.ndarray]:
+        hits = self.lookup(get_index)
+        if hits is not None:
+            # The results are a subset of the index hits, both sorted
+            similarities = self._similarities[np.searchsorted(hits, positions)]
+        else:
+            local_hits, local_similarities = TextIndex.from_series(data[self.name].iloc[positions]).similar(
+                self.query, self.min_similarity
+            )
+            similarities = np.zeros(len(positions), dtype=np.float32)
+            similarities[local_hits] = local_similarities
+
+        points = np.round(similarities * FUZZY_RELEVANCE_POINTS).astype(np.int64)
+        return points + text_relevance(data[self.name].iloc[positions], self.query)
+
+
+class _RatingPredicate(_Predicate):
+    name = "rating"
+
+    def __init__(self, minimum_rating: float):
+        self.minimum_rating = minimum_rating
+        super().__init__((float(minimum_rating),))
+
+    def lookup(self, get_index: Callable[[str], Any]) -> Optional[np.ndarray]:
+        rating_index = get_index(self.name)
+        return None if rating_index is None else rating_index.range(self.minimum_rating)
+
+    def estimate(self, data: pd.DataFrame, get_index: Callable[[str], Any]) -> float:
+        rating_index = get_index(self.name)
+        if rating_index is not None:
+            return rating_index.count(self.minimum_rating)
+        # Ratings range from 0 to 5, assume they are spread evenly
+        return len(data) * min(max(1.0 - self.minimum_rating / 5.0, 0.0), 1.0)
+
+    def mask(self, data: pd.DataFrame, candidates: np.ndarray) -> np.ndarray:
+        ratings = BookSchema.numeric_values(ShardedExecutor.rows(data["rating"], candidates))
+        return ratings >= ratings.dtype.type(self.minimum_rating)
+
+
+class _PagesPredicate(_Predicate):
+    name = "pages"
+
+    def __init__(self, minimum_pages: Optional[int], maximum_pages: Optional[int]):
+        self.minimum_pages = minimum_pages
+        self.maximum_pages = maximum_pages
+        super().__init__((minimum_pages, maximum_pages))
+
+    def lookup(self, get_index: Callable[[str], Any]) -> Optional[np.ndarray]:
+        pages_index = get_index(self.name)
+        return None if pages_index is None else pages_index.range(self.minimum_pages, self.maximum_pages)
+
+    def estimate(self, data: pd.DataFrame, get_index: Callable[[str], Any]) -> float:
+        pages_index = get_index(self.name)
+        if pages_index is not None:
+            return pages_index.count(self.minimum_pages, self.maximum_pages)
+        return super().estimate(data, get_index)
+
+    def mask(self, data: pd.DataFrame, candidates: np.ndarray) -> np.ndarray:
+        pages = BookSchema.numeric_values(ShardedExecutor.rows(data["pages"], candidates))
+        # Comparisons with NaN are False, so books without a page count are excluded
+        matches = ~np.isnan(pages)
+        if self.minimum_pages is not None:
+            matches &= pages >= self.minimum_pages
+        if self.maximum_pages is not None:
+            matches &= pages <= self.maximum_pages
+        return matches
+
+
+class _LanguagePredicate(_ColumnTextPredicate, _Predicate):
+    name = "language"
+
+    def __init__(self, language: str):
+        self.language = language
+        super().__init__((language,))
+
+    def mask(self, data: pd.DataFrame, candidates: np.ndarray) -> np.ndarray:
+        return BookSchema.match_text(
+            ShardedExecutor.rows(data["language"], candidates), lambda languages: languages.str.lower() == self.language
+        )
+
+
+class _GenrePredicate(_IndexedPredicate):
+    name = "genre"
+
+    def __init__(self, genres: List[str], match_all: bool):
+        self.genres = genres
+        self.match_all = match_all
+        super().__init__((tuple(sorted(genres)), match_all))
+
+    def _lookup(self, genre_index: GenreIndex) -> np.ndarray:
+        return genre_index.lookup_many(self.genres, self.match_all)
+
+    def shardable(self, data: pd.DataFrame) -> bool:
+        # Genre lists of the schema are matched by Arrow and numpy kernels; parsing stringified lists into a local
+        # genre index holds the GIL for most of its run time
+        return BookSchema.is_genre_list(data["genres"])
+
+    def mask(self, data: pd.DataFrame, candidates: np.ndarray) -> np.ndarray:
+        genres = ShardedExecutor.rows(data["genres"], candidates)
+        if BookSchema.is_genre_list(genres):
+            return GenreIndex.match_lists(genres, self.genres, self.match_all)
+
+        # Parse only the candidates' genre lists, positions in the local index are offsets into candidates
+        local_index = GenreIndex.from_series(genres)
+        matches = np.zeros(len(candidates), dtype=bool)
+        matches[local_index.lookup_many(self.genres, self.match_all)] = True
+        return matches
+
+
+class _IsbnPredicate(_ColumnTextPredicate, _IndexedPredicate):
+    name = "isbn"
+
+    def __init__(self, isbn: str):
+        self.isbn = isbn
+        super().__init__((isbn,))
+
+    def _lookup(self, isbn_index: IsbnIndex) -> np.ndarray:
+        positions = isbn_index.lookup_many([self.isbn])
+        return positions[positions >= 0]
+
+    def mask(self, data: pd.DataFrame, candidates: np.ndarray) -> np.ndarray:
+        return BookSchema.match_text(
+            ShardedExecutor.rows(data["isbn"], candidates), lambda isbns: isbns.str.replace("-", "").str.replace(" ", "") == self.isbn
+        )
+
+
+class BookQuery:
+    """
+    Lazily built, composable query over the book data.
+
+    Criteria are collected first and only evaluated when a result is requested. Predicates are applied in the
+    order of their estimated selectivity, exact where an index can count the matches. Each one either intersects
+    its index hits with the current candidates or, once the candidates are fewer than its hits, is checked as a
+    mask on the candidates only. With an executor, masks over many candidates run in parallel row shards. The
+    DataFrame is materialized once, for the requested rows only. With a result cache, the row positions of a
+    query are reused by every later query with the same normalized key.
+
+    Example:
+        DataFilter.query(df).title("potter").min_rating(4.0).pages(100, 500).genre("Fantasy").page(1, 10)
+    """
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        get_index: Optional[Callable[[str], Any]] = None,
+        result_cache: Optional[QueryCache] = None,
+        data_version: int = 0,
+        executor: Optional[ShardedExecutor] = None
+    ):
+        self.data = data
+        self._get_index = get_index if get_index is not None else (lambda name: None)
+        self._result_cache = result_cache
+        self._data_version = data_version
+        self._executor = executor
+        self._predicates: List[_Predicate] = []
+        self._positions: Optional[np.ndarray] = None
+
+    def _add(self, predicate: _Predicate) -> "BookQuery":
+        self._predicates.append(predicate)
+        self._positions = None
+        return self
+
+    def title(self, title_query: str, exact_match: bool = False, fuzzy: bool = False) -> "BookQuery":
+        """
+        Keep books whose title contains (or, with exact_match, equals) the query, ignoring case.
+
+        With fuzzy, every query word only has to be similar to a word of the title, and the results rank by
+        similarity.
+        """
+        if not isinstance(title_query, str) or not title_query.strip():
+            raise ValueError("Title query must be a non-empty string")
+        return self._add(self._text_predicate("title", title_query, exact_match, fuzzy))
+
+    def author(self, author_query: str, exact_match: bool = False, fuzzy: bool = False) -> "BookQuery":
+        """Keep books whose author contains (or, with exact_match, equals, or with fuzzy, resembles) the query."""
+        if not isinstance(author_query, str) or not author_query.strip():
+            raise ValueError("Author query must be a non-empty string")
+        return self._add(self._text_predicate("author", author_query, exact_match, fuzzy))
+
+    @staticmethod
+    def _text_predicate(column: str, query: str, exact_match: bool, fuzzy: bool) -> _Predicate:
+        if exact_match and fuzzy:
+            raise ValueError("Choose either an exact or a fuzzy match")
+        if fuzzy:
+            return _FuzzyTextPredicate(column, query.lower().strip(), DEFAULT_MIN_SIMILARITY)
+        return _TextPredicate(column, query.lower().strip(), exact_match)
+
+    def min_rating(self, minimum_rating: float) -> "BookQuery":
+        """Keep books rated at least minimum_rating."""
+        if not isinstance(minimum_rating, (int, float)):
+            raise ValueError("Minimum rating must be a number")
+        return self._add(_RatingPredicate(minimum_rating))
+
+    def pages(self, minimum_pages: Optional[int] = None, maximum_pages: Optional[int] = None) -> "BookQuery":
+        """Keep books with a known page count within the given bounds; None leaves a bound open."""
+        for bound, label in ((minimum_pages, "Minimum"), (maximum_pages, "Maximum")):
+            if bound is not None and (not isinstance(bound, int) or bound < 0):
+                raise ValueError(f"{label} pages must be a non-negative integer")
+        return self._add(_PagesPredicate(minimum_pages, maximum_pages))
+
+    def language(self, language: str) -> "BookQuery":
+        """Keep books written in the given language, ignoring case."""
+        if not isinstance(language, str) or not language.strip():
+            raise ValueError("Language must be a non-empty string")
+        return self._add(_LanguagePredicate(language.lower().strip()))
+
+    def genre(self, *genres: str, match_all: bool = False) -> "BookQuery":
+        """Keep books listing any (or, with match_all, every) of the given genres."""
+        if not genres or not all(isinstance(genre, str) and genre.strip() for genre in genres):
+            raise ValueError("Genres must be a non-empty list of non-empty strings")
+        return self._add(_GenrePredicate([genre.lower().strip() for genre in genres], match_all))
+
+    def isbn(self, isbn_query: str) -> "BookQuery":
+        """Keep the book with the given ISBN; hyphens and spaces are ignored."""
+        if not isinstance(isbn_query, str) or not isbn_query.strip():
+            raise ValueError("ISBN query must be a non-empty string")
+        isbn_query = isbn_query.strip().replace("-", "").replace(" ", "")
+        if not isbn_query.isalnum() or (len(isbn_query) != 10 and len(isbn_query) != 13):
+            raise ValueError("ISBN must be either 10 or 13 characters long and contain only letters and numbers")
+        return self._add(_IsbnPredicate(isbn_query))
+
+    def key(self) -> tuple:
+        """Return a normalized, order-independent description of the query."""
+        return tuple(sorted((predicate.key for predicate in self._predicates), key=repr))
+
+    def positions(self) -> np.ndarray:
+        """
+        Evaluate the query plan.
+
+        With metrics enabled, every evaluation is timed and counted per combination of criteria and cache outcome.
+
+        Returns:
+            np.ndarray: Sorted row positions of the matching books
+        """
+        if self._positions is not None:
+            return self._positions
+
+        metrics = get_metrics()
+        criteria = self.criteria() if metrics.enabled else ""
+        with metrics.span("query", criteria=criteria):
+            self._positions, cache_outcome = self._evaluate()
+        metrics.increment("queries", criteria=criteria, cache=cache_outcome)
+        return self._positions
+
+    def criteria(self) -> str:
+        """Return the names of the query's criteria, e.g. "genre+rating", or "all" without criteria."""
+        return "+".join(sorted({predicate.name for predicate in self._predicates})) or "all"
+
+    def _evaluate(self) -> Tuple[np.ndarray, str]:
+        """Return the matching row positions and whether the result cache had them ("hit", "miss" or "off")."""
+        if self._result_cache is None:
+            cache_outcome = "off"
+        else:
+            cached = self._result_cache.get(self.key(), self._data_version)
+            if cached is not None:
+                return cached, "hit"
+            cache_outcome = "miss"
+
+        estimates = {id(predicate): predicate.estimate(self.data, self._get_index) for predicate in self._predicates}
+        candidates = None
+        for predicate in sorted(self._predicates, key=lambda predicate: estimates[id(predicate)]):
+            if candidates is not None and not len(candidates):
+                break
+
+            # Looking up hits only pays off while they are fewer than the rows left to check
+            hits = None
+            if candidates is None or estimates[id(predicate)] <= len(candidates):
+                hits = predicate.lookup(self._get_index)
+
+            if hits is not None:
+                candidates = hits if candidates is None else np.intersect1d(candidates, hits, assume_unique=True)
+            else:
+                if candidates is None:
+                    candidates = np.arange(len(self.data))
+                candidates = candidates[self._mask(predicate, candidates)]
+
+        positions = np.arange(len(self.data)) if candidates is None else candidates
+        if self._result_cache is not None:
+            self._result_cache.put(self.key(), positions, self._data_version)
+        return positions, cache_outcome
+
+    def _mask(self, predicate: _Predicate, candidates: np.ndarray) -> np.ndarray:
+        """Check a predicate on the candidates, in parallel shards when the query has an executor."""
+        if self._executor is None or not predicate.shardable(self.data):
+            return predicate.mask(self.data, candidates)
+        return self._executor.mask(lambda shard: predicate.mask(self.data, shard), candidates)
+
+    def ranked(self) -> RankedResults:
+        """
+        Rank the matching books without materializing them.
+
+        Title and author criteria contribute a relevance score, fuzzy ones mostly their similarity; rating and
+        popularity break ties.
+
+        Returns:
+            RankedResults: Row positions of the matches, sorted lazily page by page
+        """
+        positions = self.positions()
+        relevance = np.zeros(len(positions), dtype=np.int64)
+        for predicate in self._predicates:
+            points = predicate.relevance(self.data, positions, self._get_index)
+            if points is not None:
+                relevance += points
+
+        return RankedResults.rank(self.data, positions, relevance)
+
+    def facets(self, previous: Optional[FacetCounts] = None) -> FacetCounts:
+        """
+        Count the matching books per genre, language, rating bucket and page count bucket.
+
+        With a result cache, the counts are cached next to the row positions, so repeating a query reuses them.
+
+        Args:
+            previous (FacetCounts): Counts of an earlier query over the same data; if this query's results are a
+                subset of its results, the counts are updated from the removed rows only
+
+        Returns:
+            FacetCounts: Facet counts of the matching books
+        """
+        facet_index = self._get_index("facets")
+        if facet_index is None:
+            facet_index = FacetIndex.from_dataframe(self.data)
+
+        positions = self.positions()
+        if self._result_cache is not None:
+            counts = self._result_cache.get_facet_counts(self.key(), self._data_version)
+            if counts is not None:
+                return FacetCounts(facet_index, positions, counts)
+
+        if previous is not None and previous.index is facet_index:
+            facets = previous.narrow(positions)
+        else:
+            facets = facet_index.counts(positions)
+        if self._result_cache is not None:
+            self._result_cache.put_facet_counts(self.key(), facets.counts, self._data_version)
+        return facets
+
+    def count(self) -> int:
+        """Return the number of matching books without materializing them."""
+        return len(self.positions())
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materialize all matching books."""
+        return self.data.iloc[self.positions()]
+
+    def page(self, page: int, items_per_page: int) -> pd.DataFrame:
+        """
+        Materialize one page of the matching books.
+
+        Args:
+            page (int): Page number (1-based)
+            items_per_page (int): Number of books per page
+
+        Returns:
+            pd.DataFrame: The books on the requested page
+        """
+        start_idx = (page - 1) * items_per_page
+        return self.data.iloc[self.positions()[start_idx:start_idx + items_per_page]]
@@ -0,0 +1,151 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+
+import numpy as np
+
+# Default upper bound for the row positions and facet counts held by the cache
+DEFAULT_QUERY_CACHE_BYTES = 64 * 1024 ** 2
+
+# Suffix of the keys under which the facet counts of a query are stored next to its row positions
+FACETS_KEY = "facets"
+
+
+def _nbytes(value: Union[np.ndarray, Dict[str, np.ndarray]]) -> int:
+    """Return the size of an entry, row positions or facet count arrays."""
+    return value.nbytes if isinstance(value, np.ndarray) else sum(counts.nbytes for counts in value.values())
+
+
+class QueryCache:
+    """
+    Size-bounded LRU cache of query results, keyed on the normalized query of BookQuery.key().
+
+    Results are stored as read-only row position arrays, never as DataFrames, and optionally the facet counts of
+    those rows, which share the size bound and the LRU order. Every entry belongs to one dataset version; as soon
+    as a newer version is seen, all entries of older ones are dropped, so positions of a previous dataset are
+    never returned.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_QUERY_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._version = 0
+        self._nbytes = 0
+        self._entries: "OrderedDict[tuple, Union[np.ndarray, Dict[str, np.ndarray]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version: int) -> bool:
+        """Drop all entries when the dataset changed; returns False for requests about an outdated version."""
+        if version > self._version:
+            self._entries.clear()
+            self._nbytes = 0
+            self._version = version
+        return version == self._version
+
+    def get(self, key: tuple, version: int) -> Optional[np.ndarray]:
+        """
+        Return the cached row positions of a query.
+
+        Args:
+            key (tuple): Normalized query, see BookQuery.key()
+            version (int): Version of the dataset the query runs against
+
+        Returns:
+            np.ndarray: Read-only sorted row positions, or None on a miss
+        """
+        return self._get(key, version)
+
+    def get_facet_counts(self, key: tuple, version: int) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Return the cached facet counts of a query.
+
+        Args:
+            key (tuple): Normalized query, see BookQuery.key()
+            version (int): Version of the dataset the query runs against
+
+        Returns:
+            Dict[str, np.ndarray]: Read-only counts per facet as stored by put_facet_counts, or None on a miss
+        """
+        return self._get((key, FACETS_KEY), version)
+
+    def _get(self, key: tuple, version: int) -> Optional[Union[np.ndarray, Dict[str, np.ndarray]]]:
+        with self._lock:
+            positions = self._entries.get(key) if self._check_version(version) else None
+            if positions is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return positions
+
+    def put(self, key: tuple, positions: np.ndarray, version: int) -> None:
+        """
+        Store the row positions of a query, evicting the least recently used results beyond the size bound.
+
+        Args:
+            key (tuple): Normalized query, see BookQuery.key()
+            positions (np.ndarray): Sorted row positions, made read-only since they are shared from now on
+            version (int): Version of the dataset the positions refer to
+        """
+        positions.flags.writeable = False
+        self._put(key, positions, version)
+
+    def put_facet_counts(self, key: tuple, counts: Dict[str, np.ndarray], version: int) -> None:
+        """
+        Store the facet counts of a query's results.
+
+        Args:
+            key (tuple): Normalized query, see BookQuery.key()
+            counts (Dict[str, np.ndarray]): Counts per facet, made read-only since they are shared from now on
+            version (int): Version of the dataset the counts refer to
+        """
+        for facet_counts in counts.values():
+            facet_counts.flags.writeable = False
+        self._put((key, FACETS_KEY), counts, version)
+
+    def _put(self, key: tuple, value: Union[np.ndarray, Dict[str, np.ndarray]], version: int) -> None:
+        nbytes = _nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            if not self._check_version(version):
+                return
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._nbytes -= _nbytes(previous)
+            self._entries[key] = value
+            self._nbytes += nbytes
+
+            while self._nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._nbytes -= _nbytes(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries; the statistics are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return hit and miss statistics.
+
+        Returns:
+            Dict[str, float]: hits, misses, hit_rate, evictions, entries and nbytes
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "nbytes": self._nbytes,
+            }
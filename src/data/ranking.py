@@ -0,0 +1,165 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from src.data.schema import BookSchema
+from src.data.text_index import TextIndex
+
+# Column counting how many readers rated a book, used as the last tie-breaker when present
+POPULARITY_COLUMN = "numRatings"
+
+# Weights packing (relevance, rating, popularity) into one int64 that sorts lexicographically;
+# ratings are compared at a resolution of 0.001 and popularity is capped just below 10^9
+RELEVANCE_WEIGHT = 10 ** 13
+RATING_WEIGHT = 10 ** 9
+MAX_POPULARITY = RATING_WEIGHT - 1
+
+
+def text_relevance(texts: pd.Series, query: str) -> np.ndarray:
+    """
+    Score how well each text matches a normalized query.
+
+    Args:
+        texts (pd.Series): Titles or author names of the candidate books
+        query (str): Lowercased, stripped query
+
+    Returns:
+        np.ndarray: Per text 0 to 3 points, one each for an exact match, a prefix match and a match at a word start
+    """
+    exact = BookSchema.match_text(texts, lambda values: TextIndex.normalize(values) == query)
+    prefix = BookSchema.match_text(texts, lambda values: TextIndex.normalize(values).str.startswith(query, na=False))
+    word_start = BookSchema.match_text(
+        texts, lambda values: (" " + TextIndex.normalize(values)).str.contains(" " + query, na=False, regex=False)
+    )
+    return exact.astype(np.int64) + prefix + word_start
+
+
+def ranking_keys(data: pd.DataFrame, positions: np.ndarray, relevance: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Compute one sort key per result so that larger keys rank first.
+
+    Args:
+        data (pd.DataFrame): DataFrame containing book data
+        positions (np.ndarray): Row positions of the results
+        relevance (np.ndarray): Non-negative integer relevance per result (default: all equal)
+
+    Returns:
+        np.ndarray: int64 keys ordering by relevance, then rating, then popularity
+    """
+    ratings = data["rating"].to_numpy(dtype=np.float64, na_value=np.nan)[positions]
+    # Unrated books get 0 and rank below a rating of 0.0, which gets 1
+    rating_keys = np.where(np.isnan(ratings), 0, np.round(np.nan_to_num(ratings) * 1000) + 1).astype(np.int64)
+    keys = rating_keys * RATING_WEIGHT
+
+    if POPULARITY_COLUMN in data.columns:
+        popularity = pd.to_numeric(data[POPULARITY_COLUMN], errors="coerce").to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )[positions]
+        keys += np.clip(np.nan_to_num(popularity), 0, MAX_POPULARITY).astype(np.int64)
+
+    if relevance is not None:
+        keys += np.asarray(relevance, dtype=np.int64) * RELEVANCE_WEIGHT
+
+    return keys
+
+
+class RankedResults:
+    """
+    Search result held as row positions and ranked lazily.
+
+    Only the prefix of the results that has been requested is fully sorted. Each time a page beyond it is
+    needed, argpartition moves the next best results to the front of the unsorted remainder and only those are
+    sorted, growing the sorted prefix at least twofold so later pages stay cheap.
+    """
+
+    def __init__(self, positions: np.ndarray, keys: np.ndarray):
+        self.positions = positions
+        self.keys = keys
+        self._ranked = 0
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def nbytes(self) -> int:
+        return self.positions.nbytes + self.keys.nbytes
+
+    @classmethod
+    def empty(cls) -> "RankedResults":
+        """Return a result without any books."""
+        return cls(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def rank(
+        cls, data: pd.DataFrame, positions: np.ndarray, relevance: Optional[np.ndarray] = None
+    ) -> "RankedResults":
+        """
+        Prepare the given rows for ranking by relevance, rating and popularity.
+
+        Args:
+            data (pd.DataFrame): DataFrame containing book data
+            positions (np.ndarray): Row positions of the results
+            relevance (np.ndarray): Non-negative integer relevance per result (default: all equal)
+
+        Returns:
+            RankedResults: The results; nothing is sorted until a page is requested
+        """
+        positions = np.asarray(positions)
+        return cls(positions.copy(), ranking_keys(data, positions, relevance))
+
+    @classmethod
+    def all_books(cls, data: pd.DataFrame) -> "RankedResults":
+        """Rank the whole catalogue completely, so the result can be shared read-only between sessions."""
+        position_dtype = np.int32 if len(data) <= np.iinfo(np.int32).max else np.int64
+        ranked = cls.rank(data, np.arange(len(data), dtype=position_dtype))
+        ranked._rank_until(len(ranked))
+        return ranked
+
+    def _rank_until(self, stop: int) -> None:
+        """Make sure the first stop results are in their final order."""
+        stop = min(stop, len(self))
+        if stop <= self._ranked:
+            return
+
+        stop = min(len(self), max(stop, 2 * self._ranked))
+        tail_positions = self.positions[self._ranked:]
+        tail_keys = self.keys[self._ranked:]
+        count = stop - self._ranked
+
+        if count < len(tail_keys):
+            # argpartition picks arbitrary rows among those sharing the boundary key; take the earliest of them,
+            # so the row order breaks ties across pages too
+            boundary_key = tail_keys[np.argpartition(-tail_keys, count - 1)[count - 1]]
+            above = np.flatnonzero(tail_keys > boundary_key)
+            ties = np.flatnonzero(tail_keys == boundary_key)
+            ties = ties[np.argsort(tail_positions[ties], kind="stable")[:count - len(above)]]
+            selected = np.zeros(len(tail_keys), dtype=bool)
+            head = np.concatenate((above, ties))
+            selected[head] = True
+            rest = np.flatnonzero(~selected)
+        else:
+            head, rest = np.arange(len(tail_keys)), np.zeros(0, dtype=np.int64)
+
+        # Sort the selected block by key, descending, with the row order breaking ties
+        head = head[np.lexsort((tail_positions[head], -tail_keys[head]))]
+        order = np.concatenate((head, rest))
+
+        self.positions[self._ranked:] = tail_positions[order]
+        self.keys[self._ranked:] = tail_keys[order]
+        self._ranked = stop
+
+    def page(self, page: int, items_per_page: int) -> np.ndarray:
+        """
+        Return the row positions on one page of the ranked results.
+
+        Args:
+            page (int): Page number (1-based)
+            items_per_page (int): Number of results per page
+
+        Returns:
+            np.ndarray: Row positions in rank order
+        """
+        start_idx = (page - 1) * items_per_page
+        end_idx = start_idx + items_per_page
+        self._rank_until(end_idx)
+        return self.positions[start_idx:end_idx]
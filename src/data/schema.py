@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from typing import Callable
+
+from src.data.genre_index import GenreIndex
+
+# Text columns with few distinct values, stored as categoricals so comparisons run on integer codes
+CATEGORY_COLUMNS = ["author", "language"]
+
+# Free-text columns, stored as Arrow-backed strings instead of Python objects
+STRING_COLUMNS = ["title", "isbn"]
+
+
+class BookSchema:
+    """
+    Compact column types of the book data.
+
+    Titles and ISBNs are Arrow strings, authors and languages categoricals, ratings float32 and page counts
+    nullable int32. Genres are parsed once into an Arrow list column whose items are dictionary-encoded, i.e.
+    every book holds a list of small integer codes into one shared genre vocabulary.
+    """
+
+    @staticmethod
+    def apply(book_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Convert the known columns of the book data to the compact schema in place.
+
+        Malformed ratings and page counts become missing values. Columns already in the schema are left as
+        they are, so applying it twice is cheap.
+
+        Args:
+            book_data (pd.DataFrame): DataFrame containing book data as parsed from the CSV
+
+        Returns:
+            pd.DataFrame: The same DataFrame with converted columns
+        """
+        for column in STRING_COLUMNS:
+            if column in book_data.columns:
+                book_data[column] = book_data[column].astype(pd.StringDtype("pyarrow"))
+
+        for column in CATEGORY_COLUMNS:
+            if column in book_data.columns:
+                book_data[column] = book_data[column].astype("category")
+
+        if "rating" in book_data.columns:
+            book_data["rating"] = pd.to_numeric(book_data["rating"], errors="coerce").astype(np.float32)
+
+        if "pages" in book_data.columns:
+            book_data["pages"] = pd.to_numeric(book_data["pages"], errors="coerce").round().astype("Int32")
+
+        if "genres" in book_data.columns and not BookSchema.is_genre_list(book_data["genres"]):
+            book_data["genres"] = BookSchema.genre_lists(book_data["genres"])
+
+        return book_data
+
+    @staticmethod
+    def is_genre_list(genres: pd.Series) -> bool:
+        """Tell whether a genres column is already stored as an Arrow list column."""
+        return isinstance(genres.dtype, pd.ArrowDtype) and pa.types.is_list(genres.dtype.pyarrow_dtype)
+
+    @staticmethod
+    def genre_lists(genres: pd.Series) -> pd.Series:
+        """
+        Parse stringified genre lists into lists of codes into a shared genre vocabulary.
+
+        Args:
+            genres (pd.Series): Genre lists stored as strings, e.g. "['Fantasy', 'Fiction']"
+
+        Returns:
+            pd.Series: Arrow list column of dictionary-encoded genres, missing where the input is missing
+        """
+        names = GenreIndex.parse_genres(genres)
+        codes, vocabulary = pd.factorize(names, sort=True)
+
+        # The parsed names are ordered by row, so the list boundaries follow from the names per row
+        counts = np.bincount(names.index.to_numpy(dtype=np.int64), minlength=len(genres))
+        offsets = np.zeros(len(genres) + 1, dtype=np.int32)
+        np.cumsum(counts, out=offsets[1:])
+
+        code_type = pa.int16() if len(vocabulary) <= np.iinfo(np.int16).max else pa.int32()
+        items = pa.DictionaryArray.from_arrays(
+            pa.array(codes, type=code_type), pa.array(list(vocabulary), type=pa.string())
+        )
+        lists = pa.ListArray.from_arrays(pa.array(offsets), items, mask=pa.array(genres.isna().to_numpy()))
+
+        return pd.Series(pd.arrays.ArrowExtensionArray(lists), index=genres.index, name=genres.name)
+
+    @staticmethod
+    def genre_strings(genres: pd.Series) -> pd.Series:
+        """Turn a genre list column back into the stringified lists of the CSV, e.g. "['Fantasy', 'Fiction']"."""
+        if not BookSchema.is_genre_list(genres):
+            return genres
+
+        return pd.Series(
+            [None if names is None else str(list(names)) for names in genres.tolist()],
+            index=genres.index, name=genres.name, dtype=object
+        )
+
+    @staticmethod
+    def row_hashes(book_data: pd.DataFrame) -> np.ndarray:
+        """
+        Hash every row by value, independent of the categories or genre vocabulary of its frame.
+
+        Returns:
+            np.ndarray: One uint64 per row; equal rows get equal hashes
+        """
+        columns = [column for column in book_data.columns if not BookSchema.is_genre_list(book_data[column])]
+        hashes = pd.util.hash_pandas_object(book_data[columns], index=False).to_numpy()
+
+        if "genres" in book_data.columns:
+            names = GenreIndex.parse_genres(book_data["genres"])
+            rows = names.index.to_numpy(dtype=np.int64)
+            # Weight every genre by its place in the list, so reordered lists count as changed
+            place = np.arange(len(rows)) - np.searchsorted(rows, rows)
+            weighted = pd.util.hash_pandas_object(names, index=False).to_numpy() * (2 * place + 1).astype(np.uint64)
+            genre_hashes = np.zeros(len(book_data), dtype=np.uint64)
+            np.add.at(genre_hashes, rows, weighted)
+            hashes = hashes * np.uint64(31) + genre_hashes
+
+        return hashes
+
+    @staticmethod
+    def pandas_type(arrow_type: pa.DataType):
+        """
+        Map Arrow types of a snapshot back to the schema's pandas dtypes.
+
+        Used as types_mapper when converting an Arrow table; None keeps pyarrow's default conversion, which
+        already turns dictionaries into categoricals and keeps float32.
+        """
+        if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            return pd.StringDtype("pyarrow")
+        if pa.types.is_list(arrow_type):
+            return pd.ArrowDtype(arrow_type)
+        if pa.types.is_int32(arrow_type):
+            return pd.Int32Dtype()
+        return None
+
+    @staticmethod
+    def numeric_values(column: pd.Series) -> np.ndarray:
+        """
+        Return a numeric column as a float array with NaN for missing values.
+
+        float32 columns stay float32, so comparisons against a bound cast to the same precision keep a rating of
+        exactly 4.1 at or above 4.1.
+        """
+        dtype = np.float32 if column.dtype == np.float32 else np.float64
+        return column.to_numpy(dtype=dtype, na_value=np.nan)
+
+    @staticmethod
+    def match_text(texts: pd.Series, matches: Callable[[pd.Series], pd.Series]) -> np.ndarray:
+        """
+        Evaluate a string predicate over a text column.
+
+        For categoricals the predicate runs once per category and the result is looked up by code, so e.g. a
+        language comparison becomes an integer gather instead of a comparison per row.
+
+        Args:
+            texts (pd.Series): Text column of any supported dtype
+            matches (Callable[[pd.Series], pd.Series]): Vectorized predicate over a Series of strings
+
+        Returns:
+            np.ndarray: Boolean array, False for missing values
+        """
+        if isinstance(texts.dtype, pd.CategoricalDtype):
+            per_category = matches(pd.Series(texts.cat.categories)).to_numpy(dtype=bool, na_value=False)
+            # Missing values have code -1 and hit the appended False
+            return np.append(per_category, False)[texts.cat.codes.to_numpy()]
+
+        return matches(texts).to_numpy(dtype=bool, na_value=False)
@@ -0,0 +1,98 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Rows per shard; smaller shards spread the work more evenly but add per-shard overhead
+DEFAULT_SHARD_ROWS = 256 * 1024
+
+
+class ShardedExecutor:
+    """
+    Evaluates row masks in parallel over shards of the candidate rows.
+
+    The candidate row positions are split into contiguous shards, which are views of the positions. Masks take
+    their rows of a column with rows(), which slices instead of copying when the shard covers a run of adjacent
+    rows, as the shards of a full scan do. Shards are evaluated on a thread pool, so they only run on separate
+    cores while sharing the one in-memory dataset if the mask's kernels release the GIL: numpy comparisons and
+    the pyarrow compute functions behind Arrow-backed strings and genre lists do, Python string methods and index
+    builds in Python do not, and callers keep those on the calling thread.
+    The shard results are concatenated in shard order, so the merged mask lines up with the candidates.
+    Inputs of fewer than two shards are evaluated directly on the calling thread.
+
+    Queries shard the rating and page comparisons, text matching over Arrow-backed strings and genre matching
+    over the schema's Arrow genre lists. How far that scales with the number of cores has not been measured yet;
+    run_benchmarks.py --workers times it.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, shard_rows: int = DEFAULT_SHARD_ROWS):
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        self.shard_rows = shard_rows
+        self._executor = (
+            ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="filter-shard")
+            if self.max_workers > 1 else None
+        )
+
+    @staticmethod
+    def releases_gil(texts: pd.Series) -> bool:
+        """Tell whether string methods on the column run in pyarrow kernels that release the GIL."""
+        dtype = texts.dtype
+        if isinstance(dtype, pd.StringDtype):
+            return dtype.storage.startswith("pyarrow")
+        return isinstance(dtype, pd.ArrowDtype)
+
+    @staticmethod
+    def rows(column: pd.Series, candidates: np.ndarray) -> pd.Series:
+        """
+        Return the values of a column at sorted, distinct row positions.
+
+        Args:
+            column (pd.Series): Column of the shared dataset
+            candidates (np.ndarray): Sorted, distinct row positions, like the candidates of a query
+
+        Returns:
+            pd.Series: A zero-copy slice if the positions are a run of adjacent rows, else a copy of those rows
+        """
+        if len(candidates) and candidates[-1] - candidates[0] == len(candidates) - 1:
+            return column.iloc[candidates[0]:candidates[-1] + 1]
+        return column.iloc[candidates]
+
+    def mask(self, function: Callable[[np.ndarray], np.ndarray], candidates: np.ndarray) -> np.ndarray:
+        """
+        Evaluate a mask function over the candidates shard by shard.
+
+        Args:
+            function (Callable[[np.ndarray], np.ndarray]): Returns a boolean array telling which of the given
+                row positions match
+            candidates (np.ndarray): Row positions to check
+
+        Returns:
+            np.ndarray: Boolean array telling which candidates match, in the order of candidates
+        """
+        n_shards = min(len(candidates) // self.shard_rows, self.max_workers * 4)
+        if self._executor is None or n_shards < 2:
+            return np.asarray(function(candidates), dtype=bool)
+
+        bounds = np.linspace(0, len(candidates), n_shards + 1).astype(np.int64)
+        shards = [candidates[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+        # map yields the results in shard order, whichever shard finishes first
+        return np.concatenate([
+            np.asarray(result, dtype=bool) for result in self._executor.map(function, shards)
+        ])
+
+
+_shared_executor: Optional[ShardedExecutor] = None
+_shared_executor_lock = threading.Lock()
+
+
+def get_sharded_executor() -> ShardedExecutor:
+    """Return the executor shared by every query of this process, with one thread per core."""
+    global _shared_executor
+    if _shared_executor is None:
+        with _shared_executor_lock:
+            if _shared_executor is None:
+                _shared_executor = ShardedExecutor()
+    return _shared_executor
@@ -0,0 +1,485 @@
+import sys
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+TRIGRAM_LENGTH = 3
+
+# Above this many matching values, rows are selected with one vectorised pass instead of per-value slices
+MAX_GATHERED_VALUES = 1024
+
+# Default lower bound of the similarity between a query word and a word of a value in fuzzy searches
+DEFAULT_MIN_SIMILARITY = 0.3
+
+# Characters separating the words compared by fuzzy searches (whitespace, punctuation and symbols)
+WORD_SEPARATOR_PATTERN = r"[\s\p{P}\p{S}]+"
+
+# Query words up to this length tolerate one edit in fuzzy searches, longer ones two
+SHORT_WORD_LENGTH = 5
+
+# Trigrams of a padded word an edit can change at most; a transposition touches four
+TRIGRAMS_PER_EDIT = 4
+
+
+def _strings_nbytes(strings: List[str], ids: Dict[str, int]) -> int:
+    """Estimate the memory of a list of distinct strings and the dict mapping each of them to its id."""
+    # The dict shares the string objects of the list, so only its hash table is added
+    return sys.getsizeof(strings) + sum(map(sys.getsizeof, strings)) + sys.getsizeof(ids)
+
+
+def _postings_nbytes(postings: Dict[str, np.ndarray]) -> int:
+    """Estimate the memory of trigram postings, counting keys, arrays and their headers."""
+    return sys.getsizeof(postings) + sum(
+        sys.getsizeof(trigram) + sys.getsizeof(posting) for trigram, posting in postings.items()
+    )
+
+
+def max_edits(word: str) -> int:
+    """Return how many edits a fuzzy search tolerates in a query word: none below trigram length, then 1 or 2."""
+    if len(word) < TRIGRAM_LENGTH:
+        return 0
+    return 1 if len(word) <= SHORT_WORD_LENGTH else 2
+
+
+def edit_distance(first: str, second: str, bound: int) -> int:
+    """
+    Compute the Damerau-Levenshtein distance (optimal string alignment) of two words, up to a bound.
+
+    Insertions, deletions, substitutions and transpositions of adjacent characters count as one edit each.
+
+    Args:
+        first (str): First word
+        second (str): Second word
+        bound (int): Largest distance of interest
+
+    Returns:
+        int: The distance, or bound + 1 if it exceeds bound
+    """
+    if abs(len(first) - len(second)) > bound:
+        return bound + 1
+
+    previous, current = None, list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        before_previous, previous = previous, current
+        current = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = first[i - 1] != second[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                current[j] = min(current[j], before_previous[j - 2] + 1)
+        # Distances never decrease from one row to the next, so a row above the bound ends the search
+        if min(current) > bound:
+            return bound + 1
+
+    return min(current[-1], bound + 1)
+
+
+class WordIndex:
+    """
+    Trigram index over the distinct words of a set of values, used for typo-tolerant matching.
+
+    Candidate words are found from the postings of the query word's trigrams. Every word is padded as "  word "
+    before taking its trigrams, so short words and typos near a word boundary keep trigrams in common. A candidate
+    is as similar as the better of two measures: the Jaccard similarity of the trigram sets, and
+    1 - distance / length of the longer word for candidates within max_edits() Damerau-Levenshtein edits of the
+    query word. The edit distance catches swapped letters like "smtih" or "kign", which leave too few trigrams in
+    common, and is only computed for candidates whose length and shared trigrams allow that few edits. Words made
+    of digits only are matched exactly.
+    """
+
+    def __init__(
+        self,
+        words: List[str],
+        word_offsets: np.ndarray,
+        word_value_ids: np.ndarray,
+        trigrams: Dict[str, np.ndarray],
+        trigram_counts: np.ndarray
+    ):
+        self.words = words
+        self.word_offsets = word_offsets
+        self.word_value_ids = word_value_ids
+        self.trigram_counts = trigram_counts
+        self.word_lengths = pc.utf8_length(pa.array(words, type=pa.string())).to_numpy().astype(np.int32)
+        self._ids = {word: word_id for word_id, word in enumerate(words)}
+        self._trigrams = trigrams
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.word_offsets.nbytes
+            + self.word_value_ids.nbytes
+            + self.trigram_counts.nbytes
+            + self.word_lengths.nbytes
+            + _strings_nbytes(self.words, self._ids)
+            + _postings_nbytes(self._trigrams)
+        )
+
+    @staticmethod
+    def split(texts: List[str]) -> Tuple[pa.Array, np.ndarray]:
+        """
+        Split texts into words.
+
+        Returns:
+            Tuple[pa.Array, np.ndarray]: The non-empty words and the position of the text each one comes from
+        """
+        tokens = pc.split_pattern_regex(pa.array(texts, type=pa.string()), WORD_SEPARATOR_PATTERN)
+        words = pc.list_flatten(tokens)
+        parents = pc.list_parent_indices(tokens).to_numpy()
+        non_empty = pc.greater(pc.utf8_length(words), 0)
+        return words.filter(non_empty), parents[non_empty.to_numpy(zero_copy_only=False)]
+
+    @staticmethod
+    def word_trigrams(word: str) -> set:
+        """Return the trigrams of a padded word."""
+        return TextIndex.trigrams("  " + word + " ")
+
+    @classmethod
+    def from_values(cls, values: List[str]) -> "WordIndex":
+        """Build the index of the words of the given distinct values, numbered by their position in values."""
+        words, value_ids = cls.split(values)
+        word_ids, distinct_words = pd.factorize(words.to_pandas())
+        distinct_words = list(distinct_words)
+
+        # Each (word, value) pair once, grouped by word with ascending value ids
+        pairs = np.unique(word_ids.astype(np.int64) * max(len(values), 1) + value_ids)
+        counts = np.bincount(pairs // max(len(values), 1), minlength=len(distinct_words))
+        word_offsets = np.zeros(len(distinct_words) + 1, dtype=np.int64)
+        np.cumsum(counts, out=word_offsets[1:])
+        id_dtype = np.int32 if len(values) <= np.iinfo(np.int32).max else np.int64
+        word_value_ids = (pairs % max(len(values), 1)).astype(id_dtype)
+
+        numeric = pc.utf8_is_numeric(pa.array(distinct_words, type=pa.string())).to_numpy(zero_copy_only=False)
+        postings = defaultdict(list)
+        trigram_counts = np.zeros(len(distinct_words), dtype=np.int32)
+        for word_id, word in enumerate(distinct_words):
+            if numeric[word_id]:
+                continue
+            word_trigrams = cls.word_trigrams(word)
+            trigram_counts[word_id] = len(word_trigrams)
+            for trigram in word_trigrams:
+                postings[trigram].append(word_id)
+
+        word_id_dtype = np.int32 if len(distinct_words) <= np.iinfo(np.int32).max else np.int64
+        trigrams = {trigram: np.array(ids, dtype=word_id_dtype) for trigram, ids in postings.items()}
+        return cls(distinct_words, word_offsets, word_value_ids, trigrams, trigram_counts)
+
+    def similar_words(self, word: str, min_similarity: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the words similar to a normalized query word.
+
+        Args:
+            word (str): Lowercased query word
+            min_similarity (float): Lowest similarity to accept
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Ids of the similar words and their similarity
+        """
+        if word.isnumeric():
+            word_id = self._ids.get(word)
+            if word_id is None:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            return np.array([word_id]), np.ones(1, dtype=np.float32)
+
+        query_trigrams = self.word_trigrams(word)
+        postings = [self._trigrams[trigram] for trigram in query_trigrams if trigram in self._trigrams]
+        if not postings:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        # Only words sharing a trigram with the query are candidates, counted by the number of shared trigrams
+        candidates, overlaps = np.unique(np.concatenate(postings), return_counts=True)
+        n_query = len(query_trigrams)
+        n_candidate = self.trigram_counts[candidates]
+        similarities = (overlaps / (n_query + n_candidate - overlaps)).astype(np.float32)
+
+        # Candidates that are not similar enough by trigrams may still be a few edits away; every edit changes at
+        # most TRIGRAMS_PER_EDIT trigrams, so the others cannot be
+        edits = max_edits(word)
+        lengths = self.word_lengths[candidates]
+        check = (
+            (similarities < min_similarity)
+            & (np.abs(lengths - len(word)) <= edits)
+            & (overlaps >= n_query - TRIGRAMS_PER_EDIT * edits)
+        )
+        for i in np.flatnonzero(check) if edits else ():
+            distance = edit_distance(word, self.words[candidates[i]], edits)
+            if distance <= edits:
+                similarities[i] = max(similarities[i], 1 - distance / max(len(word), lengths[i]))
+
+        similar = similarities >= min_similarity
+        return candidates[similar], similarities[similar]
+
+    def value_similarities(self, query_words: List[str], n_values: int, min_similarity: float) -> np.ndarray:
+        """
+        Score every value by how well its words match the query words.
+
+        Args:
+            query_words (List[str]): Distinct lowercased query words
+            n_values (int): Number of values the index was built from
+            min_similarity (float): Lowest word similarity to accept
+
+        Returns:
+            np.ndarray: Per value the mean over the query words of its most similar word's similarity, 0 for
+                values missing a similar word for any of the query words
+        """
+        scores = np.zeros(n_values, dtype=np.float32)
+        for number, query_word in enumerate(query_words):
+            word_ids, similarities = self.similar_words(query_word, min_similarity)
+            starts, stops = self.word_offsets[word_ids], self.word_offsets[word_ids + 1]
+            value_ids = np.concatenate(
+                [self.word_value_ids[start:stop] for start, stop in zip(starts, stops)]
+            ) if len(word_ids) else np.zeros(0, dtype=np.int64)
+
+            best = np.zeros(n_values, dtype=np.float32)
+            np.maximum.at(best, value_ids, np.repeat(similarities, stops - starts))
+            # Values without a similar word for this query word drop out
+            scores = np.where((scores > 0) & (best > 0), scores + best, 0) if number else best
+            if not scores.any():
+                break
+
+        return scores / len(query_words)
+
+
+class TextIndex:
+    """
+    Trigram index over the normalized (lowercased, stripped) values of one text column.
+
+    Every distinct value is stored once. Exact matches are answered from a hash map of the distinct values,
+    substring matches by intersecting the trigram postings of the query and verifying the few remaining
+    candidates, so neither scans the whole column. Fuzzy matches use a WordIndex over the distinct values,
+    built by the dataset cache's warm-up or else on the first fuzzy search.
+    """
+
+    def __init__(
+        self,
+        values: List[str],
+        row_value_ids: np.ndarray,
+        row_offsets: np.ndarray,
+        row_positions: np.ndarray,
+        trigrams: Optional[Dict[str, np.ndarray]] = None
+    ):
+        self.values = values
+        self.row_value_ids = row_value_ids
+        self.row_offsets = row_offsets
+        self.row_positions = row_positions
+        self.n_rows = len(row_value_ids)
+        self._ids = {value: value_id for value_id, value in enumerate(values)}
+        self._trigrams = trigrams if trigrams is not None else TextIndex._build_trigrams(values)
+        self._word_index: Optional[WordIndex] = None
+        self._word_index_lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        # The distinct values are Python strings and make up most of the index for mostly distinct titles
+        return (
+            self.row_value_ids.nbytes
+            + self.row_offsets.nbytes
+            + self.row_positions.nbytes
+            + _strings_nbytes(self.values, self._ids)
+            + _postings_nbytes(self._trigrams)
+            + (self._word_index.nbytes if self._word_index is not None else 0)
+        )
+
+    @staticmethod
+    def normalize(texts: pd.Series) -> pd.Series:
+        """Lowercase and strip a text column the same way queries are normalized."""
+        return texts.str.lower().str.strip()
+
+    @staticmethod
+    def trigrams(text: str) -> set:
+        """Return the set of trigrams contained in a string."""
+        return {text[i:i + TRIGRAM_LENGTH] for i in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+    @staticmethod
+    def _build_trigrams(values: List[str], first_id: int = 0) -> Dict[str, np.ndarray]:
+        """Map every trigram to the sorted ids of the distinct values containing it, numbered from first_id."""
+        postings = defaultdict(list)
+        for value_id, value in enumerate(values, start=first_id):
+            for trigram in TextIndex.trigrams(value):
+                postings[trigram].append(value_id)
+
+        id_dtype = np.int32 if first_id + len(values) <= np.iinfo(np.int32).max else np.int64
+        return {trigram: np.array(ids, dtype=id_dtype) for trigram, ids in postings.items()}
+
+    @staticmethod
+    def _group_rows(value_ids: np.ndarray, n_values: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Group the row positions by value id into CSR offsets and positions; rows with id -1 are left out."""
+        order = np.argsort(value_ids, kind="stable")
+        order = order[value_ids[order] >= 0]
+        counts = np.bincount(value_ids[order], minlength=n_values)
+        row_offsets = np.zeros(n_values + 1, dtype=np.int64)
+        np.cumsum(counts, out=row_offsets[1:])
+        position_dtype = np.int32 if len(value_ids) <= np.iinfo(np.int32).max else np.int64
+
+        return row_offsets, order.astype(position_dtype)
+
+    @classmethod
+    def from_series(cls, texts: pd.Series) -> "TextIndex":
+        """Build the index from a text column."""
+        if isinstance(texts.dtype, pd.CategoricalDtype):
+            # Normalize every category once and map the row codes onto the distinct normalized values
+            category_ids, values = pd.factorize(cls.normalize(pd.Series(texts.cat.categories)))
+            codes = texts.cat.codes.to_numpy()
+            value_ids = np.where(codes >= 0, np.append(category_ids, -1)[codes], -1)
+        else:
+            value_ids, values = pd.factorize(cls.normalize(texts).reset_index(drop=True))
+        id_dtype = np.int32 if len(values) <= np.iinfo(np.int32).max else np.int64
+        row_offsets, row_positions = cls._group_rows(value_ids, len(values))
+
+        return cls(list(values), value_ids.astype(id_dtype), row_offsets, row_positions)
+
+    @classmethod
+    def for_column(cls, column: str):
+        """Return a builder indexing the given column of the book data."""
+        def build(book_data: pd.DataFrame) -> "TextIndex":
+            return cls.from_series(book_data[column])
+
+        return build
+
+    def updated(self, texts: pd.Series, rows: np.ndarray) -> "TextIndex":
+        """
+        Return a copy of the index reflecting changed or appended rows.
+
+        Only the values of the given rows are normalized and only values not seen before get trigrams, so the
+        cost follows the size of the change. Values no longer used by any row stay in the vocabulary and
+        simply match no rows.
+
+        Args:
+            texts (pd.Series): The whole text column after the change, rows before n_rows keep their positions
+            rows (np.ndarray): Sorted positions of the changed and appended rows
+
+        Returns:
+            TextIndex: The new index; this one keeps answering queries for the previous data. If this one has a
+                word index, the new one gets one rebuilt over all values
+        """
+        normalized = self.normalize(texts.iloc[rows]).to_numpy(dtype=object, na_value=None)
+        values = list(self.values)
+        ids = dict(self._ids)
+        row_ids = np.full(len(rows), -1, dtype=np.int64)
+        for i, value in enumerate(normalized):
+            if value is None:
+                continue
+            value_id = ids.get(value)
+            if value_id is None:
+                value_id = ids[value] = len(values)
+                values.append(value)
+            row_ids[i] = value_id
+
+        value_ids = np.full(len(texts), -1, dtype=np.int64)
+        value_ids[:self.n_rows] = self.row_value_ids
+        value_ids[rows] = row_ids
+        id_dtype = np.int32 if len(values) <= np.iinfo(np.int32).max else np.int64
+        row_offsets, row_positions = self._group_rows(value_ids, len(values))
+
+        # New values get the highest ids, so appending their ids keeps every posting sorted
+        trigrams = dict(self._trigrams)
+        for trigram, new_ids in self._build_trigrams(values[len(self.values):], len(self.values)).items():
+            posting = trigrams.get(trigram)
+            trigrams[trigram] = new_ids if posting is None else np.concatenate((posting, new_ids.astype(posting.dtype)))
+
+        updated = TextIndex(values, value_ids.astype(id_dtype), row_offsets, row_positions, trigrams)
+        if self._word_index is not None:
+            # Fuzzy searches were warmed up on this index, so they stay warm on the new one
+            updated._word_index = WordIndex.from_values(values)
+        return updated
+
+    def _rows(self, value_ids: List[int]) -> np.ndarray:
+        """Return the sorted row positions of the given distinct values."""
+        if not value_ids:
+            return self.row_positions[:0]
+
+        if len(value_ids) > MAX_GATHERED_VALUES:
+            selected = np.zeros(len(self.values) + 1, dtype=bool)
+            selected[value_ids] = True
+            # Rows without a value have id -1 and hit the trailing False entry
+            return np.flatnonzero(selected[self.row_value_ids]).astype(self.row_positions.dtype)
+
+        chunks = [self.row_positions[self.row_offsets[i]:self.row_offsets[i + 1]] for i in value_ids]
+        return np.sort(np.concatenate(chunks))
+
+    def exact(self, query: str) -> np.ndarray:
+        """
+        Return the row positions whose normalized value equals the query.
+
+        Args:
+            query (str): Text to match, normalized before the lookup
+
+        Returns:
+            np.ndarray: Sorted row positions
+        """
+        value_id = self._ids.get(query.lower().strip())
+        return self._rows([] if value_id is None else [value_id])
+
+    def contains(self, query: str) -> np.ndarray:
+        """
+        Return the row positions whose normalized value contains the query as a plain substring.
+
+        Args:
+            query (str): Text to search for, normalized before the lookup
+
+        Returns:
+            np.ndarray: Sorted row positions
+        """
+        query = query.lower().strip()
+        query_trigrams = TextIndex.trigrams(query)
+
+        if not query_trigrams:
+            # Too short for trigrams, fall back to checking every distinct value
+            candidates = range(len(self.values))
+        else:
+            postings = [self._trigrams.get(trigram) for trigram in query_trigrams]
+            if any(posting is None for posting in postings):
+                return self.row_positions[:0]
+
+            # Intersect starting from the rarest trigram so intermediate results stay small
+            postings.sort(key=len)
+            candidates = postings[0]
+            for posting in postings[1:]:
+                candidates = np.intersect1d(candidates, posting, assume_unique=True)
+
+        # Trigram hits are only candidates, their order within the value still has to be verified
+        return self._rows([value_id for value_id in candidates if query in self.values[value_id]])
+
+    @property
+    def has_word_index(self) -> bool:
+        """Tell whether the word index for fuzzy searches has been built."""
+        return self._word_index is not None
+
+    def get_word_index(self) -> WordIndex:
+        """Return the word index of the distinct values, building it on first use."""
+        if self._word_index is None:
+            with self._word_index_lock:
+                if self._word_index is None:
+                    self._word_index = WordIndex.from_values(self.values)
+        return self._word_index
+
+    def similar(self, query: str, min_similarity: float = DEFAULT_MIN_SIMILARITY) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the rows whose value has a similar word for every word of the query, tolerating typos.
+
+        Args:
+            query (str): Text to search for, normalized before the lookup
+            min_similarity (float): Lowest similarity between a query word and a word of a value, in (0, 1], as
+                defined by WordIndex (default: DEFAULT_MIN_SIMILARITY)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Sorted row positions and their similarity, the mean over the query
+                words of the similarity of the best matching word of the row's value
+
+        Raises:
+            ValueError: If min_similarity is not in (0, 1]
+        """
+        if not 0 < min_similarity <= 1:
+            raise ValueError("Minimum similarity must be greater than 0 and at most 1")
+
+        words, _ = WordIndex.split([query.lower().strip()])
+        query_words = list(dict.fromkeys(words.to_pylist()))
+        if not query_words:
+            return self.row_positions[:0], np.zeros(0, dtype=np.float32)
+
+        value_scores = self.get_word_index().value_similarities(query_words, len(self.values), min_similarity)
+        positions = self._rows(np.flatnonzero(value_scores).tolist())
+        return positions, value_scores[self.row_value_ids[positions]]
@@ -0,0 +1,329 @@
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.data.data_loader import DataLoader
+from src.data.isbn_index import IsbnIndex
+
+logger = logging.getLogger(__name__)
+
+# Reading statuses a library entry can have
+STATUSES = ("Want to Read", "Read")
+
+# Pending changes that trigger an immediate write
+DEFAULT_BATCH_SIZE = 64
+
+# Seconds after which pending changes are written by the background flush
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+class BaseLibraryStore:
+    """
+    Reading libraries keyed by user, with the lookups shared by the persistent and the in-memory store.
+
+    User ids are not authenticated: whoever knows a user id can read and change that library, which suits the
+    single-user demo this app is.
+    """
+
+    @staticmethod
+    def _check_status(status: str) -> None:
+        if status not in STATUSES:
+            raise ValueError(f"Status must be one of {', '.join(STATUSES)}")
+
+    def get_library(self, user_id: str) -> Dict[str, str]:
+        """
+        Return a user's library.
+
+        Args:
+            user_id (str): User whose library to return
+
+        Returns:
+            Dict[str, str]: Reading status by ISBN, in the order the books were added
+        """
+        raise NotImplementedError
+
+    def get_positions(self, user_id: str, isbn_index: IsbnIndex) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Resolve a user's library to row positions of the book data.
+
+        Args:
+            user_id (str): User whose library to resolve
+            isbn_index (IsbnIndex): ISBN index of the book data
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Row positions of the books found and their ISBNs as stored in the
+                library, in the order the books were added; books missing from the data are skipped
+        """
+        isbns = np.array(list(self.get_library(user_id)), dtype=object)
+        positions = isbn_index.lookup_many(isbns)
+        found = positions >= 0
+        return positions[found], isbns[found]
+
+    def get_books(self, user_id: str, book_data: pd.DataFrame, isbn_index: IsbnIndex) -> pd.DataFrame:
+        """
+        Return the books in a user's library joined with their reading status.
+
+        Each book is found through the ISBN index, so the cost depends on the size of the library only.
+
+        Args:
+            user_id (str): User whose library to return
+            book_data (pd.DataFrame): DataFrame containing book data
+            isbn_index (IsbnIndex): ISBN index of book_data
+
+        Returns:
+            pd.DataFrame: The library's rows of book_data with an added status column, in the order of adding
+
+        Raises:
+            ValueError: If the ISBN index does not belong to book_data
+        """
+        if isbn_index.n_rows != len(book_data):
+            raise ValueError("ISBN index was built for a different dataframe")
+
+        library = self.get_library(user_id)
+        positions = isbn_index.lookup_many(library)
+        found = positions >= 0
+        statuses = [status for status, is_found in zip(library.values(), found) if is_found]
+        return book_data.iloc[positions[found]].assign(status=statuses)
+
+
+class SessionLibraryStore(BaseLibraryStore):
+    """
+    Reading libraries held in memory only, for visitors without a user name.
+
+    One store lives in each session's state, so its libraries go away with the session instead of piling up
+    in the database under ids no later session can reach.
+    """
+
+    def __init__(self):
+        self._libraries: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def get_library(self, user_id: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._libraries.get(user_id, {}))
+
+    def add(self, user_id: str, isbn: str, status: str = "Want to Read") -> Tuple[str, str]:
+        """
+        Add a book to a user's library, or update its status if it is already there.
+
+        Returns:
+            Tuple[str, str]: The stored ISBN and status
+
+        Raises:
+            ValueError: If status is not one of STATUSES
+        """
+        self._check_status(status)
+        with self._lock:
+            self._libraries.setdefault(user_id, {})[isbn] = status
+        return isbn, status
+
+    def set_status(self, user_id: str, isbn: str, status: str) -> None:
+        """
+        Change the reading status of a book in a user's library; unknown books are ignored.
+
+        Raises:
+            ValueError: If status is not one of STATUSES
+        """
+        self._check_status(status)
+        with self._lock:
+            library = self._libraries.get(user_id, {})
+            if isbn in library:
+                library[isbn] = status
+
+    def remove(self, user_id: str, isbn: str) -> None:
+        """Remove a book from a user's library; unknown books are ignored."""
+        with self._lock:
+            self._libraries.get(user_id, {}).pop(isbn, None)
+
+
+class LibraryStore(BaseLibraryStore):
+    """
+    Persistent reading libraries of all users, stored in SQLite.
+
+    Every read queries the user's rows through the primary key and applies this process's pending changes on
+    top, so changes written by other processes are seen once they are flushed. Changes touch single rows and
+    look up only the affected one. They are written in batches: coalesced per (user, ISBN) and flushed in one
+    transaction when DEFAULT_BATCH_SIZE changes are pending, every DEFAULT_FLUSH_INTERVAL seconds and on exit.
+    Adding a book another process added meanwhile only updates its status. The database runs in WAL mode, so
+    writes never block readers of other processes.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: Optional[float] = DEFAULT_FLUSH_INTERVAL
+    ):
+        self.db_path = Path(db_path) if db_path is not None else LibraryStore.get_default_path()
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        # Latest change per (user, ISBN) not written yet: (status, added_at) for a newly added book,
+        # (status, None) for a status change and None for a removal
+        self._pending: Dict[Tuple[str, str], Optional[Tuple[str, Optional[float]]]] = {}
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        # The primary key doubles as the index on (user, ISBN)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS library ("
+            "user_id TEXT NOT NULL, isbn TEXT NOT NULL, status TEXT NOT NULL, added_at REAL NOT NULL, "
+            "PRIMARY KEY (user_id, isbn)) WITHOUT ROWID"
+        )
+
+        self._closed = threading.Event()
+        if flush_interval:
+            threading.Thread(
+                target=self._flush_periodically, args=(flush_interval,), name="library-flush", daemon=True
+            ).start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def get_default_path() -> Path:
+        """Return the path of the library database in the project's data directory."""
+        return DataLoader.get_project_root() / "data" / "library.sqlite3"
+
+    def _load(self, user_id: str) -> Dict[str, str]:
+        """Read a user's library from the database, with the changes not written yet applied."""
+        rows = self._connection.execute(
+            "SELECT isbn, status FROM library WHERE user_id = ? ORDER BY added_at", (user_id,)
+        ).fetchall()
+        library = dict(rows)
+        # At most batch_size changes are pending
+        for (pending_user_id, isbn), change in self._pending.items():
+            if pending_user_id != user_id:
+                continue
+            if change is None:
+                library.pop(isbn, None)
+            else:
+                library[isbn] = change[0]
+        return library
+
+    def _status(self, user_id: str, isbn: str) -> Optional[str]:
+        """Return the status of one book in a user's library, None if it is not there, pending changes applied."""
+        key = (user_id, isbn)
+        if key in self._pending:
+            change = self._pending[key]
+            return None if change is None else change[0]
+        row = self._connection.execute(
+            "SELECT status FROM library WHERE user_id = ? AND isbn = ?", (user_id, isbn)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def get_library(self, user_id: str) -> Dict[str, str]:
+        with self._lock:
+            return self._load(user_id)
+
+    def add(self, user_id: str, isbn: str, status: str = "Want to Read") -> Tuple[str, str]:
+        """
+        Add a book to a user's library, or update its status if it is already there.
+
+        Returns:
+            Tuple[str, str]: The stored ISBN and status
+
+        Raises:
+            ValueError: If status is not one of STATUSES
+        """
+        self._check_status(status)
+
+        with self._lock:
+            previous = self._pending.get((user_id, isbn))
+            if previous is not None and previous[1] is not None:
+                # Still a new book as long as its insertion is pending
+                added_at = previous[1]
+            else:
+                added_at = None if self._status(user_id, isbn) is not None else time.time()
+            self._queue(user_id, isbn, (status, added_at))
+        return isbn, status
+
+    def set_status(self, user_id: str, isbn: str, status: str) -> None:
+        """
+        Change the reading status of a book in a user's library; unknown books are ignored.
+
+        Raises:
+            ValueError: If status is not one of STATUSES
+        """
+        with self._lock:
+            if self._status(user_id, isbn) is not None:
+                self.add(user_id, isbn, status)
+
+    def remove(self, user_id: str, isbn: str) -> None:
+        """Remove a book from a user's library; unknown books are ignored."""
+        with self._lock:
+            if self._status(user_id, isbn) is not None:
+                self._queue(user_id, isbn, None)
+
+    def _queue(self, user_id: str, isbn: str, change: Optional[Tuple[str, Optional[float]]]) -> None:
+        """Record a change for the next batch, writing the batch once it is full."""
+        self._pending[(user_id, isbn)] = change
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write all pending changes in one transaction."""
+        with self._lock:
+            if not self._pending or self._closed.is_set():
+                return
+
+            pending, self._pending = self._pending, {}
+            inserts, updates, removals = [], [], []
+            for (user_id, isbn), change in pending.items():
+                if change is None:
+                    removals.append((user_id, isbn))
+                elif change[1] is None:
+                    updates.append((change[0], user_id, isbn))
+                else:
+                    inserts.append((user_id, isbn, *change))
+            try:
+                self._connection.execute("BEGIN")
+                self._connection.executemany("DELETE FROM library WHERE user_id = ? AND isbn = ?", removals)
+                # A book another process added meanwhile keeps its place and only takes the new status
+                self._connection.executemany(
+                    "INSERT INTO library (user_id, isbn, status, added_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (user_id, isbn) DO UPDATE SET status = excluded.status",
+                    inserts
+                )
+                self._connection.executemany("UPDATE library SET status = ? WHERE user_id = ? AND isbn = ?", updates)
+                self._connection.execute("COMMIT")
+            except sqlite3.Error:
+                if self._connection.in_transaction:
+                    self._connection.execute("ROLLBACK")
+                # Keep the changes for the next attempt unless newer ones replaced them meanwhile
+                for key, change in pending.items():
+                    self._pending.setdefault(key, change)
+                logger.exception("Writing %d library changes failed", len(pending))
+
+    def _flush_periodically(self, interval: float) -> None:
+        while not self._closed.wait(interval):
+            self.flush()
+
+    def close(self) -> None:
+        """Write pending changes and close the database."""
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self.flush()
+            self._closed.set()
+            self._connection.close()
+
+
+_shared_store: Optional[LibraryStore] = None
+_shared_store_lock = threading.Lock()
+
+
+def get_library_store() -> LibraryStore:
+    """Return the library store shared by every session of this process."""
+    global _shared_store
+    if _shared_store is None:
+        with _shared_store_lock:
+            if _shared_store is None:
+                _shared_store = LibraryStore()
+    return _shared_store
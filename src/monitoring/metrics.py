@@ -0,0 +1,327 @@
+import functools
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prefix of all metric names in the Prometheus export
+METRIC_PREFIX = "books"
+
+# Environment variables read by configure_from_environment
+ENABLE_VARIABLE = "BOOKS_METRICS"
+FILE_VARIABLE = "BOOKS_METRICS_FILE"
+PORT_VARIABLE = "BOOKS_METRICS_PORT"
+
+# Seconds between two writes of the metrics file
+DEFAULT_EXPORT_INTERVAL = 30.0
+
+
+class _Histogram:
+    """Latency histogram with fixed buckets, plus sum, count and maximum."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.maximum = 0.0
+
+    def observe(self, buckets: Tuple[float, ...], value: float) -> None:
+        self.counts[bisect_left(buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.maximum = max(self.maximum, value)
+
+
+class _NullSpan:
+    """Span used while metrics are disabled; entering and leaving it does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Times a block and records it in the latency histogram of its name and labels."""
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Dict[str, str]):
+        self._metrics = metrics
+        self._name = name
+        self._labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._metrics.observe(self._name, time.perf_counter() - self._start, **self._labels)
+        if exc_type is not None:
+            self._metrics.increment("errors", span=self._name, error=exc_type.__name__, **self._labels)
+        return False
+
+
+class Metrics:
+    """
+    Process-wide counters and latency histograms for the app's hot paths.
+
+    Collection is off by default. While it is off, span() returns a shared no-op context manager and timed
+    functions are called directly, so instrumented code pays one attribute check. Metrics are identified by a
+    name and optional labels, e.g. metrics.span("filter", method="filter_by_genre").
+
+    Example:
+        with get_metrics().span("render", function="display_search_results"):
+            ...
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, enabled: bool = False):
+        self.buckets = tuple(buckets)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._histograms: Dict[Tuple[str, tuple], _Histogram] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._export_thread: Optional[threading.Thread] = None
+
+    def span(self, name: str, **labels: str):
+        """
+        Return a context manager timing the enclosed block.
+
+        Args:
+            name (str): Metric name of the timed operation
+            **labels (str): Labels distinguishing variants of the operation
+
+        Returns:
+            Context manager recording the duration, and an error count if the block raises
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, labels)
+
+    def timed(self, name: str, **labels: str) -> Callable:
+        """Return a decorator timing every call of a function like span() does."""
+        def decorator(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with _Span(self, name, labels):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """Add value to a counter; does nothing while disabled."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        """Record one duration in a latency histogram; does nothing while disabled."""
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(self.buckets, seconds)
+
+    def reset(self) -> None:
+        """Drop all recorded values."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> dict:
+        """
+        Return all recorded values.
+
+        Returns:
+            dict: "counters" and "histograms", each a list of entries with name and labels; histogram entries
+                have count, sum, mean and max in seconds and the cumulative count per bucket bound
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = []
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                cumulative, buckets = 0, {}
+                for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                histograms.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.total,
+                    "mean": histogram.total / histogram.count if histogram.count else 0.0,
+                    "max": histogram.maximum,
+                    "buckets": buckets,
+                })
+
+        return {"enabled": self.enabled, "timestamp": time.time(), "counters": counters, "histograms": histograms}
+
+    def write_json(self, path: Path) -> None:
+        """Atomically write the snapshot to a JSON file."""
+        path = Path(path)
+        # A temporary file per write, so concurrent writers never rename each other's partial files
+        handle, temp_name = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w") as temp_file:
+                json.dump(self.snapshot(), temp_file, indent=2)
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+    def to_prometheus(self) -> str:
+        """Render the snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines: List[str] = []
+        declared = set()
+
+        def declare(metric: str, kind: str) -> None:
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} {kind}")
+
+        for counter in snapshot["counters"]:
+            metric = _metric_name(counter["name"]) + "_total"
+            declare(metric, "counter")
+            lines.append(f"{metric}{_format_labels(counter['labels'])} {counter['value']}")
+
+        for histogram in snapshot["histograms"]:
+            metric = _metric_name(histogram["name"]) + "_seconds"
+            declare(metric, "histogram")
+            for bound, count in histogram["buckets"].items():
+                le = "+Inf" if bound == "inf" else bound
+                lines.append(f"{metric}_bucket{_format_labels(histogram['labels'], le=le)} {count}")
+            lines.append(f"{metric}_sum{_format_labels(histogram['labels'])} {histogram['sum']}")
+            lines.append(f"{metric}_count{_format_labels(histogram['labels'])} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port: int, host: str = "127.0.0.1") -> int:
+        """
+        Serve the Prometheus export on /metrics from a background thread.
+
+        Args:
+            port (int): Port to listen on, 0 picks a free one
+            host (str): Interface to bind (default: localhost only)
+
+        Returns:
+            int: The port the server listens on
+        """
+        with self._lock:
+            if self._server is not None:
+                return self._server.server_address[1]
+
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = metrics.to_prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            return self._server.server_address[1]
+
+    def start_file_export(self, path: Path, interval: float = DEFAULT_EXPORT_INTERVAL) -> None:
+        """Write the JSON snapshot to path every interval seconds from a background thread."""
+        with self._lock:
+            if self._export_thread is not None:
+                return
+
+            def run():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.write_json(path)
+                    except OSError:
+                        pass
+
+            self._export_thread = threading.Thread(target=run, name="metrics-export", daemon=True)
+            self._export_thread.start()
+
+    def configure_from_environment(self) -> None:
+        """
+        Apply the metrics settings of the environment.
+
+        BOOKS_METRICS=1 enables collection, BOOKS_METRICS_FILE writes the JSON snapshot to that file and
+        BOOKS_METRICS_PORT serves the Prometheus export on that port; both exports also enable collection.
+        """
+        file_path = os.environ.get(FILE_VARIABLE)
+        port = os.environ.get(PORT_VARIABLE)
+        if os.environ.get(ENABLE_VARIABLE, "").lower() in ("1", "true", "yes") or file_path or port:
+            self.enabled = True
+        if file_path:
+            self.start_file_export(Path(file_path))
+        if port:
+            self.start_http_server(int(port))
+
+
+def _metric_name(name: str) -> str:
+    """Turn a metric name into a valid Prometheus name with the common prefix."""
+    return f"{METRIC_PREFIX}_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _format_labels(labels: Dict[str, str], **extra: str) -> str:
+    """Render labels as {name="value",...}, escaping the values."""
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    rendered = ",".join(
+        f'{re.sub(r"[^a-zA-Z0-9_]", "_", key)}="{_escape_label(value)}"' for key, value in items.items()
+    )
+    return "{" + rendered + "}"
+
+
+def _escape_label(value) -> str:
+    """Escape backslashes, quotes and line breaks of a label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_shared_metrics: Optional[Metrics] = None
+_shared_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """Return the metrics shared by every session of this process, configured from the environment on first use."""
+    global _shared_metrics
+    if _shared_metrics is None:
+        with _shared_metrics_lock:
+            if _shared_metrics is None:
+                metrics = Metrics()
+                metrics.configure_from_environment()
+                _shared_metrics = metrics
+    return _shared_metrics
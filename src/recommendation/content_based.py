@@ -0,0 +1,271 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy import sparse
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+
+from src.data.data_loader import DataLoader
+from src.data.genre_index import GenreIndex
+
+if TYPE_CHECKING:
+    from sklearn.feature_extraction.text import HashingVectorizer
+
+# Size of the hashed feature space; collisions are rare for title words, authors and genres
+N_FEATURES = 2 ** 18
+
+# Bump whenever the features change, so persisted matrices are rebuilt
+FEATURE_FORMAT_VERSION = 1
+
+# Libraries scored together in one product; each needs a dense profile of N_FEATURES floats
+MAX_BATCH_SIZE = 16
+
+
+class ContentRecommender:
+    """
+    Content-based recommendations from hashed TF-IDF features of title, author and genres.
+
+    Every book is a sparse, L2-normalized row of features. A library is summed into one profile vector and
+    all books are scored against it with a single sparse matrix-vector product, so the cost does not grow with
+    the number of books in the library.
+    """
+
+    def __init__(self, features: sparse.csr_matrix, idf: np.ndarray, cache_dir: Optional[Path] = None):
+        self.features = features
+        self.idf = idf
+        self.n_rows = features.shape[0]
+        # Directory the matrix is persisted in, also used for the matrices of updated copies
+        self.cache_dir = cache_dir
+
+    @property
+    def nbytes(self) -> int:
+        features = self.features
+        return features.data.nbytes + features.indices.nbytes + features.indptr.nbytes + self.idf.nbytes
+
+    @staticmethod
+    def build_documents(book_data: pd.DataFrame) -> pd.Series:
+        """
+        Turn every book into one text document for the hashing vectorizer.
+
+        Authors and genres become single tokens with a prefix, so "Fantasy" the genre does not collide with
+        "fantasy" in a title.
+        """
+        def as_token(values: pd.Series, prefix: str) -> pd.Series:
+            return prefix + values.str.lower().str.strip().str.replace(r"\W+", "_", regex=True)
+
+        data = book_data.reset_index(drop=True)
+        genres = as_token(GenreIndex.parse_genres(data["genres"]), "genre_")
+        genre_tokens = genres.groupby(level=0).agg(" ".join).reindex(data.index, fill_value="")
+
+        return (
+            data["title"].fillna("").astype(str)
+            + " " + as_token(data["author"].astype("string").fillna(""), "author_")
+            + " " + genre_tokens
+        )
+
+    @staticmethod
+    def signature(book_data: pd.DataFrame) -> str:
+        """Hash the feature columns, identifying the data a persisted matrix was built from."""
+        hashes = pd.util.hash_pandas_object(book_data[["title", "author"]], index=False)
+        # Genre lists are hashed as parsed (row position, name) pairs, which works for every genres dtype
+        genre_hashes = pd.util.hash_pandas_object(GenreIndex.parse_genres(book_data["genres"]), index=True)
+        digest = hashlib.sha256(hashes.to_numpy().tobytes())
+        digest.update(genre_hashes.to_numpy().tobytes())
+        digest.update(str(FEATURE_FORMAT_VERSION).encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _vectorizer() -> "HashingVectorizer":
+        # scikit-learn takes about a second to import and is only needed when features are computed, not when
+        # the persisted matrix is loaded
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        return HashingVectorizer(n_features=N_FEATURES, alternate_sign=False, norm=None, dtype=np.float32)
+
+    @classmethod
+    def from_dataframe(cls, book_data: pd.DataFrame, cache_dir: Optional[Path] = None) -> "ContentRecommender":
+        """
+        Build the feature matrix, or load it from disk if it was built from the same data before.
+
+        Args:
+            book_data (pd.DataFrame): DataFrame containing book data
+            cache_dir (Path): Directory for the persisted matrix, one per catalogue
+                (default: the index directory of the project's dataset)
+
+        Returns:
+            ContentRecommender: Recommender over all rows of book_data
+        """
+        if cache_dir is None:
+            cache_dir = DataLoader.get_index_dir(DataLoader.get_data_path())
+        signature = cls.signature(book_data)
+
+        loaded = cls.load(cache_dir, signature)
+        if loaded is not None and loaded.n_rows == len(book_data):
+            return loaded
+
+        from sklearn.feature_extraction.text import TfidfTransformer
+
+        counts = cls._vectorizer().transform(cls.build_documents(book_data))
+        transformer = TfidfTransformer(sublinear_tf=True).fit(counts)
+        features = transformer.transform(counts).astype(np.float32).tocsr()
+
+        recommender = cls(features, transformer.idf_.astype(np.float32), cache_dir)
+        recommender.save(cache_dir, signature)
+        return recommender
+
+    def updated(
+        self, book_data: pd.DataFrame, rows: np.ndarray, cache_dir: Optional[Path] = None
+    ) -> "ContentRecommender":
+        """
+        Return a copy of the recommender with the features of changed or appended rows recomputed.
+
+        The new rows are weighted with the existing IDF, which barely moves when a small share of the books
+        changes; a full rebuild through from_dataframe refits it.
+
+        Args:
+            book_data (pd.DataFrame): The whole book data after the change, rows before n_rows keep their positions
+            rows (np.ndarray): Sorted positions of the changed and appended rows
+            cache_dir (Path): Directory for the persisted matrix (default: the one of this recommender)
+
+        Returns:
+            ContentRecommender: The new recommender; this one keeps serving the previous data
+        """
+        from sklearn.feature_extraction.text import TfidfTransformer
+
+        transformer = TfidfTransformer(sublinear_tf=True)
+        transformer.idf_ = self.idf
+        counts = self._vectorizer().transform(self.build_documents(book_data.iloc[rows]))
+        changed = transformer.transform(counts).astype(np.float32)
+
+        # Row i of the new matrix is old row i unless it changed, changed and appended rows follow the old ones
+        take = np.arange(len(book_data))
+        take[rows] = self.n_rows + np.arange(len(rows))
+        features = sparse.vstack((self.features, changed), format="csr")[take]
+
+        if cache_dir is None:
+            cache_dir = self.cache_dir or DataLoader.get_index_dir(DataLoader.get_data_path())
+        recommender = ContentRecommender(features, self.idf, cache_dir)
+        recommender.save(cache_dir, self.signature(book_data))
+        return recommender
+
+    @staticmethod
+    def _matrix_path(cache_dir: Path, signature: str) -> Path:
+        return cache_dir / f"recommender-{signature}.npz"
+
+    @staticmethod
+    def load(cache_dir: Path, signature: str) -> Optional["ContentRecommender"]:
+        """Load a persisted matrix if it was built from data with the given signature."""
+        try:
+            with np.load(ContentRecommender._matrix_path(cache_dir, signature)) as arrays:
+                # The signature is also stored inside, so a renamed or foreign file is never taken for this one
+                if str(arrays["signature"]) != signature:
+                    return None
+                features = sparse.csr_matrix(
+                    (arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(arrays["shape"])
+                )
+                return ContentRecommender(features, arrays["idf"], cache_dir)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, cache_dir: Path, signature: str) -> None:
+        """
+        Persist the matrix under its signature and delete the matrices of earlier versions of the data.
+
+        The matrix is written to a temporary file unique to this call and then renamed, so concurrent writers and
+        crashes never leave a partial file under a signature. Failures only cost the caching, never the
+        recommendations.
+        """
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            handle, temp_name = tempfile.mkstemp(dir=cache_dir, prefix="recommender-", suffix=".tmp")
+            try:
+                with os.fdopen(handle, "wb") as temp_file:
+                    np.savez(
+                        temp_file,
+                        data=self.features.data,
+                        indices=self.features.indices,
+                        indptr=self.features.indptr,
+                        shape=np.array(self.features.shape),
+                        idf=self.idf,
+                        signature=np.array(signature),
+                    )
+                matrix_path = self._matrix_path(cache_dir, signature)
+                os.replace(temp_name, matrix_path)
+            except BaseException:
+                os.unlink(temp_name)
+                raise
+
+            for stale_path in cache_dir.glob("recommender-*.npz"):
+                if stale_path != matrix_path:
+                    stale_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    def recommend(self, library_positions: Iterable[int], k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Recommend books similar to a whole library at once.
+
+        Args:
+            library_positions (Iterable[int]): Row positions of the books in the library
+            k (int): Number of recommendations
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Row positions of the recommended books, best first, and their scores
+        """
+        positions, scores = self.recommend_many([library_positions], k)
+        return positions[0], scores[0]
+
+    def recommend_many(
+        self, libraries: List[Iterable[int]], k: int = 10
+    ) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """
+        Recommend books for several libraries with one sparse matrix product.
+
+        Args:
+            libraries (List[Iterable[int]]): Row positions of the books in each library
+            k (int): Number of recommendations per library
+
+        Returns:
+            Tuple[List[np.ndarray], List[np.ndarray]]: Per library, the recommended row positions and their scores
+        """
+        members = [np.unique(np.fromiter(library, dtype=np.int64)) for library in libraries]
+        recommended, recommended_scores = [], []
+        for start in range(0, len(members), MAX_BATCH_SIZE):
+            batch = members[start:start + MAX_BATCH_SIZE]
+            positions, scores = self._recommend_batch(batch, k)
+            recommended.extend(positions)
+            recommended_scores.extend(scores)
+
+        return recommended, recommended_scores
+
+    def _recommend_batch(self, members: List[np.ndarray], k: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """Score all books against a batch of libraries given as sorted, unique row positions."""
+        rows = np.repeat(np.arange(len(members)), [len(library) for library in members])
+        columns = np.concatenate(members) if members else np.zeros(0, dtype=np.int64)
+        membership = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(len(members), self.n_rows)
+        )
+
+        # Every library becomes the sum of its books' features; one product scores all books for all libraries
+        profiles = (membership @ self.features).T.toarray()
+        scores = self.features @ profiles
+
+        recommended, recommended_scores = [], []
+        for column, library in enumerate(members):
+            library_scores = scores[:, column]
+            library_scores[library] = -np.inf
+            count = min(k, self.n_rows - len(library))
+            if count <= 0 or not len(library):
+                recommended.append(np.zeros(0, dtype=np.int64))
+                recommended_scores.append(np.zeros(0, dtype=np.float32))
+                continue
+
+            top = np.argpartition(-library_scores, count - 1)[:count]
+            top = top[np.argsort(-library_scores[top], kind="stable")]
+            top = top[library_scores[top] > 0]
+            recommended.append(top)
+            recommended_scores.append(library_scores[top])
+
+        return recommended, recommended_scores
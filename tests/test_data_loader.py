@@ -0,0 +1,119 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_catalogue import generate_catalogue
+from src.data.data_loader import SNAPSHOT_FORMAT_VERSION, DataLoader
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "books.csv"
+    generate_catalogue(100, seed=0).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture
+def csv_reads(monkeypatch):
+    """Count how often the CSV is parsed."""
+    reads = []
+    read_csv = DataLoader._read_csv
+
+    def counting_read_csv(data_path):
+        reads.append(data_path)
+        return read_csv(data_path)
+
+    monkeypatch.setattr(DataLoader, "_read_csv", staticmethod(counting_read_csv))
+    return reads
+
+
+def test_snapshot_is_written_and_reused(csv_path, csv_reads):
+    first = DataLoader.get_book_data(csv_path)
+    snapshot_path = DataLoader.get_snapshot_path(csv_path)
+    assert snapshot_path.exists()
+    assert json.loads(snapshot_path.with_suffix(".json").read_text())["format_version"] == SNAPSHOT_FORMAT_VERSION
+
+    second = DataLoader.get_book_data(csv_path)
+
+    assert len(csv_reads) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_touching_the_csv_keeps_the_snapshot(csv_path, csv_reads):
+    DataLoader.get_book_data(csv_path)
+    os.utime(csv_path, (2_000_000, 2_000_000))
+
+    DataLoader.get_book_data(csv_path)
+
+    assert len(csv_reads) == 1
+    recorded = json.loads(DataLoader.get_snapshot_path(csv_path).with_suffix(".json").read_text())
+    assert recorded["mtime_ns"] == 2_000_000 * 10 ** 9
+
+
+def test_changed_csv_invalidates_the_snapshot(csv_path, csv_reads):
+    DataLoader.get_book_data(csv_path)
+    changed = pd.read_csv(csv_path, dtype={"isbn": str})
+    changed.loc[0, "title"] = "A changed title"
+    changed.to_csv(csv_path, index=False)
+
+    book_data = DataLoader.get_book_data(csv_path)
+
+    assert len(csv_reads) == 2
+    assert book_data["title"].iloc[0] == "A changed title"
+    assert DataLoader.get_book_data(csv_path)["title"].iloc[0] == "A changed title"
+    assert len(csv_reads) == 2
+
+
+def test_other_format_version_invalidates_the_snapshot(csv_path, csv_reads):
+    DataLoader.get_book_data(csv_path)
+    meta_path = DataLoader.get_snapshot_path(csv_path).with_suffix(".json")
+    meta_path.write_text(json.dumps({**json.loads(meta_path.read_text()), "format_version": 0}))
+
+    DataLoader.get_book_data(csv_path)
+
+    assert len(csv_reads) == 2
+
+
+def test_unreadable_snapshot_is_rebuilt(csv_path, csv_reads):
+    expected = DataLoader.get_book_data(csv_path)
+    DataLoader.get_snapshot_path(csv_path).write_bytes(b"not a feather file")
+
+    pd.testing.assert_frame_equal(DataLoader.get_book_data(csv_path), expected)
+    assert len(csv_reads) == 2
+    pd.testing.assert_frame_equal(DataLoader.get_book_data(csv_path), expected)
+    assert len(csv_reads) == 2
+
+
+def test_snapshot_matches_the_csv(csv_path):
+    pd.testing.assert_frame_equal(
+        DataLoader.get_book_data(csv_path), DataLoader.get_book_data(csv_path, use_snapshot=False)
+    )
+
+
+def test_no_temporary_files_are_left(csv_path):
+    DataLoader.get_book_data(csv_path)
+
+    assert not list(DataLoader.get_snapshot_path(csv_path).parent.glob("*.tmp"))
+
+
+def test_failed_write_keeps_the_previous_file(tmp_path):
+    path = tmp_path / "file.json"
+    path.write_text("previous")
+
+    def failing_write(temp_name):
+        with open(temp_name, "w") as temp_file:
+            temp_file.write("partial")
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        DataLoader._replace_atomically(path, failing_write)
+
+    assert path.read_text() == "previous"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_missing_dataset_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        DataLoader.get_book_data(tmp_path / "missing.csv")
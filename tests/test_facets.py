@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_catalogue import generate_catalogue
+from src.data.facets import FacetIndex
+from src.data.query import BookQuery
+from src.data.query_cache import QueryCache
+from src.data.schema import BookSchema
+
+
+@pytest.fixture(scope="module")
+def book_data():
+    return BookSchema.apply(generate_catalogue(2000, seed=5))
+
+
+@pytest.fixture(scope="module")
+def facet_index(book_data):
+    return FacetIndex.from_dataframe(book_data)
+
+
+def assert_same_counts(counts, expected) -> None:
+    assert counts.total == expected.total
+    for facet in ("genre", "language", "rating", "pages"):
+        pd.testing.assert_series_equal(counts.get(facet), expected.get(facet))
+
+
+def test_counts_match_a_brute_force_count(book_data, facet_index):
+    positions = np.flatnonzero(book_data["rating"].to_numpy() >= 4.0)
+
+    counts = facet_index.counts(positions)
+
+    genres = pd.Series([
+        genre for names in book_data["genres"].iloc[positions] for genre in dict.fromkeys(names)
+    ]).value_counts()
+    assert counts.get("genre").sort_index().to_dict() == genres.sort_index().to_dict()
+    assert counts.get("language").to_dict() == book_data["language"].iloc[positions].value_counts().to_dict()
+    assert counts.get("rating")["Unrated"] == 0
+    assert counts.get("pages").sum() == counts.total == len(positions)
+
+
+@pytest.mark.parametrize("kept", [0.9, 0.5, 0.1, 0.0])
+def test_narrow_to_a_subset_equals_counting_from_scratch(facet_index, kept):
+    rng = np.random.default_rng(0)
+    wide = np.sort(rng.choice(facet_index.n_rows, 1500, replace=False))
+    narrow = np.sort(rng.choice(wide, int(len(wide) * kept), replace=False))
+
+    assert_same_counts(facet_index.counts(wide).narrow(narrow), facet_index.counts(narrow))
+
+
+def test_narrow_to_rows_outside_the_results_counts_from_scratch(facet_index):
+    wide = np.arange(0, 1000)
+    other = np.arange(500, 1500)
+
+    assert_same_counts(facet_index.counts(wide).narrow(other), facet_index.counts(other))
+
+
+def test_query_facets_narrow_a_previous_result(book_data, facet_index):
+    indexes = {"facets": facet_index}
+    previous = BookQuery(book_data, indexes.get).min_rating(3.5).facets()
+
+    facets = BookQuery(book_data, indexes.get).min_rating(3.5).language("english").facets(previous)
+
+    assert_same_counts(facets, BookQuery(book_data, indexes.get).min_rating(3.5).language("english").facets())
+
+
+def test_query_facets_are_cached_with_the_results(book_data, facet_index):
+    indexes = {"facets": facet_index}
+    cache = QueryCache()
+    first = BookQuery(book_data, indexes.get, cache, data_version=1).min_rating(4.0).facets()
+
+    second = BookQuery(book_data, indexes.get, cache, data_version=1).min_rating(4.0).facets()
+
+    assert second.counts is first.counts
+    assert not second.counts["genre"].flags.writeable
+    assert_same_counts(second, facet_index.counts(first.positions))
+    assert BookQuery(book_data, indexes.get, cache, data_version=2).min_rating(4.0).facets().counts is not first.counts
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.filters import DataFilter
+from src.data.genre_index import GenreIndex
+from src.data.schema import BookSchema
+
+GENRES = pd.Series([
+    "['Fantasy', 'Fiction']",
+    "['fiction', 'Romance', 'Fiction']",
+    "[]",
+    None,
+    "[' Fantasy ', \"Young Adult\"]",
+    "['Romance', 'Fantasy', 'Fiction']",
+])
+
+
+@pytest.fixture(params=["string", "arrow"])
+def genres(request):
+    if request.param == "string":
+        return GENRES
+    return BookSchema.apply(pd.DataFrame({"genres": GENRES}))["genres"]
+
+
+def test_parse_genres_strips_names_and_keeps_row_positions():
+    names = GenreIndex.parse_genres(GENRES)
+
+    assert names.tolist() == ["Fantasy", "Fiction", "fiction", "Romance", "Fiction", "Fantasy", "Young Adult",
+                              "Romance", "Fantasy", "Fiction"]
+    assert names.index.tolist() == [0, 0, 1, 1, 1, 4, 4, 5, 5, 5]
+
+
+def test_lookup_is_case_insensitive_and_drops_duplicates(genres):
+    index = GenreIndex.from_series(genres)
+
+    assert index.lookup("fiction").tolist() == [0, 1, 5]
+    assert index.lookup(" FANTASY ").tolist() == [0, 4, 5]
+    assert index.lookup("Horror").tolist() == []
+    assert index.sorted_genres() == ["Fantasy", "Fiction", "Romance", "Young Adult"]
+
+
+def test_lookup_many_any_and_all(genres):
+    index = GenreIndex.from_series(genres)
+
+    assert index.lookup_many(["Fantasy", "Romance"]).tolist() == [0, 1, 4, 5]
+    assert index.lookup_many(["Fantasy", "Romance"], match_all=True).tolist() == [5]
+    assert index.lookup_many(["Fantasy", "Horror"], match_all=True).tolist() == []
+    assert index.lookup_many(["Fantasy", "Horror"]).tolist() == [0, 4, 5]
+    assert index.lookup_many([]).tolist() == []
+
+
+def test_lookup_many_matches_a_brute_force_filter():
+    rng = np.random.default_rng(0)
+    vocabulary = ["Fantasy", "Fiction", "Romance", "Horror", "Poetry"]
+    lists = [rng.choice(vocabulary, size=rng.integers(0, 4), replace=False).tolist() for _ in range(500)]
+    index = GenreIndex.from_series(pd.Series([str(genres) for genres in lists]))
+
+    for wanted in (["Fantasy"], ["Fantasy", "Horror"], ["Romance", "Poetry", "Fiction"]):
+        any_expected = [row for row, genres in enumerate(lists) if set(wanted) & set(genres)]
+        all_expected = [row for row, genres in enumerate(lists) if set(wanted) <= set(genres)]
+        assert index.lookup_many(wanted).tolist() == any_expected
+        assert index.lookup_many(wanted, match_all=True).tolist() == all_expected
+
+
+def test_updated_index_equals_a_rebuilt_one():
+    index = GenreIndex.from_series(GENRES)
+    changed = pd.concat([GENRES, pd.Series(["['Horror']"])], ignore_index=True)
+    changed[1] = "['Poetry']"
+    rows = np.array([1, 6])
+
+    updated = index.updated(changed, rows)
+    rebuilt = GenreIndex.from_series(changed)
+
+    assert updated.sorted_genres() == rebuilt.sorted_genres()
+    for genre in rebuilt.sorted_genres():
+        assert updated.lookup(genre).tolist() == rebuilt.lookup(genre).tolist()
+
+
+def test_filter_by_genres_with_and_without_index(genres):
+    book_data = pd.DataFrame({"title": [f"Book {row}" for row in range(len(genres))], "genres": genres})
+    index = GenreIndex.from_series(genres)
+
+    for match_all in (False, True):
+        scanned = DataFilter.filter_by_genres(book_data, ["Fantasy", "Fiction"], match_all=match_all)
+        indexed = DataFilter.filter_by_genres(book_data, ["Fantasy", "Fiction"], match_all=match_all, genre_index=index)
+        assert scanned.index.tolist() == indexed.index.tolist()
+    assert DataFilter.filter_by_genre(book_data, "romance", genre_index=index).index.tolist() == [1, 5]
+
+
+def test_filter_rejects_empty_genres_and_foreign_indexes():
+    book_data = pd.DataFrame({"genres": GENRES})
+    with pytest.raises(ValueError):
+        DataFilter.filter_by_genres(book_data, [])
+    with pytest.raises(ValueError):
+        DataFilter.filter_by_genre(book_data, " ")
+    with pytest.raises(ValueError):
+        DataFilter.filter_by_genres(book_data, ["Fantasy"], genre_index=GenreIndex.from_series(GENRES[:3]))
+
+
+@pytest.mark.parametrize("wanted, match_all", [
+    (["Fantasy"], False),
+    (["fiction", "ROMANCE"], True),
+    (["Fantasy", "Young Adult"], False),
+    (["Fantasy", "fantasy"], True),
+    (["Horror"], False),
+])
+def test_match_lists_agrees_with_the_index(wanted, match_all):
+    # Two chunks with different genre vocabularies, like a column concatenated after a refresh
+    parts = [BookSchema.apply(pd.DataFrame({"genres": part}))["genres"] for part in (GENRES[:3], GENRES[3:])]
+    genres = pd.concat(parts, ignore_index=True)
+    expected = np.zeros(len(GENRES), dtype=bool)
+    expected[GenreIndex.from_series(GENRES).lookup_many(wanted, match_all)] = True
+
+    assert GenreIndex.match_lists(genres, wanted, match_all).tolist() == expected.tolist()
+    assert GenreIndex.match_lists(genres.iloc[2:5], wanted, match_all).tolist() == expected[2:5].tolist()
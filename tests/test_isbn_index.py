@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+from src.data.filters import DataFilter
+from src.data.isbn_index import IsbnIndex
+
+ISBNS = pd.Series(["0-306-40615-2", "9780306406164", "080442957X", "9791234567896", "123-456", "978 0 14 044913 6"])
+
+
+@pytest.mark.parametrize("isbn10, isbn13", [
+    ("0306406152", "9780306406157"),
+    ("080442957X", "9780804429573"),
+    ("0140449132", "9780140449136"),
+])
+def test_convert_between_isbn10_and_isbn13(isbn10, isbn13):
+    assert IsbnIndex.convert(isbn10) == isbn13
+    assert IsbnIndex.convert(isbn13) == isbn10
+
+
+@pytest.mark.parametrize("isbn", ["9791234567896", "12345", "ABCDEFGHIJ", "978030640615X"])
+def test_isbns_without_counterpart(isbn):
+    assert IsbnIndex.convert(isbn) is None
+
+
+def test_normalize_removes_separators_and_uppercases_the_check_digit():
+    assert IsbnIndex.normalize(" 0-8044-2957-x ") == "080442957X"
+
+
+def test_lookup_by_stored_and_converted_isbn():
+    index = IsbnIndex.from_series(ISBNS)
+
+    assert index.lookup("0306406152") == 0
+    assert index.lookup("978-0-306-40615-7") == 0
+    assert index.lookup("9780804429573") == 2
+    assert index.lookup("080442957x") == 2
+    assert index.lookup("0140449132") == 5
+    assert index.lookup("9791234567896") == 3
+    assert index.lookup("0000000000") is None
+
+
+def test_stored_isbns_take_precedence_over_converted_ones():
+    # Both rows store the same book, each in one notation; a lookup finds the row storing exactly that ISBN
+    index = IsbnIndex.from_series(pd.Series(["9780306406157", "0306406152"]))
+
+    assert index.lookup("9780306406157") == 0
+    assert index.lookup("0306406152") == 1
+
+
+def test_lookup_many_keeps_the_input_order():
+    index = IsbnIndex.from_series(ISBNS)
+
+    assert index.lookup_many(["9780140449136", "unknown", "0306406152"]).tolist() == [5, -1, 0]
+
+
+def test_updated_index_finds_new_and_changed_books():
+    index = IsbnIndex.from_series(ISBNS)
+    changed = pd.concat([ISBNS, pd.Series(["0451524934"])], ignore_index=True)
+
+    updated = index.updated(changed, pd.Series([6]).to_numpy())
+
+    assert updated.lookup("9780451524935") == 6
+    assert updated.n_rows == 7
+    assert index.lookup("0451524934") is None
+
+
+def test_filters_with_and_without_index():
+    book_data = pd.DataFrame({"isbn": ISBNS, "title": [f"Book {row}" for row in range(len(ISBNS))]})
+    index = IsbnIndex.from_series(book_data["isbn"])
+
+    assert DataFilter.filter_by_isbn(book_data, "978-0-306-40615-7", isbn_index=index).index.tolist() == [0]
+    assert DataFilter.filter_by_isbn(book_data, "9780306406164").index.tolist() == [1]
+    assert DataFilter.filter_by_isbns(book_data, ["080442957X", "nope", "9780306406164"], index).index.tolist() == [2, 1]
+    with pytest.raises(ValueError):
+        DataFilter.filter_by_isbn(book_data, "123")
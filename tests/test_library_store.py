@@ -0,0 +1,167 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src.data.isbn_index import IsbnIndex
+from src.library.library_store import LibraryStore, SessionLibraryStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "library.sqlite3"
+
+
+@pytest.fixture
+def store(db_path):
+    # No background flush, so the tests decide when changes are written
+    store = LibraryStore(db_path, batch_size=8, flush_interval=None)
+    yield store
+    store.close()
+
+
+def stored_rows(db_path):
+    with sqlite3.connect(str(db_path)) as connection:
+        return connection.execute("SELECT user_id, isbn, status FROM library ORDER BY added_at").fetchall()
+
+
+def test_changes_are_pending_until_flushed(store, db_path):
+    store.add("alice", "1")
+    store.add("alice", "2", "Read")
+
+    assert stored_rows(db_path) == []
+    assert store.get_library("alice") == {"1": "Want to Read", "2": "Read"}
+
+    store.flush()
+
+    assert stored_rows(db_path) == [("alice", "1", "Want to Read"), ("alice", "2", "Read")]
+
+
+def test_changes_to_one_book_are_coalesced(store, db_path):
+    store.add("alice", "1")
+    store.set_status("alice", "1", "Read")
+    assert len(store._pending) == 1
+
+    store.flush()
+
+    assert stored_rows(db_path) == [("alice", "1", "Read")]
+
+
+def test_adding_and_removing_before_a_flush_writes_nothing(store, db_path):
+    store.add("alice", "1")
+    store.remove("alice", "1")
+
+    store.flush()
+
+    assert stored_rows(db_path) == []
+    assert store.get_library("alice") == {}
+
+
+def test_changes_to_stored_books_are_applied_on_flush(store, db_path):
+    store.add("alice", "1")
+    store.add("alice", "2")
+    store.flush()
+
+    store.set_status("alice", "1", "Read")
+    store.remove("alice", "2")
+    assert store.get_library("alice") == {"1": "Read"}
+    store.flush()
+
+    assert stored_rows(db_path) == [("alice", "1", "Read")]
+
+
+def test_readding_a_stored_book_keeps_its_place(store, db_path):
+    store.add("alice", "1")
+    store.add("alice", "2")
+    store.flush()
+
+    store.add("alice", "1", "Read")
+    store.flush()
+
+    assert list(store.get_library("alice").items()) == [("1", "Read"), ("2", "Want to Read")]
+
+
+def test_full_batch_is_written_immediately(store, db_path):
+    for isbn in range(store.batch_size):
+        store.add("alice", str(isbn))
+
+    assert len(stored_rows(db_path)) == store.batch_size
+    assert store._pending == {}
+
+
+def test_unknown_books_are_ignored(store):
+    store.set_status("alice", "1", "Read")
+    store.remove("alice", "1")
+
+    assert store._pending == {}
+
+
+def test_invalid_status_raises(store):
+    with pytest.raises(ValueError):
+        store.add("alice", "1", "Lent")
+
+
+def test_libraries_are_separate_per_user(store):
+    store.add("alice", "1")
+    store.add("bob", "2")
+
+    assert store.get_library("alice") == {"1": "Want to Read"}
+    assert store.get_library("bob") == {"2": "Want to Read"}
+
+
+def test_other_stores_see_flushed_changes(store, db_path):
+    other = LibraryStore(db_path, flush_interval=None)
+    try:
+        store.add("alice", "1")
+        assert other.get_library("alice") == {}
+
+        store.flush()
+        assert other.get_library("alice") == {"1": "Want to Read"}
+
+        # A book both stores add keeps one row and takes the status written last
+        other.add("alice", "1", "Read")
+        other.flush()
+        assert store.get_library("alice") == {"1": "Read"}
+        assert stored_rows(db_path) == [("alice", "1", "Read")]
+    finally:
+        other.close()
+
+
+def test_add_returns_the_stored_entry_without_reading_the_library(store, monkeypatch):
+    store.add("alice", "1")
+    store.flush()
+    monkeypatch.setattr(store, "_load", lambda user_id: pytest.fail("add must not load the whole library"))
+
+    assert store.add("alice", "2", "Read") == ("2", "Read")
+    assert store.add("alice", "1", "Read") == ("1", "Read")
+    store.set_status("alice", "2", "Want to Read")
+    store.remove("alice", "1")
+
+
+def test_session_store_keeps_libraries_in_memory():
+    store = SessionLibraryStore()
+
+    assert store.add("", "1") == ("1", "Want to Read")
+    store.add("", "2")
+    store.set_status("", "1", "Read")
+    store.set_status("", "3", "Read")
+    store.remove("", "2")
+
+    assert store.get_library("") == {"1": "Read"}
+    assert store.get_library("other") == {}
+    with pytest.raises(ValueError):
+        store.add("", "4", "Lent")
+
+
+def test_session_store_resolves_positions_like_the_persistent_one(store):
+    isbn_index = IsbnIndex.from_series(pd.Series(["1", "2", "3"]))
+    session_store = SessionLibraryStore()
+    for library in (store, session_store):
+        library.add("alice", "3")
+        library.add("alice", "9")
+        library.add("alice", "1")
+
+    for library in (store, session_store):
+        positions, isbns = library.get_positions("alice", isbn_index)
+        assert positions.tolist() == [2, 0]
+        assert isbns.tolist() == ["3", "1"]
@@ -0,0 +1,128 @@
+import json
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+from src.data.filters import DataFilter
+from src.data.genre_index import GenreIndex
+from src.data.isbn_index import IsbnIndex
+from src.monitoring import metrics as metrics_module
+from src.monitoring.metrics import Metrics
+
+
+@pytest.fixture
+def metrics():
+    return Metrics(buckets=(0.01, 0.1), enabled=True)
+
+
+def histogram(snapshot: dict, name: str, **labels) -> dict:
+    entries = [entry for entry in snapshot["histograms"] if entry["name"] == name and entry["labels"] == labels]
+    assert len(entries) == 1
+    return entries[0]
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics()
+
+    with metrics.span("query"):
+        pass
+    metrics.increment("queries")
+    metrics.observe("query", 0.5)
+
+    assert metrics.snapshot()["counters"] == [] and metrics.snapshot()["histograms"] == []
+
+
+def test_spans_fill_cumulative_buckets(metrics):
+    for seconds in (0.005, 0.05, 0.05, 3.0):
+        metrics.observe("query", seconds, criteria="title")
+
+    entry = histogram(metrics.snapshot(), "query", criteria="title")
+
+    assert entry["count"] == 4
+    assert entry["sum"] == pytest.approx(3.105)
+    assert entry["max"] == 3.0
+    assert entry["buckets"] == {"0.01": 1, "0.1": 3, "inf": 4}
+
+
+def test_failing_spans_count_errors(metrics):
+    @metrics.timed("render", function="page")
+    def render():
+        raise KeyError("missing")
+
+    with pytest.raises(KeyError):
+        render()
+
+    snapshot = metrics.snapshot()
+    assert histogram(snapshot, "render", function="page")["count"] == 1
+    assert snapshot["counters"] == [
+        {"name": "errors", "labels": {"error": "KeyError", "function": "page", "span": "render"}, "value": 1}
+    ]
+
+
+def test_counters_add_up_per_labels(metrics):
+    metrics.increment("queries", cache="hit")
+    metrics.increment("queries", cache="hit")
+    metrics.increment("queries", 3, cache="miss")
+
+    values = {entry["labels"]["cache"]: entry["value"] for entry in metrics.snapshot()["counters"]}
+    assert values == {"hit": 2, "miss": 3}
+
+
+def test_prometheus_export(metrics):
+    metrics.increment("queries", criteria='title "quoted"\\')
+    metrics.observe("query", 0.05, criteria="title")
+
+    text = metrics.to_prometheus()
+
+    assert "# TYPE books_queries_total counter" in text
+    assert 'books_queries_total{criteria="title \\"quoted\\"\\\\"} 1' in text
+    assert "# TYPE books_query_seconds histogram" in text
+    assert 'books_query_seconds_bucket{criteria="title",le="0.1"} 1' in text
+    assert 'books_query_seconds_bucket{criteria="title",le="+Inf"} 1' in text
+    assert 'books_query_seconds_count{criteria="title"} 1' in text
+
+
+def test_json_export(metrics, tmp_path):
+    metrics.increment("queries")
+    path = tmp_path / "metrics.json"
+
+    metrics.write_json(path)
+
+    assert json.loads(path.read_text())["counters"][0]["name"] == "queries"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_http_export(metrics):
+    metrics.increment("queries")
+    port = metrics.start_http_server(0)
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        assert "books_queries_total 1" in response.read().decode()
+    with pytest.raises(urllib.error.HTTPError):
+        urllib.request.urlopen(f"http://127.0.0.1:{port}/other")
+    assert metrics.start_http_server(0) == port
+
+
+def test_configure_from_environment(monkeypatch):
+    monkeypatch.setenv(metrics_module.ENABLE_VARIABLE, "yes")
+    metrics = Metrics()
+
+    metrics.configure_from_environment()
+
+    assert metrics.enabled
+
+
+def test_filters_calling_other_filters_are_timed_once(monkeypatch):
+    metrics = metrics_module.get_metrics()
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    book_data = pd.DataFrame({"isbn": ["0306406152", "080442957X"], "genres": ["['Fantasy']", "['Horror']"]})
+
+    DataFilter.filter_by_genre(book_data, "Fantasy", GenreIndex.from_dataframe(book_data))
+    DataFilter.filter_by_isbn(book_data, "0306406152", IsbnIndex.from_dataframe(book_data))
+
+    methods = [entry["labels"]["method"] for entry in metrics.snapshot()["histograms"] if entry["name"] == "filter"]
+    metrics.reset()
+    assert sorted(methods) == ["filter_by_genre", "filter_by_isbn"]
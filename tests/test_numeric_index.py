@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.filters import DataFilter
+from src.data.numeric_index import SortedIndex
+
+RATINGS = pd.Series([4.5, None, 3.0, 4.5, 0.0, 5.0, 3.99, 2.5, None, 4.0], dtype="float32")
+
+
+def brute_force(values: pd.Series, minimum, maximum) -> list:
+    return [
+        row for row, value in enumerate(values)
+        if not pd.isna(value)
+        and (minimum is None or value >= np.float32(minimum))
+        and (maximum is None or value <= np.float32(maximum))
+    ]
+
+
+@pytest.mark.parametrize("minimum, maximum", [
+    (None, None), (4.5, None), (None, 3.0), (3.0, 4.5), (3.99, 3.99), (4.6, 4.4), (6.0, None), (-1.0, 0.0),
+])
+def test_range_and_count_match_a_scan(minimum, maximum):
+    index = SortedIndex.from_series(RATINGS)
+
+    expected = brute_force(RATINGS, minimum, maximum)
+
+    assert index.range(minimum, maximum).tolist() == expected
+    assert index.count(minimum, maximum) == len(expected)
+
+
+def test_range_matches_a_scan_on_random_values():
+    rng = np.random.default_rng(0)
+    values = pd.Series(rng.integers(0, 1000, 5000).astype(float))
+    values[rng.integers(0, 5000, 100)] = np.nan
+    index = SortedIndex.from_series(values)
+
+    for minimum, maximum in rng.integers(0, 1000, (20, 2)):
+        assert index.range(int(minimum), int(maximum)).tolist() == brute_force(values, minimum, maximum)
+
+
+def test_missing_values_are_left_out():
+    index = SortedIndex.from_series(RATINGS)
+
+    assert index.n_rows == len(RATINGS)
+    assert len(index.values) == RATINGS.notna().sum()
+
+
+def test_page_filters_with_and_without_index():
+    book_data = pd.DataFrame({"pages": pd.array([100, None, 350, 99, 1000, 250], dtype="Int32")})
+    index = SortedIndex.from_series(book_data["pages"])
+
+    for pages_index in (None, index):
+        assert DataFilter.filter_by_minimum_pages(book_data, 250, pages_index).index.tolist() == [2, 4, 5]
+        assert DataFilter.filter_by_maximum_pages(book_data, 100, pages_index).index.tolist() == [0, 3]
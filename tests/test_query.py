@@ -0,0 +1,153 @@
+import ast
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_catalogue import generate_catalogue
+from src.data.dataset_cache import INDEX_BUILDERS
+from src.data.query import BookQuery
+from src.data.query_cache import QueryCache
+from src.data.schema import BookSchema
+from src.data.sharding import ShardedExecutor
+
+N_ROWS = 3000
+
+
+@pytest.fixture(scope="module")
+def raw_data():
+    return generate_catalogue(N_ROWS, seed=3)
+
+
+@pytest.fixture(scope="module")
+def book_data(raw_data):
+    return BookSchema.apply(raw_data.copy())
+
+
+@pytest.fixture(scope="module")
+def indexes(book_data):
+    return {name: INDEX_BUILDERS[name](book_data) for name in ("title", "author", "genre", "rating", "pages", "isbn")}
+
+
+def brute_force(raw_data: pd.DataFrame, criteria: dict) -> list:
+    """Evaluate the criteria row by row on the unconverted data."""
+    ratings = pd.to_numeric(raw_data["rating"], errors="coerce")
+    pages = pd.to_numeric(raw_data["pages"], errors="coerce")
+    matches = []
+    for row in range(len(raw_data)):
+        book = raw_data.iloc[row]
+        genres = {genre.strip().lower() for genre in ast.literal_eval(book["genres"])}
+        keep = (
+            ("title" not in criteria or criteria["title"] in str(book["title"]).lower())
+            and ("author" not in criteria or criteria["author"] == str(book["author"]).lower().strip())
+            and ("min_rating" not in criteria or ratings[row] >= criteria["min_rating"])
+            and ("pages" not in criteria or criteria["pages"][0] <= pages[row] <= criteria["pages"][1])
+            and ("language" not in criteria or str(book["language"]).lower() == criteria["language"])
+            and ("genres" not in criteria or set(criteria["genres"]) <= genres)
+            and ("isbn" not in criteria or str(book["isbn"]) == criteria["isbn"])
+        )
+        if keep:
+            matches.append(row)
+    return matches
+
+
+def build(query: BookQuery, criteria: dict) -> BookQuery:
+    if "title" in criteria:
+        query.title(criteria["title"])
+    if "author" in criteria:
+        query.author(criteria["author"], exact_match=True)
+    if "min_rating" in criteria:
+        query.min_rating(criteria["min_rating"])
+    if "pages" in criteria:
+        query.pages(*criteria["pages"])
+    if "language" in criteria:
+        query.language(criteria["language"])
+    if "genres" in criteria:
+        query.genre(*criteria["genres"], match_all=True)
+    if "isbn" in criteria:
+        query.isbn(criteria["isbn"])
+    return query
+
+
+CRITERIA = [
+    {"title": "night"},
+    {"title": "the", "min_rating": 4.0},
+    {"min_rating": 3.5, "pages": (100, 400)},
+    {"language": "french", "genres": ["fantasy"]},
+    {"genres": ["fiction", "romance"], "title": "a"},
+    {"author": "anna smith 0", "min_rating": 0.0},
+    {"title": "star", "pages": (0, 200), "language": "english", "genres": ["horror"]},
+    {"title": "no such title"},
+]
+
+
+@pytest.mark.parametrize("criteria", CRITERIA, ids=lambda criteria: "+".join(criteria))
+@pytest.mark.parametrize("mode", ["scan", "indexed", "sharded"])
+def test_query_matches_a_brute_force_filter(raw_data, book_data, indexes, criteria, mode):
+    get_index = indexes.get if mode == "indexed" else None
+    executor = ShardedExecutor(max_workers=2, shard_rows=256) if mode == "sharded" else None
+
+    positions = build(BookQuery(book_data, get_index, executor=executor), criteria).positions()
+
+    assert positions.tolist() == brute_force(raw_data, criteria)
+
+
+def test_isbn_query_finds_one_book(raw_data, book_data, indexes):
+    isbn = str(raw_data["isbn"].iloc[17])
+    for get_index in (None, indexes.get):
+        assert BookQuery(book_data, get_index).isbn(isbn).positions().tolist() == [17]
+
+
+def test_query_without_criteria_matches_every_book(book_data):
+    query = BookQuery(book_data)
+
+    assert query.count() == len(book_data)
+    assert query.criteria() == "all"
+
+
+def test_key_ignores_the_order_of_criteria(book_data):
+    first = BookQuery(book_data).title("Night").min_rating(4)
+    second = BookQuery(book_data).min_rating(4.0).title(" night ")
+
+    assert first.key() == second.key()
+    assert first.criteria() == "rating+title"
+
+
+def test_results_are_cached_per_version(book_data, indexes):
+    cache = QueryCache()
+    first = BookQuery(book_data, indexes.get, cache, data_version=1).title("night").positions()
+
+    cached = BookQuery(book_data, indexes.get, cache, data_version=1).title("night").positions()
+
+    assert cached is first
+    assert cache.stats()["hits"] == 1
+
+
+def test_page_and_to_frame_materialize_the_matches(book_data):
+    query = BookQuery(book_data).title("night")
+    positions = query.positions()
+
+    assert query.to_frame().index.tolist() == positions.tolist()
+    pd.testing.assert_frame_equal(query.page(2, 5), book_data.iloc[positions[5:10]])
+    assert query.page(10 ** 6, 5).empty
+
+
+@pytest.mark.parametrize("build_invalid", [
+    lambda query: query.title(" "),
+    lambda query: query.title("a", exact_match=True, fuzzy=True),
+    lambda query: query.min_rating("4"),
+    lambda query: query.pages(-1),
+    lambda query: query.genre(),
+    lambda query: query.isbn("123"),
+])
+def test_invalid_criteria_raise(book_data, build_invalid):
+    with pytest.raises(ValueError):
+        build_invalid(BookQuery(book_data))
+
+
+def test_ranked_results_contain_the_matches(book_data, indexes):
+    query = BookQuery(book_data, indexes.get).title("night").min_rating(2.0)
+
+    ranked = query.ranked()
+
+    assert np.array_equal(np.sort(ranked.page(1, len(ranked))), query.positions())
@@ -0,0 +1,73 @@
+import numpy as np
+
+from src.data.query_cache import QueryCache
+
+
+def positions(*values):
+    return np.array(values, dtype=np.int64)
+
+
+def test_newer_version_drops_older_entries():
+    cache = QueryCache()
+    cache.put(("title", "a"), positions(1, 2), version=1)
+    assert cache.get(("title", "a"), version=1).tolist() == [1, 2]
+
+    assert cache.get(("title", "a"), version=2) is None
+    assert cache.stats()["entries"] == 0
+    # The old version is outdated from now on
+    assert cache.get(("title", "a"), version=1) is None
+
+
+def test_results_of_an_outdated_version_are_not_stored():
+    cache = QueryCache()
+    cache.put(("title", "a"), positions(1), version=2)
+
+    cache.put(("title", "b"), positions(3), version=1)
+
+    assert cache.get(("title", "b"), version=1) is None
+    assert cache.get(("title", "b"), version=2) is None
+    assert cache.get(("title", "a"), version=2).tolist() == [1]
+
+
+def test_stored_positions_are_read_only():
+    cache = QueryCache()
+    stored = positions(1, 2)
+    cache.put(("title", "a"), stored, version=1)
+
+    assert not cache.get(("title", "a"), version=1).flags.writeable
+
+
+def test_least_recently_used_entries_are_evicted_beyond_the_size_bound():
+    cache = QueryCache(max_bytes=3 * 8 * 10)
+    for name in "abc":
+        cache.put(("title", name), np.arange(10), version=1)
+    cache.get(("title", "a"), version=1)
+
+    cache.put(("title", "d"), np.arange(10), version=1)
+
+    assert cache.get(("title", "b"), version=1) is None
+    for name in "acd":
+        assert cache.get(("title", name), version=1) is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["nbytes"] == 3 * 8 * 10
+
+
+def test_results_larger_than_the_cache_are_not_stored():
+    cache = QueryCache(max_bytes=8)
+
+    cache.put(("title", "a"), np.arange(2), version=1)
+
+    assert cache.get(("title", "a"), version=1) is None
+    assert cache.stats()["nbytes"] == 0
+
+
+def test_facet_counts_share_the_bound_and_versions_with_positions():
+    cache = QueryCache(max_bytes=4 * 8)
+    counts = {"genre": positions(5, 1), "language": positions(2)}
+    cache.put(("title", "a"), positions(1, 2), version=1)
+    cache.put_facet_counts(("title", "a"), counts, version=1)
+
+    assert cache.get_facet_counts(("title", "a"), version=1) is counts
+    assert cache.get(("title", "a"), version=1) is None
+    assert cache.stats()["nbytes"] == 3 * 8
+    assert cache.get_facet_counts(("title", "a"), version=2) is None
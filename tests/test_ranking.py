@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.ranking import RankedResults, text_relevance
+
+
+@pytest.fixture
+def book_data():
+    rng = np.random.default_rng(0)
+    n_rows = 1000
+    ratings = np.round(rng.uniform(0, 5, n_rows), 2)
+    ratings[rng.integers(0, n_rows, 50)] = np.nan
+    return pd.DataFrame({
+        "title": [f"Book {row}" for row in range(n_rows)],
+        # Few distinct ratings and popularities, so ties have to be broken by row order
+        "rating": pd.Series(np.round(ratings, 0), dtype="float32"),
+        "numRatings": rng.integers(0, 5, n_rows),
+    })
+
+
+def full_ranking(book_data: pd.DataFrame, positions: np.ndarray, relevance=None) -> list:
+    """Sort the results completely by relevance, rating (unrated last) and popularity, ties by row position."""
+    relevance = np.zeros(len(positions), dtype=np.int64) if relevance is None else relevance
+    ratings = book_data["rating"].to_numpy(dtype=np.float64)[positions]
+    rating_keys = np.where(np.isnan(ratings), -1, ratings)
+    popularity = book_data["numRatings"].to_numpy()[positions]
+    order = np.lexsort((positions, -popularity, -rating_keys, -relevance))
+    return positions[order].tolist()
+
+
+@pytest.mark.parametrize("items_per_page", [1, 7, 10, 333, 2000])
+def test_pages_concatenate_to_the_full_ranking(book_data, items_per_page):
+    positions = np.arange(0, len(book_data), 2)
+    ranked = RankedResults.rank(book_data, positions)
+
+    pages = []
+    page = 1
+    while True:
+        chunk = ranked.page(page, items_per_page)
+        if not len(chunk):
+            break
+        pages.extend(chunk.tolist())
+        page += 1
+
+    assert pages == full_ranking(book_data, positions)
+
+
+def test_pages_can_be_requested_in_any_order(book_data):
+    positions = np.arange(len(book_data))
+    ranked = RankedResults.rank(book_data, positions)
+    expected = full_ranking(book_data, positions)
+
+    assert ranked.page(5, 20).tolist() == expected[80:100]
+    assert ranked.page(1, 20).tolist() == expected[:20]
+    assert ranked.page(50, 20).tolist() == expected[980:1000]
+    assert ranked.page(51, 20).tolist() == []
+
+
+def test_relevance_ranks_first(book_data):
+    positions = np.arange(100)
+    relevance = np.zeros(100, dtype=np.int64)
+    relevance[[90, 10]] = [1, 2]
+
+    ranked = RankedResults.rank(book_data, positions, relevance)
+
+    assert ranked.page(1, 2).tolist() == [10, 90]
+    assert ranked.page(1, 100).tolist() == full_ranking(book_data, positions, relevance)
+
+
+def test_ranking_does_not_change_the_given_positions(book_data):
+    positions = np.arange(100)
+
+    RankedResults.rank(book_data, positions).page(1, 10)
+
+    assert positions.tolist() == list(range(100))
+
+
+def test_all_books_and_empty_results(book_data):
+    assert RankedResults.all_books(book_data).page(1, len(book_data)).tolist() == full_ranking(
+        book_data, np.arange(len(book_data))
+    )
+    assert len(RankedResults.empty()) == 0
+    assert RankedResults.empty().page(1, 10).tolist() == []
+
+
+def test_text_relevance_points():
+    titles = pd.Series(["night", "night sky", "the night", "knight", None])
+
+    assert text_relevance(titles, "night").tolist() == [3, 2, 1, 0, 0]
@@ -0,0 +1,210 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_catalogue import generate_catalogue
+from src.data.dataset_cache import INDEX_BUILDERS, INDEX_UPDATERS, DatasetCache, diff_by_isbn
+from src.data.facets import FacetIndex
+from src.data.schema import BookSchema
+from src.recommendation.content_based import ContentRecommender
+
+TEXT_QUERIES = ["night", "the", "sha", "a", "new title", "zzz"]
+
+
+def write_csv(path, book_data: pd.DataFrame, mtime: int) -> None:
+    """Write the catalogue with an explicit modification time, so every rewrite is seen as a change."""
+    book_data.to_csv(path, index=False)
+    os.utime(path, (mtime, mtime))
+
+
+def change_rows(book_data: pd.DataFrame) -> pd.DataFrame:
+    changed = book_data.copy()
+    changed.loc[[3, 17], "title"] = ["A brand new title", "Another new title"]
+    changed.loc[5, "author"] = "Someone Else 1"
+    changed.loc[8, "genres"] = "['Brand New Genre', 'Fantasy']"
+    changed.loc[11, "rating"] = 1.25
+    return changed
+
+
+def append_rows(book_data: pd.DataFrame) -> pd.DataFrame:
+    appended = generate_catalogue(5, seed=1, start=len(book_data))
+    appended.loc[0, "title"] = "A new title at the end"
+    appended.loc[1, "genres"] = "['Brand New Genre']"
+    return pd.concat([book_data, appended], ignore_index=True)
+
+
+def reorder_rows(book_data: pd.DataFrame) -> pd.DataFrame:
+    return book_data.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def remove_row(book_data: pd.DataFrame) -> pd.DataFrame:
+    return book_data.drop(index=7).reset_index(drop=True)
+
+
+@pytest.fixture
+def catalogue(tmp_path):
+    book_data = generate_catalogue(200, seed=0)
+    csv_path = tmp_path / "books.csv"
+    write_csv(csv_path, book_data, 1_000_000)
+    return csv_path, book_data
+
+
+def assert_same_index(name: str, updated, rebuilt, book_data: pd.DataFrame) -> None:
+    """Compare an incrementally updated index with one rebuilt from scratch through their lookups."""
+    if name in ("title", "author"):
+        assert updated.n_rows == rebuilt.n_rows
+        for query in TEXT_QUERIES + book_data[name].astype(str).iloc[::40].tolist():
+            np.testing.assert_array_equal(updated.contains(query), rebuilt.contains(query))
+            np.testing.assert_array_equal(updated.exact(query), rebuilt.exact(query))
+    elif name == "genre":
+        assert updated.n_rows == rebuilt.n_rows
+        assert sorted(map(str.lower, updated.sorted_genres())) == sorted(map(str.lower, rebuilt.sorted_genres()))
+        for genre in rebuilt.sorted_genres():
+            np.testing.assert_array_equal(updated.lookup(genre), rebuilt.lookup(genre))
+    elif name == "isbn":
+        assert updated.n_rows == rebuilt.n_rows
+        isbns = book_data["isbn"].tolist() + ["0000000000000"]
+        np.testing.assert_array_equal(updated.lookup_many(isbns), rebuilt.lookup_many(isbns))
+    elif name == "facets":
+        updated_counts, rebuilt_counts = updated.counts(), rebuilt.counts()
+        for facet in ("genre", "language", "rating", "pages"):
+            pd.testing.assert_series_equal(
+                updated_counts.get(facet).sort_index(), rebuilt_counts.get(facet).sort_index()
+            )
+    elif name == "recommender":
+        # Updates keep the IDF of the previous build, so the reference applies that IDF to every row
+        from sklearn.feature_extraction.text import TfidfTransformer
+
+        transformer = TfidfTransformer(sublinear_tf=True)
+        transformer.idf_ = updated.idf
+        counts = ContentRecommender._vectorizer().transform(ContentRecommender.build_documents(book_data))
+        expected = transformer.transform(counts).astype(np.float32)
+        assert abs(updated.features - expected).max() < 1e-6
+    else:
+        raise AssertionError(f"No comparison for index {name}")
+
+
+@pytest.mark.parametrize(
+    "change",
+    [change_rows, append_rows, lambda data: append_rows(change_rows(data)), lambda data: reorder_rows(change_rows(data))],
+    ids=["change", "append", "change-and-append", "change-and-reorder"]
+)
+def test_refresh_updates_indexes_like_a_rebuild(catalogue, change):
+    csv_path, book_data = catalogue
+    cache = DatasetCache(csv_path)
+    for name in INDEX_BUILDERS:
+        cache.get_index(name)
+    version, positions_version = cache.version, cache.positions_version
+    isbn_positions = cache.get_index("isbn").lookup_many(book_data["isbn"].tolist())
+
+    write_csv(csv_path, change(book_data), 2_000_000)
+    summary = cache.refresh()
+
+    assert summary["reloaded"] == 0
+    assert cache.version == version + 1
+    assert cache.positions_version == positions_version
+    refreshed = cache.get_data()
+    # Books keep their row positions, appended ones follow
+    np.testing.assert_array_equal(cache.get_index("isbn").lookup_many(book_data["isbn"].tolist()), isbn_positions)
+
+    for name in INDEX_UPDATERS:
+        rebuilt = INDEX_BUILDERS[name](refreshed) if name != "recommender" else None
+        assert_same_index(name, cache.get_index(name), rebuilt, refreshed)
+
+
+def test_refresh_after_removal_reloads_and_rebuilds(catalogue):
+    csv_path, book_data = catalogue
+    cache = DatasetCache(csv_path)
+    for name in ("title", "genre", "isbn", "facets"):
+        cache.get_index(name)
+    positions_version = cache.positions_version
+
+    write_csv(csv_path, remove_row(book_data), 2_000_000)
+
+    assert cache.refresh() == {"appended": 0, "updated": 0, "reloaded": 1}
+    assert cache.positions_version == positions_version + 1
+    refreshed = cache.get_data()
+    assert len(refreshed) == len(book_data) - 1
+    for name in ("title", "genre", "isbn", "facets"):
+        assert_same_index(name, cache.get_index(name), INDEX_BUILDERS[name](refreshed), refreshed)
+
+
+@pytest.mark.parametrize("change", [lambda data: data, reorder_rows], ids=["rewrite", "reorder"])
+def test_refresh_without_changed_books_keeps_the_version(catalogue, change):
+    csv_path, book_data = catalogue
+    cache = DatasetCache(csv_path)
+    cache.get_data()
+    version = cache.version
+
+    write_csv(csv_path, change(book_data), 2_000_000)
+
+    assert cache.refresh() == {"appended": 0, "updated": 0, "reloaded": 0}
+    assert cache.version == version
+
+
+def test_queries_started_before_a_refresh_keep_their_data(catalogue):
+    csv_path, book_data = catalogue
+    cache = DatasetCache(csv_path)
+    query = cache.query().title("a new title")
+    assert query.count() == 0
+
+    write_csv(csv_path, append_rows(book_data), 2_000_000)
+    cache.refresh()
+
+    # The old query scans its own data instead of using indexes built for the refreshed one
+    assert cache.query().title("a new title").count() == 1
+    assert query.count() == 0
+
+
+def test_diff_by_isbn_keeps_positions_and_lists_changed_rows():
+    current = generate_catalogue(50, seed=0)
+    fresh = append_rows(change_rows(current))
+
+    refreshed, rows = diff_by_isbn(current, reorder_rows(fresh))
+
+    pd.testing.assert_series_equal(refreshed["isbn"].iloc[:len(current)], current["isbn"], check_dtype=False)
+    np.testing.assert_array_equal(rows, [3, 5, 8, 11, 17, 50, 51, 52, 53, 54])
+    pd.testing.assert_frame_equal(
+        refreshed.set_index("isbn").sort_index(), fresh.set_index("isbn").sort_index(), check_dtype=False
+    )
+
+
+def test_diff_by_isbn_gives_up_on_removed_books_and_duplicate_isbns():
+    current = generate_catalogue(50, seed=0)
+    assert diff_by_isbn(current, remove_row(current)) is None
+
+    duplicated = current.copy()
+    duplicated.loc[1, "isbn"] = duplicated.loc[0, "isbn"]
+    assert diff_by_isbn(duplicated, current) is None
+
+
+def test_facet_index_update_adds_new_genres():
+    book_data = generate_catalogue(100, seed=0)
+    index = FacetIndex.from_dataframe(BookSchema.apply(book_data.copy()))
+    changed = BookSchema.apply(append_rows(change_rows(book_data)))
+    rows = np.array([3, 5, 8, 11, 17, 100, 101, 102, 103, 104])
+
+    updated = index.updated(changed, rows)
+
+    assert "Brand New Genre" in updated.labels["genre"]
+    assert_same_index("facets", updated, FacetIndex.from_dataframe(changed), changed)
+
+
+@pytest.mark.parametrize("change", [change_rows, remove_row], ids=["update", "reload"])
+def test_warm_up_builds_word_indexes_that_refreshes_keep(catalogue, change):
+    csv_path, book_data = catalogue
+    cache = DatasetCache(csv_path)
+    cache.warm_up(["title"], [])
+    usage = cache.memory_usage()
+
+    cache.warm_up(["title", "title_words"], [])
+
+    assert cache.get_index("title").has_word_index
+    assert cache.memory_usage() > usage
+
+    write_csv(csv_path, change(book_data), 2_000_000)
+    cache.refresh()
+
+    assert cache.get_index("title").has_word_index
@@ -0,0 +1,119 @@
+import asyncio
+import json
+from http import HTTPStatus
+
+import pytest
+
+from benchmarks.synthetic_catalogue import generate_catalogue
+from src.api.server import SearchServer, parse_search_parameters
+from src.data.dataset_cache import DatasetCache
+
+
+@pytest.fixture(scope="module")
+def catalogue_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("server") / "books.csv"
+    book_data = generate_catalogue(500, seed=3)
+    book_data.loc[0, "title"] = "The Night Garden"
+    book_data.loc[0, "genres"] = "['Fantasy', 'Horror']"
+    book_data.to_csv(path, index=False)
+    return path
+
+
+def serve(catalogue_path, *requests, max_pending: int = 16):
+    """Answer the requests concurrently on a fresh server and return the server and the responses."""
+    server = SearchServer(DatasetCache(catalogue_path), max_workers=2, max_pending=max_pending)
+
+    async def run():
+        await server.start(port=0)
+        try:
+            return await asyncio.gather(*(server.handle(*request) for request in requests))
+        finally:
+            await server.close()
+
+    return server, asyncio.run(run())
+
+
+def test_search_by_query_string_and_json(catalogue_path):
+    _, responses = serve(
+        catalogue_path,
+        ("GET", "/search?title=night+garden&genre=Fantasy&genre=Horror&match_all=true"),
+        ("POST", "/search", json.dumps({"title": "night garden", "genre": ["Fantasy", "Horror"], "match_all": True})),
+    )
+
+    for status, payload in responses:
+        assert status == HTTPStatus.OK
+        assert payload["total"] >= 1
+        assert payload["books"][0]["title"] == "The Night Garden"
+    assert responses[0][1] == responses[1][1]
+
+
+def test_search_pages(catalogue_path):
+    _, [(_, first), (_, second)] = serve(
+        catalogue_path, ("GET", "/search?per_page=7&page=1"), ("GET", "/search?per_page=7&page=2")
+    )
+
+    assert first["total"] == second["total"] == 500
+    assert len(first["books"]) == len(second["books"]) == 7
+    assert {book["isbn"] for book in first["books"]}.isdisjoint(book["isbn"] for book in second["books"])
+
+
+def test_isbn_batch_lookup(catalogue_path):
+    isbns = generate_catalogue(500, seed=3)["isbn"].tolist()
+    _, [(status, payload)] = serve(catalogue_path, ("POST", "/isbns", json.dumps({"isbns": [isbns[4], "123"]})))
+
+    assert status == HTTPStatus.OK
+    assert [book["isbn"] for book in payload["books"]] == [isbns[4]]
+    assert payload["missing"] == ["123"]
+
+
+def test_health_ready_and_stats(catalogue_path):
+    _, [(_, health), (ready_status, _), (_, stats)] = serve(
+        catalogue_path, ("GET", "/health"), ("GET", "/ready"), ("GET", "/stats")
+    )
+
+    assert health == {"status": "ok", "ready": True, "rows": 500, "version": 1}
+    assert ready_status == HTTPStatus.OK
+    assert stats["requests"] == 3 and stats["errors"] == 0
+
+
+@pytest.mark.parametrize("request_args, status", [
+    (("GET", "/unknown"), HTTPStatus.NOT_FOUND),
+    (("GET", "/isbns"), HTTPStatus.METHOD_NOT_ALLOWED),
+    (("GET", "/search?colour=red"), HTTPStatus.BAD_REQUEST),
+    (("GET", "/search?min_rating=high"), HTTPStatus.BAD_REQUEST),
+    (("GET", "/search?per_page=1000"), HTTPStatus.BAD_REQUEST),
+    (("POST", "/search", b"[1, 2]"), HTTPStatus.BAD_REQUEST),
+    (("POST", "/search", json.dumps({"genre": 5})), HTTPStatus.BAD_REQUEST),
+    (("POST", "/search", json.dumps({"genre": [["Fantasy"]]})), HTTPStatus.BAD_REQUEST),
+    (("POST", "/isbns", json.dumps({"isbns": "9780000000002"})), HTTPStatus.BAD_REQUEST),
+])
+def test_invalid_requests(catalogue_path, request_args, status):
+    server, [(answered, payload)] = serve(catalogue_path, request_args)
+
+    assert answered == status
+    assert "error" in payload
+    assert server.stats["errors"] == 0
+
+
+def test_identical_concurrent_searches_are_coalesced(catalogue_path):
+    server, responses = serve(catalogue_path, *[("GET", "/search?title=night")] * 5)
+
+    assert all(response == responses[0] for response in responses)
+    assert server.stats["coalesced"] == 4
+
+
+def test_busy_server_rejects_searches(catalogue_path):
+    server, [(status, _)] = serve(catalogue_path, ("GET", "/search?title=night"), max_pending=0)
+
+    assert status == HTTPStatus.SERVICE_UNAVAILABLE
+    assert server.stats["rejected"] == 1
+
+
+def test_parse_search_parameters_converts_types():
+    values, page, per_page = parse_search_parameters(
+        {"title": "night", "title_fuzzy": "yes", "min_pages": "100", "min_rating": 4, "genre": "Fantasy", "page": 2}
+    )
+
+    assert values["title_fuzzy"] is True and values["min_pages"] == 100 and values["min_rating"] == 4.0
+    assert values["genre"] == ["Fantasy"]
+    assert (page, per_page) == (2, 10)
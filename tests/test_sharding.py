@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from src.data.sharding import ShardedExecutor
+
+
+def test_rows_slice_adjacent_positions_without_copying():
+    column = pd.Series(np.arange(10, dtype=np.float32))
+
+    adjacent = ShardedExecutor.rows(column, np.arange(3, 7))
+    scattered = ShardedExecutor.rows(column, np.array([1, 4, 8]))
+
+    assert adjacent.tolist() == [3, 4, 5, 6]
+    assert np.shares_memory(adjacent.to_numpy(), column.to_numpy())
+    assert scattered.tolist() == [1, 4, 8]
+    assert not np.shares_memory(scattered.to_numpy(), column.to_numpy())
+    assert ShardedExecutor.rows(column, np.array([], dtype=np.int64)).tolist() == []
+
+
+def test_mask_merges_shards_in_candidate_order():
+    values = np.random.default_rng(0).random(1000)
+    candidates = np.flatnonzero(values > 0.2)
+    executor = ShardedExecutor(max_workers=3, shard_rows=50)
+
+    merged = executor.mask(lambda shard: values[shard] > 0.6, candidates)
+
+    assert merged.tolist() == (values[candidates] > 0.6).tolist()
+
+
+def test_releases_gil_only_for_arrow_strings():
+    assert ShardedExecutor.releases_gil(pd.Series(["a"], dtype=pd.StringDtype("pyarrow")))
+    assert not ShardedExecutor.releases_gil(pd.Series(["a"], dtype=object))
+    assert not ShardedExecutor.releases_gil(pd.Series(["a"], dtype="category"))
@@ -0,0 +1,149 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.filters import DataFilter
+from src.data.schema import BookSchema
+from src.data.text_index import TextIndex, edit_distance
+
+TITLES = pd.Series([
+    "The Hobbit",
+    "the hobbit ",
+    "Harry Potter and the Philosopher's Stone",
+    None,
+    "Dune",
+    "A Game of Thrones",
+    "Of Mice and Men",
+    "",
+])
+
+
+def brute_force(titles: pd.Series, matches) -> list:
+    return [row for row, title in enumerate(titles) if isinstance(title, str) and matches(title.lower().strip())]
+
+
+@pytest.fixture(params=["object", "arrow", "category"])
+def titles(request):
+    if request.param == "object":
+        return TITLES
+    if request.param == "arrow":
+        return TITLES.astype("string[pyarrow]")
+    return TITLES.astype("category")
+
+
+@pytest.mark.parametrize("query", ["hobbit", "The", "of", "o", "e S", "dune", "game of", "zzz", "stone!"])
+def test_contains_matches_a_substring_scan(titles, query):
+    index = TextIndex.from_series(titles)
+    query = query.lower().strip()
+
+    assert index.contains(query).tolist() == brute_force(TITLES, lambda title: query in title)
+
+
+@pytest.mark.parametrize("query", ["The Hobbit", "  the hobbit", "dune", "Dun", ""])
+def test_exact_matches_normalized_values(titles, query):
+    index = TextIndex.from_series(titles)
+    normalized = query.lower().strip()
+
+    assert index.exact(query).tolist() == brute_force(TITLES, lambda title: title == normalized)
+
+
+def test_updated_index_equals_a_rebuilt_one():
+    index = TextIndex.from_series(TITLES)
+    changed = pd.concat([TITLES, pd.Series(["The Hobbit", "Neuromancer"])], ignore_index=True)
+    changed[4] = "Dune Messiah"
+    rows = np.array([4, 8, 9])
+
+    updated = index.updated(changed, rows)
+    rebuilt = TextIndex.from_series(changed)
+
+    assert updated.n_rows == rebuilt.n_rows == len(changed)
+    for query in ["hobbit", "dune", "messiah", "neuromancer", "o", "the hobbit"]:
+        assert updated.contains(query).tolist() == rebuilt.contains(query).tolist()
+        assert updated.exact(query).tolist() == rebuilt.exact(query).tolist()
+
+
+def test_nbytes_counts_the_distinct_values():
+    titles = pd.Series([f"A fairly long and distinct book title number {row}" for row in range(2000)])
+    index = TextIndex.from_series(titles)
+
+    assert index.nbytes > sum(map(sys.getsizeof, index.values))
+
+
+def test_filter_by_title_with_and_without_index():
+    book_data = BookSchema.apply(pd.DataFrame({"title": TITLES.fillna("")}))
+    index = TextIndex.from_series(book_data["title"])
+
+    for exact_match in (False, True):
+        for query in ("hobbit", "the hobbit", "Dune"):
+            scanned = DataFilter.filter_by_title(book_data, query, exact_match=exact_match)
+            indexed = DataFilter.filter_by_title(book_data, query, exact_match=exact_match, title_index=index)
+            assert scanned.index.tolist() == indexed.index.tolist()
+
+
+AUTHORS = pd.Series([
+    "Stephen King",
+    "Neil Gaiman",
+    "John Smith",
+    "Anna Smith",
+    "Anna Karenina",
+    "Stephen Fry",
+    "Kingsley Amis",
+    None,
+])
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("smtih", ["John Smith", "Anna Smith"]),
+    ("Anna Smtih", ["Anna Smith"]),
+    ("stephen kign", ["Stephen King"]),
+    ("niel gaiman", ["Neil Gaiman"]),
+    ("john smtih", ["John Smith"]),
+    ("Stephen King", ["Stephen King"]),
+    ("xyzzy", []),
+])
+def test_similar_tolerates_typos(query, expected):
+    index = TextIndex.from_series(AUTHORS)
+
+    positions, similarities = index.similar(query)
+
+    assert AUTHORS[positions].tolist() == expected
+    assert ((similarities > 0) & (similarities <= 1)).all()
+
+
+def test_similar_ranks_exact_words_above_typos():
+    index = TextIndex.from_series(pd.Series(["The Dark Tower", "The Drak Tower"]))
+
+    positions, similarities = index.similar("dark tower")
+
+    assert positions.tolist() == [0, 1]
+    assert similarities[0] == 1 and similarities[1] < 1
+
+
+def test_similar_rejects_invalid_thresholds():
+    with pytest.raises(ValueError):
+        TextIndex.from_series(AUTHORS).similar("king", min_similarity=0)
+
+
+@pytest.mark.parametrize("first, second, distance", [
+    ("smith", "smith", 0),
+    ("smtih", "smith", 1),
+    ("kign", "king", 1),
+    ("gaiman", "gayman", 1),
+    ("gaiman", "gamain", 2),
+    ("kitten", "sitting", 3),
+])
+def test_edit_distance_counts_transpositions_once(first, second, distance):
+    assert edit_distance(first, second, 3) == distance
+    assert edit_distance(first, second, 1) == min(distance, 2)
+
+
+def test_filter_by_author_fuzzy_with_and_without_index():
+    book_data = BookSchema.apply(pd.DataFrame({"author": AUTHORS.fillna("")}))
+    index = TextIndex.from_series(book_data["author"])
+
+    scanned = DataFilter.filter_by_author(book_data, "niel gaiman", fuzzy=True)
+    indexed = DataFilter.filter_by_author(book_data, "niel gaiman", fuzzy=True, author_index=index)
+
+    assert scanned["author"].tolist() == indexed["author"].tolist() == ["Neil Gaiman"]